@@ -34,15 +34,17 @@ def chkAlbumRoot(root: Path, logger: Logger) -> None:
         logger.error(AR_CAPTITAL_MISTAKE_2.format(STD_CDS_DIRNAME, root.name))
 
     logger.info(LISTING_FILES_0)
-    all_paths = listFile(root)
-    cds_paths = listFile(root, ext=ALL_EXTS_IN_CDS)
+    # NOTE walk the tree only once, all later listing under root is answered from this snapshot
+    snapshot = DirSnapshot(root)
+    all_paths = snapshot.listFile(root)
+    cds_paths = snapshot.listFile(root, ext=ALL_EXTS_IN_CDS)
     for path in set(all_paths).difference(set(cds_paths)):
         logger.error(AR_FOUND_DISALLOWED_FILE_1.format(path))
-    for path in listFile(root, ext=ALL_EXTS_IN_CDS, rglob=False):
+    for path in snapshot.listFile(root, ext=ALL_EXTS_IN_CDS, rglob=False):
         logger.error(AR_FOUND_MISPLACED_FILE_2.format(path.name, path.parent))
 
     logger.info(AR_GATHERING_ALBUM_DIRS_0)
-    albums_paths: list[Path] = listAlbumDirs(root, logger=logger)
+    albums_paths: list[Path] = listAlbumDirs(root, logger=logger, snapshot=snapshot)
     if not albums_paths:
         logger.error(AR_GOT_NO_ALBUM_DIR_0)
         return
@@ -50,7 +52,7 @@ def chkAlbumRoot(root: Path, logger: Logger) -> None:
     logger.info(AR_CHECKING_ALBUM_LAYOUT_0)
     albums_infos: list[AlbumInfo] = []
     for album_path in albums_paths:
-        if (album_info := chkAlbumDirNaming(album_path, logger=logger)):
+        if (album_info := chkAlbumDirNaming(album_path, logger=logger, snapshot=snapshot)):
             albums_infos.append(album_info)
     if not albums_infos: logger.error(AR_GOT_NO_VALID_ALBUM_DIR_0)
 
@@ -78,13 +80,15 @@ def chkAlbumRoot(root: Path, logger: Logger) -> None:
 
 
 
-def chkAlbumDirNaming(album_path: Path, logger: Logger) -> AlbumInfo:
+def chkAlbumDirNaming(album_path: Path, logger: Logger, snapshot: DirSnapshot|None = None) -> AlbumInfo:
     '''
     Check the file layout and names under `album_path`.
 
     NOTE: this function does NOT check ANY file content.
     It's purely based on filetree and filenames.
 
+    `snapshot` can be supplied to avoid walking the file tree again, which should cover `album_path`.
+
     Return: dict
     It returns a processed info dict about the ALBUM, making it easier for later content check.
     If the album folder looks bad, the returned dict will be empty.
@@ -93,6 +97,8 @@ def chkAlbumDirNaming(album_path: Path, logger: Logger) -> AlbumInfo:
     ok = True
     album_path = Path(album_path)
     dirname = album_path.name
+    if not (snapshot and snapshot.covers(album_path)):
+        snapshot = DirSnapshot(album_path)
 
     if DEBUG:
         assert album_path.is_dir()
@@ -294,7 +300,7 @@ def chkAlbumDirNaming(album_path: Path, logger: Logger) -> AlbumInfo:
     #***********************************************************************************************
     # now record the information we obtained from album dirname
 
-    ai = AlbumInfo(album_path)
+    ai = AlbumInfo(album_path, snapshot=snapshot)
     ai.year, ai.month, ai.day = year, month, day
     ai.prename, ai.midname, ai.aftname = prename, midname, aftname
     ai.artists, ai.edition = artists, edition_name  # TODO if edition, then at most 1 disc
@@ -305,7 +311,7 @@ def chkAlbumDirNaming(album_path: Path, logger: Logger) -> AlbumInfo:
     #***********************************************************************************************
 
     # txt file can be checked independently
-    album_txt_files = listFile(album_path, ext='txt')
+    album_txt_files = snapshot.listFile(album_path, ext='txt')
     if album_txt_files:
         if len(album_txt_files) > 1:
             logger.error(f'only 1 txt source credit allowed in each album folder (got {len(album_txt_files)}).')
@@ -327,7 +333,7 @@ def chkAlbumDirNaming(album_path: Path, logger: Logger) -> AlbumInfo:
     scans_set: set[Path] = set()
     miscs_set: set[Path] = set()
 
-    for album_sub_dir in listDir(album_path):
+    for album_sub_dir in snapshot.listDir(album_path):
 
         # empty dir doesn't matter during torrent making, so only give an info notice
         # if not album_sub_dir_files and not album_sub_dir_dirs:
@@ -340,25 +346,25 @@ def chkAlbumDirNaming(album_path: Path, logger: Logger) -> AlbumInfo:
         #     continue
 
         # if contains any flac/mp3/aac/cue/log -> a 'disc dir'
-        if listFile(album_sub_dir, ext=MAIN_EXTS_IN_CDS, rglob=False):
+        if snapshot.listFile(album_sub_dir, ext=MAIN_EXTS_IN_CDS, rglob=False):
             discs_set.add(album_sub_dir)
             continue
 
         # then if contains any mkv -> an 'mv dir'
-        if listFile(album_sub_dir, ext='mkv', rglob=False):
+        if snapshot.listFile(album_sub_dir, ext='mkv', rglob=False):
             mvids_set.add(album_sub_dir)
             logger.info('Found an MV inside the album.')
             continue
 
         # then if contains any webp/jpg (but cover.jpg) -> 'bk dir'
-        if img_files := listFile(album_sub_dir, ext=IMG_EXTS_IN_CDS, rglob=False):
+        if img_files := snapshot.listFile(album_sub_dir, ext=IMG_EXTS_IN_CDS, rglob=False):
             if len(img_files) == 1 and img_files[0].name.lower() == STD_COVER_FILENAME.lower():
                 logger.warning('The Scans dir seemingly contains only a cover.jpg.')
             scans_set.add(album_sub_dir)
             continue
 
         # if there is still some required files under it, it is a misc dir
-        if listFile(album_sub_dir, ext=ALL_EXTS_IN_CDS):
+        if snapshot.listFile(album_sub_dir, ext=ALL_EXTS_IN_CDS):
             miscs_set.add(album_sub_dir)
         else:
             logger.warning(
@@ -408,11 +414,11 @@ def chkAlbumDirNaming(album_path: Path, logger: Logger) -> AlbumInfo:
         if len(disc_dir.relative_to(album_path).as_posix().replace('.', '').split('/')) > 2:
             logger.warning(f'The DISC dir "{disc_dir.relative_to(album_path)}" locates too deep inside the album.')
 
-        aud_files = listFile(disc_dir, ext=AUD_EXTS_IN_CDS, rglob=False)
-        cue_files = listFile(disc_dir, ext='cue', rglob=False)
-        log_files = listFile(disc_dir, ext='log', rglob=False)
-        vid_files = listFile(disc_dir, ext='mkv', rglob=False)
-        img_files = listFile(disc_dir, ext=IMG_EXTS_IN_CDS, rglob=False)
+        aud_files = snapshot.listFile(disc_dir, ext=AUD_EXTS_IN_CDS, rglob=False)
+        cue_files = snapshot.listFile(disc_dir, ext='cue', rglob=False)
+        log_files = snapshot.listFile(disc_dir, ext='log', rglob=False)
+        vid_files = snapshot.listFile(disc_dir, ext='mkv', rglob=False)
+        img_files = snapshot.listFile(disc_dir, ext=IMG_EXTS_IN_CDS, rglob=False)
 
         # NOTE there is no naming rule for MVs
         if vid_files and len(vid_files) > 1:
@@ -566,7 +572,7 @@ def chkAlbumDirNaming(album_path: Path, logger: Logger) -> AlbumInfo:
                     f'(got {len(cue_files)} expect {len(aud_files)}).'
                     )
             for cue_file in cue_files:
-                if not any(cue_file.with_suffix(ext).is_file() for ext in (f'.{e}' for e in AUD_EXTS_IN_CDS)):
+                if not any((cue_file.with_suffix(ext) in snapshot) for ext in (f'.{e}' for e in AUD_EXTS_IN_CDS)):
                     logger.error(
                         f'Cannot find the counterpart track-joint audio with the same name of "{cue_file.relative_to(album_path)}".'
                         )
@@ -582,7 +588,7 @@ def chkAlbumDirNaming(album_path: Path, logger: Logger) -> AlbumInfo:
                         f'(got {len(log_files)} expect {len(aud_files)}).'
                         )
             for log_file in log_files:
-                if not any(log_file.with_suffix(ext).is_file() for ext in (f'.{e}' for e in AUD_EXTS_IN_CDS)):
+                if not any((log_file.with_suffix(ext) in snapshot) for ext in (f'.{e}' for e in AUD_EXTS_IN_CDS)):
                     logger.error(
                         f'Cannot find the counterpart track-joint audio with the same name of "{log_file.relative_to(album_path)}".'
                         )
@@ -621,11 +627,11 @@ def chkAlbumDirNaming(album_path: Path, logger: Logger) -> AlbumInfo:
             logger.warning(f'The MV dir "{mv_dir.relative_to(album_path)}" is misplaced.')
         distances_to_album_root.append(distance_to_album_root)
 
-        mv_files = listFile(mv_dir, ext='mkv', rglob=False)
+        mv_files = snapshot.listFile(mv_dir, ext='mkv', rglob=False)
         if DEBUG: assert mv_files
         found_vid = True if mv_files else found_vid
 
-        img_files = listFile(mv_dir, ext=IMG_EXTS_IN_CDS, rglob=False)
+        img_files = snapshot.listFile(mv_dir, ext=IMG_EXTS_IN_CDS, rglob=False)
         if img_files:
             logger.error(f'The MV dir "{mv_dir.relative_to(album_path)}" should not contain any image.')
 
@@ -663,8 +669,8 @@ def chkAlbumDirNaming(album_path: Path, logger: Logger) -> AlbumInfo:
         if STD_BKS_DIRNAME not in scan_dir.relative_to(album_path).as_posix():
             logger.error(f'Cannot find a parent "{STD_BKS_DIRNAME}" dir for "{scan_dir}".')
 
-        webp_files = listFile(scan_dir, ext='webp', rglob=False)
-        jpeg_files = listFile(scan_dir, ext='jpg jpeg'.split(), rglob=False)
+        webp_files = snapshot.listFile(scan_dir, ext='webp', rglob=False)
+        jpeg_files = snapshot.listFile(scan_dir, ext='jpg jpeg'.split(), rglob=False)
         if DEBUG: assert webp_files or jpeg_files
         found_webp = True if webp_files else found_webp
         found_jpg = True if jpeg_files else found_jpg
@@ -776,7 +782,7 @@ def _chkSplitDiscImpl(self, disc_dir: Path):
 
     #* audio check ***************************************************
 
-    aud_files = listFile(disc_dir, ext=AUD_EXTS_IN_CDS, rglob=False)
+    aud_files = self.snapshot.listFile(disc_dir, ext=AUD_EXTS_IN_CDS, rglob=False)
     aud_minfos = [getMediaInfo(f) for f in aud_files]
 
     valid_aud_files = []
@@ -790,11 +796,12 @@ def _chkSplitDiscImpl(self, disc_dir: Path):
 
     aud_gtrs = [m.general_tracks[0] for m in valid_aud_minfos]
     aud_atrs = [m.audio_tracks[0] for m in valid_aud_minfos]
+    aud_oks = tstAudioFilesValid(valid_aud_files, mp=NUM_CPU_JOBS)
 
     seen_album_names = []
     seen_artists = []
 
-    for aud_file, gtr, atr in zip(valid_aud_files, aud_gtrs, aud_atrs):
+    for aud_file, gtr, atr, aud_ok in zip(valid_aud_files, aud_gtrs, aud_atrs, aud_oks):
         rel_path = aud_file.relative_to(aroot)
         match gtr.format:
             case 'FLAC':
@@ -837,8 +844,8 @@ def _chkSplitDiscImpl(self, disc_dir: Path):
         if gtr.composer: seen_artists.append(gtr.composer)
         if gtr.album_composer: seen_artists.append(gtr.album_composer)
 
-        if not tstFFmpegDecode(aud_file):
-            self.logs.append((2, f'Decoding "{rel_path}" failed.'))
+        if not aud_ok:
+            self.logs.append((2, f'Decoding "{rel_path}" failed or mismatches the FLAC MD5 signature.'))
 
     seen_artists = list(set(seen_artists))
     if seen_artists and self.artists and not matchArtistsName(self.artists, seen_artists):
@@ -854,7 +861,7 @@ def _chkSplitDiscImpl(self, disc_dir: Path):
     #* log check *****************************************************
 
     # TODO add more LOG check
-    log_files = listFile(disc_dir, ext='log', rglob=False)
+    log_files = self.snapshot.listFile(disc_dir, ext='log', rglob=False)
     for log_file in log_files:
         if tstFileEncoding(log_file, 'utf-16-le'):
             pass
@@ -866,10 +873,19 @@ def _chkSplitDiscImpl(self, disc_dir: Path):
                 ))
         else:
             self.logs.append((2, f'EAC LOG "{log_file.relative_to(disc_dir)}" decoding failed.'))
+            continue
+        if ENABLE_LOG_VERIFICATION_IN_AR and (eac_log := parseEACLog(log_file)):
+            try:
+                track_sums, whole_sums = calcDiscChecksums(valid_aud_files)
+            except ValueError:
+                self.logs.append((2, f'Failed to verify EAC LOG "{log_file.relative_to(disc_dir)}" (decoding failed).'))
+                continue
+            for mismatch in cmpDiscChecksumsWithLog(track_sums, whole_sums, eac_log):
+                self.logs.append((2, f'EAC LOG "{log_file.relative_to(disc_dir)}" mismatches: {mismatch}.'))
 
     #* img check *****************************************************
 
-    img_files = listFile(disc_dir, ext=IMG_EXTS_IN_CDS, rglob=False)
+    img_files = self.snapshot.listFile(disc_dir, ext=IMG_EXTS_IN_CDS, rglob=False)
     for img_file in img_files:
         if not tstFFmpegDecode(img_file):
             self.logs.append((2, f'Decoding "{img_file.relative_to(aroot)}" failed.'))
@@ -910,7 +926,7 @@ def chkJointDiscs(self):
 
         #* audio check ***************************************************
 
-        aud_files = listFile(disc_dir, ext=AUD_EXTS_IN_CDS, rglob=False)
+        aud_files = self.snapshot.listFile(disc_dir, ext=AUD_EXTS_IN_CDS, rglob=False)
         aud_minfos = [getMediaInfo(f) for f in aud_files]
 
         valid_aud_files = []
@@ -924,8 +940,9 @@ def chkJointDiscs(self):
 
         aud_gtrs = [m.general_tracks[0] for m in valid_aud_minfos]
         aud_atrs = [m.audio_tracks[0] for m in valid_aud_minfos]
+        aud_oks = tstAudioFilesValid(valid_aud_files, mp=NUM_CPU_JOBS)
 
-        for aud_file, gtr, atr in zip(valid_aud_files, aud_gtrs, aud_atrs):
+        for aud_file, gtr, atr, aud_ok in zip(valid_aud_files, aud_gtrs, aud_atrs, aud_oks):
             rel_path = aud_file.relative_to(aroot)
             match gtr.format:
                 case 'FLAC':
@@ -965,28 +982,29 @@ def chkJointDiscs(self):
                     f'The album name in dirname is not seen in audio metadata data under "{disc_dir.relative_to(aroot)}".'
                     ))
 
-            if not tstFFmpegDecode(aud_file):
-                logs.append((2, f'Decoding "{aud_file.relative_to(aroot)}" failed.'))
+            if not aud_ok:
+                logs.append((2, f'Decoding "{aud_file.relative_to(aroot)}" failed or mismatches the FLAC MD5 signature.'))
 
         #* cue check *****************************************************
 
-        # TODO use utils.cuesheet to better check the files
-        cue_files = listFile(disc_dir, ext='cue', rglob=False)
+        cue_files = self.snapshot.listFile(disc_dir, ext='cue', rglob=False)
+        cue_sheets: list[tuple[CueSheet, list[Path]]] = []
         for cue_file in cue_files:
-            if tstFileEncoding(cue_file, 'utf-8-sig'):
-                content = cue_file.read_text(encoding='utf-8-sig')
-                if m := re.search(CUE_FILENAME_LINE_REGEX, content):
-                    filename = m.group('filename')
-                    if cue_file.with_name(filename) not in aud_files:
-                        logs.append(
-                            (2, f'Cannot find "{filename}" specified in CUESHEET "{cue_file.relative_to(aroot)}".')
-                            )
+            if tstFileEncoding(cue_file, 'utf-8-sig') and (cue := parseCueSheet(cue_file)):
+                cue_aud_files = [cue_file.with_name(filename) for filename in cue.files]
+                missing = [f.name for f in cue_aud_files if f not in aud_files]
+                for filename in missing:
+                    logs.append(
+                        (2, f'Cannot find "{filename}" specified in CUESHEET "{cue_file.relative_to(aroot)}".')
+                        )
+                if not missing:
+                    cue_sheets.append((cue, cue_aud_files))
             else:
                 logs.append((2, f'Failed to parse "{cue_file.relative_to(aroot)}".'))
 
         #* log check *****************************************************
 
-        log_files = listFile(disc_dir, ext='log', rglob=False)
+        log_files = self.snapshot.listFile(disc_dir, ext='log', rglob=False)
         for log_file in log_files:
             if tstFileEncoding(log_file, 'utf-16-le'):
                 pass
@@ -998,10 +1016,20 @@ def chkJointDiscs(self):
                     ))
             else:
                 logs.append((2, f'EAC LOG "{log_file.relative_to(aroot)}" decoding failed.'))
+                continue
+            # the checksums of a joint disc are split by its cuesheet, which must be the only one in the dir
+            if ENABLE_LOG_VERIFICATION_IN_AR and len(cue_sheets) == 1 and (eac_log := parseEACLog(log_file)):
+                try:
+                    track_sums, whole_sums = calcDiscChecksums(cue_sheets[0][1], cue=cue_sheets[0][0])
+                except ValueError:
+                    logs.append((2, f'Failed to verify EAC LOG "{log_file.relative_to(aroot)}" (decoding failed).'))
+                    continue
+                for mismatch in cmpDiscChecksumsWithLog(track_sums, whole_sums, eac_log):
+                    logs.append((2, f'EAC LOG "{log_file.relative_to(aroot)}" mismatches: {mismatch}.'))
 
         #* img check *****************************************************
 
-        img_files = listFile(disc_dir, ext=IMG_EXTS_IN_CDS, rglob=False)
+        img_files = self.snapshot.listFile(disc_dir, ext=IMG_EXTS_IN_CDS, rglob=False)
         for img_file in img_files:
             if not tstFFmpegDecode(img_file):
                 logs.append((2, f'Decoding "{img_file.relative_to(aroot)}" failed.'))
@@ -1,6 +1,6 @@
-import shutil
 import logging
 from pathlib import Path
+from typing import IO
 
 from configs import *
 from langs import *
@@ -26,16 +26,44 @@ def chkArcFile(cf: CF, logger: logging.Logger, decompress: bool = True) -> bool:
     if cf.ext not in VX_ARC_EXTS:
         logger.warning(UNSUPPORTED_EXT_TO_CHECK_1.format(cf.ext))
         return False
-    if not tstArchive(cf.path):
-        logger.warning(INVALID_FILE_1.format(cf.path))
+
+    if not decompress:
+        if not tstArchive(cf.path):
+            logger.warning(INVALID_FILE_1.format(cf.path))
+            return False
+        filenames = getFileList(cf.path)
+        return _chkArcMemberTypes(filenames, [], [], logger)
+
+    # walk the members only once in memory, which tests the archive, lists and validates the files at the same time
+    filenames: list[str] = []
+    invalid_fonts: list[str] = []
+    invalid_images: list[str] = []
+
+    def _chkMember(name: str, fo: IO[bytes]):
+        filenames.append(name)
+        if name.lower().endswith(COMMON_FONT_EXTS):
+            if not tstFontFile(fo, name): invalid_fonts.append(name)
+        elif name.lower().endswith(VX_IMG_EXTS):
+            if not _chkImageMember(name, fo, logger): invalid_images.append(name)
+
+    try:
+        walkArchive(cf.path, _chkMember)
+    except Exception:
+        logger.error(FAILED_TO_DECOMPRESS_1.format(cf.path))
         return False
 
-    filenames = getFileList(cf.path)
-    has_png, has_font = False, False
-    for filename in filenames:
-        if filename.lower().endswith(VX_IMG_EXTS): has_png = True
-        if filename.lower().endswith(COMMON_FONT_EXTS): has_font = True
-        if has_png and has_font: break
+    return _chkArcMemberTypes(filenames, invalid_fonts, invalid_images, logger)
+
+
+
+
+def _chkArcMemberTypes(
+    filenames: list[str], invalid_fonts: list[str], invalid_images: list[str], logger: logging.Logger
+    ) -> bool:
+
+    font_files = [f for f in filenames if f.lower().endswith(COMMON_FONT_EXTS)]
+    image_files = [f for f in filenames if f.lower().endswith(VX_IMG_EXTS)]
+    has_png, has_font = bool(image_files), bool(font_files)
 
     ok = True
 
@@ -46,21 +74,51 @@ def chkArcFile(cf: CF, logger: logging.Logger, decompress: bool = True) -> bool:
         logger.error('The file contains neither PNG nor FONT files.')
         ok = False
 
-    if decompress and (has_png or has_font):
-        temp_dir = TEMP_DIR_DECOMPRESS.joinpath(cf.path.name + TIMESTAMP)
-        if not extractARC(cf.path, temp_dir):
-            logger.error(FAILED_TO_DECOMPRESS_1.format(cf.path))
-            shutil.rmtree(temp_dir, ignore_errors=True)
-            return False
-        if has_png: ok = ok if chkImageArcDir(temp_dir, logger) else False
-        if has_font: ok = ok if chkFontArcDir(temp_dir, logger) else False
-        shutil.rmtree(temp_dir, ignore_errors=True)
+    if has_font and len(filenames) != len(font_files):
+        logger.error('The archive file contains non-FONT files.')
+        ok = False
+    if invalid_fonts:
+        logger.error('Some font files in the archive are NOT valid.')
+        ok = False
+    if has_png and len(filenames) != len(image_files):
+        logger.error('The archive file contains non-PNG files.')
+        ok = False
+    if invalid_images:
+        ok = False
 
     return ok
 
 
 
 
+def _chkImageMember(name: str, fo: IO[bytes], logger: logging.Logger) -> bool:
+    '''The in-memory counterpart of `chkCfImage()` for an image inside an archive.'''
+
+    filesize = fo.seek(0, 2)
+    fo.seek(0)
+    if filesize == 0:
+        logger.error(f'The file "{name}" is empty.')
+        return False
+    elif filesize < SMALL_IMAGE_FILE_SIZE:
+        logger.warning(f'The image file "{name}" is very small.')
+
+    ext = name.rsplit('.', 1)[-1].lower()
+    expected_format = EXTS2FORMATS.get(ext)
+    fmt = (fmt.lower() if (fmt := getMediaInfo(fo).general_tracks[0].format) else ext)
+    fo.seek(0)
+    if expected_format != fmt:
+        logger.error(f'The actual media format "{fmt}" mismatched file extension "{ext}" of "{name}".')
+        return False
+
+    if not tstFFmpegDecodeFile(fo):
+        logger.error(f'Failed to decode the image file "{name}".')
+        return False
+
+    return True
+
+
+
+
 def chkFontArcDir(path: Path, logger: logging.Logger) -> bool:
 
     if not path.is_dir():
@@ -138,13 +138,19 @@ def chkCfAudTracks(cf: CF, logger: Logger, decode: bool = True):
 
         # do a full decoding test for each audio track
         if decode:
-            if not tstFFmpegAudioDecode(cf.path, id=i):
+            # a standalone FLAC can be verified against its own MD5 signature in the same decoding pass
+            if cf.ext == 'flac' and (md5_ok := tstFlacMD5(cf.path)) is not None:
+                if not md5_ok:
+                    logger.error(f'The audio track #{i} mismatches the FLAC MD5 signature.')
+            elif not tstFFmpegAudioDecode(cf.path, id=i):
                 logger.error(f'The audio track #{i} failed to decode.')
 
 
 
 
-def cmpCfAudContent(input1: CF|list[CF], input2: CF|list[CF], logger: Logger) -> list[tuple[int, np.ndarray, int]]:
+def cmpCfAudContent(
+    input1: CF|list[CF], input2: CF|list[CF], logger: Logger, mp: int = NUM_CPU_JOBS
+    ) -> list[tuple[int, np.ndarray, int]]:
     '''
     Compare two groups of audios, supporting multi-track and multi-file.
     In each group, video files is concatenated in series; audio files is placed parallel (i.e. as a new track).
@@ -204,7 +210,7 @@ def cmpCfAudContent(input1: CF|list[CF], input2: CF|list[CF], logger: Logger) ->
             f'VR will only compare the first {audio_nums_to_cmp} audio track(s).'
             )
 
-    ret = []
+    jobs = []
     for (k, track1), (k2, track2) in zip(tracks1.items(), tracks2.items()):
         assert k == k2  # this should be never triggered
 
@@ -227,11 +233,17 @@ def cmpCfAudContent(input1: CF|list[CF], input2: CF|list[CF], logger: Logger) ->
             logger.error(f'#{k} audio tracks have different sampling rate.')
             continue
 
-        freq = freqs[0]
-        start = freq * CHK_OFFSET_STA
-        length = freq * CHK_OFFSET_LEN
-        audio1 = np.concatenate([readAudio(cf.path, id=i, start=start, length=length) for cf, i in track1])
-        audio2 = np.concatenate([readAudio(cf.path, id=i, start=start, length=length) for cf, i in track2])
+        jobs.append((k, track1, track2, freqs[0]))
+
+    # decode all the tracks of both sides at once, as the work is in the ffmpeg processes
+    items = [(cf.path, i, freq * CHK_OFFSET_STA, freq * CHK_OFFSET_LEN)
+             for _, track1, track2, freq in jobs for cf, i in track1 + track2]
+    audios = iter(readAudios(items, mp=mp))
+
+    ret = []
+    for k, track1, track2, freq in jobs:
+        audio1 = np.concatenate([next(audios) for _ in track1])
+        audio2 = np.concatenate([next(audios) for _ in track2])
 
         start1, start2 = calcAudioOffset(audio1, audio2, start=freq * CHK_OFFSET_STA, length=freq * CHK_OFFSET_LEN)
         if offset := (start1 - start2):
@@ -7,6 +7,8 @@ from utils import *
 from configs import *
 from helpers.corefile import CF
 
+import numpy as np
+
 
 __all__ = ['chkCfImage', 'chkScansImage', 'chkImageTracks', 'cmpImageContent']
 
@@ -122,46 +124,97 @@ def chkImageTracks(cf: CF, logger: Logger, decode: bool = True):
 
 
 
-def cmpImageContent(input1: CF|list[CF], input2: CF|list[CF], logger: Logger):
+def _cmpImagePair(cf1: CF, cf2: CF, label: str, logger: Logger) -> np.ndarray|None:
+    '''Compare the pixels of 2 image files. Return the difference map if they differ.'''
+    img1, img2 = cf1.image_tracks[0], cf2.image_tracks[0]
+    h1, w1, h2, w2 = img1.height, img1.width, img2.height, img2.width
+    if not (h1 and w1 and h2 and w2):
+        logger.error(f'Image pair {label} Failed to obtain the image info.')
+        return None
+    if h1 != h2 or w1 != w2:
+        logger.warning(f'Image pair {label} has different resolution: {w1}x{h1} vs {w2}x{h2}.')
+        return None
+    a1, a2 = readImage(cf1.path, w1, h1), readImage(cf2.path, w2, h2)
+    if a1 is None or a2 is None:
+        logger.error(f'Image pair {label} Failed to decode the image.')
+        return None
+    means, maxs, ratio, diff_map = calcImageDiff(a1, a2)
+    if not maxs.any():
+        logger.info(f'Image pair {label} is identical.')
+        return None
+    logger.warning(f'Image pair {label} differs in {ratio:.2%} pixels, '
+                   f'mean/max abs diff per channel: {"/".join(f"{m:.2f}" for m in means)} / {"/".join(map(str, maxs))}.')
+    return diff_map
+
+
+
+
+def cmpImageContent(
+    input1: CF|list[CF], input2: CF|list[CF], logger: Logger, mp: int = NUM_CPU_JOBS
+    ) -> list[tuple[str, np.ndarray]]:
+    '''
+    Compare the images of two groups.
+    1 vs 1: compare each image track, and the pixels if both are image files.
+    otherwise: match the image files of both groups by perceptual hash, then compare the pixels of the matched pairs.
+
+    Return: list[tuple[label, np.ndarray]] the difference map of each differing pair.
+    '''
 
     if isinstance(input1, CF): input1 = [input1]
     if isinstance(input2, CF): input2 = [input2]
 
     if not input1 and not input2:
         logger.error('Missing input(s).)')
-        return
+        return []
 
-    has_image = True
-    for cf in input1 + input2:
-        if not cf.has_menu:
-            has_image = False
-    if not has_image:
+    # a multi-input group may mix videos with images, which are picked out below
+    if not any(cf.has_image for cf in input1) or not any(cf.has_image for cf in input2):
         logger.info('No image track found in input(s).')
-        return
+        return []
 
+    ret = []
     match len(input1), len(input2):
         case 1, 1:
-            if not input1[0].has_image:
-                logger.error(f'"{input1[0].path}" has no image track.')
-            elif not input2[0].has_image:
-                logger.error(f'"{input2[0].path}" has no image track.')
-            else:
-                img1s = input1[0].image_tracks
-                img2s = input2[0].image_tracks
-                if len(img1s) != len(img2s):
-                    logger.error(f'Number of image tracks differs: {len(img1s)} vs {len(img2s)}')
-                for i, img1, img2 in zip(itertools.count(), img1s, img2s):
-                    h1, w1 = img1.height, img1.width
-                    h2, w2 = img2.height, img2.width
-                    if not (h1 and w1 and h2 and w2):
-                        logger.error(f'Image pair #{i} Failed to obtain the image info.')
-                        continue
-                    if h1 != h2 or w1 != w2:
-                        logger.warning(f'Image pair #{i} has different resolution: {w1}x{h1} vs {w2}x{h2}.')
-                    # TODO do image diff
-        case 1, _:
-            logger.info('1 vs multi-input is not supported for image check for now.')
-        case _, 1:
-            logger.info('Multi vs 1-input is not supported for image check for now.')
+            img1s = input1[0].image_tracks
+            img2s = input2[0].image_tracks
+            if len(img1s) != len(img2s):
+                logger.error(f'Number of image tracks differs: {len(img1s)} vs {len(img2s)}')
+            if input1[0].ext in COMMON_IMAGE_EXTS and input2[0].ext in COMMON_IMAGE_EXTS:
+                if (diff_map := _cmpImagePair(input1[0], input2[0], '#0', logger)) is not None:
+                    ret.append(('0', diff_map))
+                return ret
+            for i, img1, img2 in zip(itertools.count(), img1s, img2s):
+                h1, w1 = img1.height, img1.width
+                h2, w2 = img2.height, img2.width
+                if not (h1 and w1 and h2 and w2):
+                    logger.error(f'Image pair #{i} Failed to obtain the image info.')
+                    continue
+                if h1 != h2 or w1 != w2:
+                    logger.warning(f'Image pair #{i} has different resolution: {w1}x{h1} vs {w2}x{h2}.')
         case _, _:
-            logger.info('Multi vs multi-input is not supported for image check for now.')
+            cf1s = [cf for cf in input1 if cf.ext in COMMON_IMAGE_EXTS]
+            cf2s = [cf for cf in input2 if cf.ext in COMMON_IMAGE_EXTS]
+            if len(cf1s) != len(input1) or len(cf2s) != len(input2):
+                logger.info('Only the image files are compared in multi-input image check.')
+            if len(cf1s) != len(cf2s):
+                logger.warning(f'Number of images differs: {len(cf1s)} vs {len(cf2s)}')
+            # hash the small thumbnails first, so only the matched pairs are decoded in full
+            thumbs = readVideoFrames([(cf.path, 0) for cf in cf1s + cf2s], width=72, height=64, mp=mp)
+            if any(t is None for t in thumbs):
+                logger.error('Failed to decode some images.')
+            idx1 = [i for i, t in enumerate(thumbs[:len(cf1s)]) if t is not None]
+            idx2 = [i for i, t in enumerate(thumbs[len(cf1s):]) if t is not None]
+            h1s = calcDHash(np.stack([thumbs[i] for i in idx1])) if idx1 else np.zeros((0, 64), bool)
+            h2s = calcDHash(np.stack([thumbs[len(cf1s) + i] for i in idx2])) if idx2 else np.zeros((0, 64), bool)
+            matches = matchImageHashes(h1s, h2s, MAX_VIDEO_CMP_HASH_DIST)
+            matched1, matched2 = set(i for i, _, _ in matches), set(j for _, j, _ in matches)
+            for i, j, _ in matches:
+                cf1, cf2 = cf1s[idx1[i]], cf2s[idx2[j]]
+                label = f'"{cf1.path.name}" vs "{cf2.path.name}"'
+                if (diff_map := _cmpImagePair(cf1, cf2, label, logger)) is not None:
+                    ret.append((cf1.path.stem, diff_map))
+            for i, k in enumerate(idx1):
+                if i not in matched1: logger.warning(f'Found no matching image for "{cf1s[k].path.name}" in group 2.')
+            for j, k in enumerate(idx2):
+                if j not in matched2: logger.warning(f'Found no matching image for "{cf2s[k].path.name}" in group 1.')
+    return ret
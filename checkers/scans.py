@@ -1,5 +1,4 @@
 import os
-import difflib
 import itertools
 from pathlib import Path
 from logging import Logger
@@ -31,10 +30,11 @@ def chkScansNaming(scans_dir: Path, logger: Logger):
 
     # TODO add a depth check
 
-    for img_dir in listDir(scans_dir):
+    snapshot = DirSnapshot(scans_dir)
+    for img_dir in snapshot.listDir(scans_dir):
 
         # **************************************************************************************************************
-        files = listFile(img_dir, ext=ALL_EXTS_IN_SCANS, rglob=False)
+        files = snapshot.listFile(img_dir, ext=ALL_EXTS_IN_SCANS, rglob=False)
 
         ext_upper_cased_files = [f for f in files if any((c in string.ascii_uppercase) for c in f.suffix)]
         for f in ext_upper_cased_files:
@@ -84,7 +84,7 @@ def chkScansNaming(scans_dir: Path, logger: Logger):
         # they are the normal behavior by the scanner
 
         #***************************************************************************************************************
-        dirs = listDir(img_dir, rglob=False)
+        dirs = snapshot.listDir(img_dir, rglob=False)
 
         lower_dirnames_map: dict[str, str] = {}
         lower_dirnames: list[str] = []
@@ -92,21 +92,7 @@ def chkScansNaming(scans_dir: Path, logger: Logger):
             lower_dirnames.append(dir.name.lower())
             lower_dirnames_map[dir.name.lower()] = dir.name
 
-        groups: list[set[str]] = []
-        for i, lower_dirname in enumerate(lower_dirnames):
-            # using [i:] make the matching return a list at least containing itself
-            # using a cutoff 0.5 to make matches such as '01' vs '02'
-            matches = difflib.get_close_matches(
-                lower_dirname, lower_dirnames[i:], n=len(lower_dirnames[i:]), cutoff=0.5
-                )
-            added = False
-            for group in groups:
-                if any((match in group) for match in matches):
-                    group.update(matches)
-                    added = True
-                    break
-            if not added:
-                groups.append(set(matches))
+        groups: list[set[str]] = groupSimilarNames(lower_dirnames)
 
         if DEBUG:
             for g1, g2 in itertools.combinations(groups, 2):
@@ -5,7 +5,7 @@ from logging import Logger
 from configs import *
 from utils import *
 from helpers.corefile import CF
-from langs import FOUND_ASS_EXTRA_SECTION_1, FOUND_ASS_GARBAGE_SECTION_0
+from langs import FOUND_ASS_EXTRA_SECTION_1, FOUND_ASS_GARBAGE_SECTION_0, FOUND_ASS_VSFILTERMOD_TAGS_1
 
 
 
@@ -27,12 +27,12 @@ def chkTextTracks(cf: CF, logger: Logger):
 
     for text_track in text_tracks:
         match text_track.format:
-            case 'PGS':
-                chkPGS(cf, logger)
-            case 'ASS':
-                chkPGS(cf, logger)
+            case 'PGS' | 'ASS':
+                pass
             case _:
                 logger.warning(f'Unhandled text track format "{text_track.format}".')
+    if ENABLE_PGS_CHECKING and any(text_track.format == 'PGS' for text_track in text_tracks):
+        chkPGS(cf, logger)
 
     if (cf.ext in VX_EXT_AUD_EXTS) and cf.text_tracks:
         logger.warning('External audio track should not have subtitle track.')
@@ -55,7 +55,12 @@ def chkTextTracks(cf: CF, logger: Logger):
 
 
 def chkPGS(cf: CF, logger: Logger):
-    logger.debug('PGS checking inside a video file is not supported yet.')
+    for i, events in getSubtitleEvents(cf.path).items():
+        if i >= len(cf.text_tracks) or cf.text_tracks[i].format != 'PGS': continue
+        if not events:
+            logger.warning(f'The PGS text track #{i} has no subtitle.')
+        else:
+            logger.debug(f'The PGS text track #{i} has {len(events)} display sets.')
 
 
 
@@ -71,10 +76,80 @@ def chkAssFile(cf: CF, logger: Logger):
         else:
             logger.info(FOUND_ASS_EXTRA_SECTION_1.format(section.name))
 
+    if tags := scanAssTagsInAssFileObj(ass_obj):
+        logger.warning(FOUND_ASS_VSFILTERMOD_TAGS_1.format(', '.join(tags)))
+
     # TODO add more ass content checking
 
 
 
 
+def _diffSortedEvents(events1: list[tuple], events2: list[tuple]) -> tuple[list[tuple], list[tuple]]:
+    '''Walk the 2 sorted event lists in one merge pass. Return the events only in the 1st, and only in the 2nd.'''
+    only1, only2 = [], []
+    i, j = 0, 0
+    while i < len(events1) and j < len(events2):
+        if events1[i] == events2[j]:
+            i, j = i + 1, j + 1
+        elif events1[i] < events2[j]:
+            only1.append(events1[i]); i += 1
+        else:
+            only2.append(events2[j]); j += 1
+    only1.extend(events1[i:])
+    only2.extend(events2[j:])
+    return only1, only2
+
+
+
+
+def _getTextTracksEvents(cfs: list[CF]) -> dict[int, list[tuple[int, int, str]]]:
+    '''
+    Video files are concatenated in series (so the events are shifted); others are placed parallel as new tracks.
+    The offset counts every video, including those without any text track.
+    '''
+    tracks : dict[int, list[tuple[int, int, str]]] = {}
+    offset = 0
+    for cf in [cf for cf in cfs if cf.has_video]:
+        if cf.has_text:
+            for i, events in getSubtitleEvents(cf.path).items():
+                tracks.setdefault(i, []).extend((start + offset, end + offset, h) for start, end, h in events)
+        offset += cf.duration
+    # each track of each standalone file takes the next key, e.g. MKV + .sc.ass + .tc.ass -> 0, 1, 2
+    for cf in [cf for cf in cfs if not cf.has_video and cf.has_text]:
+        for events in getSubtitleEvents(cf.path).values():
+            tracks[len(tracks)] = events
+    return tracks
+
+
+
+
 def cmpTextContent(fi1: CF|list[CF], fi2: CF|list[CF], logger: Logger):
-    logger.info('Text content comparison inside media files is not supported yet.')
+    '''
+    Compare the subtitle events of the text tracks (ASS/SRT/PGS) of two groups.
+    Each event is identified by its timestamps and the hash of its content, so a re-mux should keep all events identical.
+    '''
+
+    if isinstance(fi1, CF): fi1 = [fi1]
+    if isinstance(fi2, CF): fi2 = [fi2]
+
+    if not fi1 or not fi2:
+        logger.error('Missing input(s).')
+        return
+
+    tracks1 = _getTextTracksEvents(fi1)
+    tracks2 = _getTextTracksEvents(fi2)
+    if len(tracks1) != len(tracks2):
+        logger.warning(f'The number of text tracks mismatches: {len(tracks1)} vs {len(tracks2)}. '
+                       f'VR will only compare the first {min(len(tracks1), len(tracks2))} text track(s).')
+
+    for (k, events1), (_, events2) in zip(sorted(tracks1.items()), sorted(tracks2.items())):
+        only1, only2 = _diffSortedEvents(events1, events2)
+        if not only1 and not only2:
+            logger.info(f'Text #{k} looks the same ({len(events1)} events).')
+            continue
+        logger.warning(f'Text #{k} has {len(only1)}/{len(events1)} events only in group 1 '
+                       f'and {len(only2)}/{len(events2)} only in group 2.')
+        for tag, events in (('1', only1), ('2', only2)):
+            for start, end, _ in events[:5]:
+                logger.warning(f'Text #{k} event [{start/1000:.3f}s-{end/1000:.3f}s] is only in group {tag}.')
+
@@ -29,7 +29,7 @@ def chkCoreFileFormat(cf: CF, logger: Logger):
     match cf.ext:
         case 'mkv'|'mp4':
             chkCfTracks(cf, logger)
-            chkCfVidTracks(cf, logger)
+            chkCfVidTracks(cf, logger, decode=ENABLE_VIDEO_DECODING_IN_VR, packets=ENABLE_PACKET_CHECKING_IN_VR)
             chkCfAudTracks(cf, logger)
             chkMenuTracks(cf, logger)
             chkTextTracks(cf, logger)
@@ -1,24 +1,80 @@
 import re
 import logging
+from pathlib import Path
 from logging import Logger
 from utils import *
 from configs import *
 from helpers.corefile import CF
 
+import numpy as np
+
 
 __all__ = ['chkCfVidTracks', 'cmpVideoContent']
 
 
 
 
-def cmpVideoContent(cfs1: CF|list[CF], cfs2: CF|list[CF], logger: Logger):
-    logger.info('Video content comparison is not implemented yet.')
-    #TODO can we replace RPC's function here
+def _locateVideoTime(cfs: list[CF], t: float) -> tuple[Path, float]:
+    '''Map the time in the videos concatenated in series to the file and the time inside it.'''
+    for cf in cfs[:-1]:
+        if t < cf.duration / 1000: break
+        t -= cf.duration / 1000
+    else:
+        cf = cfs[-1]
+    return cf.path, t
+
 
 
 
+def cmpVideoContent(cfs1: CF|list[CF], cfs2: CF|list[CF], logger: Logger, mp: int = NUM_CPU_JOBS):
+    '''
+    Compare the video content of the two groups (each concatenated in series) on the frames sampled
+    every `VIDEO_CMP_INTERVAL` seconds at the same timestamps, decoded downscaled and concurrently.
+    '''
+
+    if isinstance(cfs1, CF): cfs1 = [cfs1]
+    if isinstance(cfs2, CF): cfs2 = [cfs2]
+    vcf1s = [cf for cf in cfs1 if cf.has_video]
+    vcf2s = [cf for cf in cfs2 if cf.has_video]
+    if not vcf1s or not vcf2s:
+        logger.error('Missing video in some input.')
+        return
 
-def chkCfVidTracks(cf: CF, logger: Logger, decode: bool = False):
+    dur1, dur2 = sum(cf.duration for cf in vcf1s), sum(cf.duration for cf in vcf2s)
+    if not dur1 or not dur2:
+        logger.error('Failed to read the video duration from some input.')
+        return
+    if not matchTime(dur1, dur2, MAX_DURATION_DIFF_BETWEEN_TRACKS):
+        logger.warning(f'The video durations mismatch: {dur1/1000:.3f}s vs {dur2/1000:.3f}s.')
+
+    duration = min(dur1, dur2) / 1000
+    times = list(np.arange(VIDEO_CMP_INTERVAL / 2, duration, VIDEO_CMP_INTERVAL)) or [duration / 2]
+    items = [_locateVideoTime(vcf1s, t) for t in times] + [_locateVideoTime(vcf2s, t) for t in times]
+    frames = readVideoFrames(items, mp=mp)
+    pairs = [(t, f1, f2) for t, f1, f2 in zip(times, frames[:len(times)], frames[len(times):])
+             if f1 is not None and f2 is not None]
+    if len(pairs) != len(times):
+        logger.error(f'Failed to decode {len(times) - len(pairs)}/{len(times)} sampled frames.')
+    if not pairs:
+        return
+
+    ts = np.array([t for t, _, _ in pairs])
+    psnr, ssim, dist = cmpFrames(np.stack([f1 for _, f1, _ in pairs]), np.stack([f2 for _, _, f2 in pairs]))
+    diffs = np.flatnonzero((psnr < MIN_VIDEO_CMP_PSNR) | (dist > MAX_VIDEO_CMP_HASH_DIST))
+    for i in diffs[:10]:
+        logger.warning(f'The video differs at {ts[i]:.3f}s (PSNR={psnr[i]:.1f}dB SSIM={ssim[i]:.3f} dHash={dist[i]}).')
+    if len(diffs) > 10:
+        logger.warning(f'... and {len(diffs) - 10} more sampled frames differ.')
+    if len(diffs):
+        logger.warning(f'{len(diffs)}/{len(ts)} sampled frames differ, '
+                       f'first at {ts[diffs[0]]:.3f}s, last at {ts[diffs[-1]]:.3f}s.')
+    else:
+        logger.info(f'Video looks the same ({len(ts)} sampled frames, min PSNR={psnr.min():.1f}dB).')
+
+
+
+
+def chkCfVidTracks(cf: CF, logger: Logger, decode: bool = False, packets: bool = False):
 
     if cf.ext not in COMMON_VIDEO_EXTS:
         logger.error(f'The file is not a known file type with video.')
@@ -83,7 +139,12 @@ def chkCfVidTracks(cf: CF, logger: Logger, decode: bool = False):
         if vtr.delay:
             logger.warning(f'The video track #{i} has a delay ({vtr.delay}).')
 
-        # do a full decoding test for each audio track
+        # do a full decoding test for each video track
         if decode:
-            if not tstFFmpegVideoDecode(cf.path, id=i):
-                logger.error(f'The video track #{i} failed to decode.')
+            for ts, msg in getFFmpegDecodeErrors(cf.path, id=i):
+                logger.error(f'The video track #{i} failed to decode in the segment from {ts / 1000:.3f}s: {msg}')
+
+    # without a full decoding, at least make sure every packet can be read out
+    if not decode and packets:
+        if not tstFFmpegPackets(cf.path):
+            logger.error('The file contains broken packets.')
@@ -398,6 +398,14 @@ ENABLED_FONT_NAME_IDS = (
 
 FONT_SUBFAMILY_NAME_IDS = (2, 17)
 
+# the override tags only rendered by VSFilterMod, which most players (libass/xy-VSFilter) ignore
+# NOTE 'fsc' is the tag taking a single scale (as opposed to the standard fscx/fscy)
+ASS_VSFILTERMOD_TAGS = (
+    '1img', '2img', '3img', '4img', '1vc', '2vc', '3vc', '4vc', '1va', '2va', '3va', '4va',
+    'distort', 'frs', 'fsc', 'fsvp', 'fshp', 'jitter', 'mover', 'moves3', 'moves4', 'movevc',
+    'rndx', 'rndy', 'rndz', 'rnds', 'rnd', 'z',
+    )
+
 # these are used to convert the language suffix to a uniformed one
 # so we can compare if different language suffixes are the same
 LANG_SUFFIX_UNIFORMATION_DICT = {
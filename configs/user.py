@@ -32,6 +32,23 @@ RAR_PATH : str = ''
 # all decompressed files will be immediately deleted after the program exits
 TEMP_DIRPATH_DECOMPRESS : str = '$TEMP'
 
+# archives inside the input archive (e.g. a zip of scans shipped in a rar) are also decompressed, up to this depth
+# the inner archives are read directly from the outer one, without being written to disk first
+# set 0 to keep the inner archives as-is
+MAX_NESTED_ARC_DEPTH : int = 2
+# stop decompressing nested archives if the decompressed content exceeds this size (unit: B), against archive bombs
+MAX_NESTED_ARC_SIZE : int = 256 * 1024**3
+
+# use the native 7-Zip/unrar binaries (multithreaded, much faster) to decompress archives if found on PATH
+# set False to always use the python libraries
+ARC_USE_NATIVE_BACKEND : bool = True
+
+# the font names read from the font files are cached in this file, keyed by the font file content
+# so checking the fonts of a shared font pack or a repeated season again is almost instant
+#! you should use '$' to indicate an environment variable even if on Windows
+# leave it empty to disable the cache
+FONT_NAME_CACHE_PATH : str = '$TEMP/AC-FontNames.json'
+
 # the temporary directory for SR to create hardlinks
 # a relative path is relative to the drive root where the working files are located
 #! if using an absolute path, make sure the path is on the same partition as your working files
@@ -73,6 +90,23 @@ ENABLE_FILE_CHECKING_IN_VP : bool = False
 # note this will much slow down VP
 ENABLE_FILE_CHECKING_IN_VP : bool = False
 
+# VR can fully decode the video tracks to catch a broken bitstream
+# the timeline is split into keyframe-aligned segments decoded in parallel, but this is still slow on long videos
+ENABLE_VIDEO_DECODING_IN_VR : bool = False
+
+# if not fully decoding, VR can at least read out every packet of the videos (without decoding)
+# this catches truncated/corrupted files at nearly the disk speed
+ENABLE_PACKET_CHECKING_IN_VR : bool = False
+
+# the file checking can also read out the PGS subtitle tracks to warn on an empty one
+# note this demuxes the whole video file (tens of GB for a BD remux)
+ENABLE_PGS_CHECKING : bool = False
+
+# AD can skip the upfront decoding test of the lossless audio, and let the transcoding to FLAC be the decoding test
+# a failed transcoding then marks the source invalid, which saves a whole decoding pass of every track
+# note the FLAC MD5 signature is not verified in AD this way, but AR will still do it
+ENABLE_TRANSCODE_AS_VALIDATION_IN_AD : bool = True
+
 
 # use at most this number of multi-proc workers for CPU-intensive jobs
 # the default value 0 means to use all physical CPU cores
@@ -99,6 +133,10 @@ ENABLE_VGMDB : bool = True
 ENABLE_MUSICBREAINZ : bool = False
 ENABLE_FREEDB : bool = False
 
+# whether to re-compute the EAC Copy CRC and AccurateRip checksums of every track in AR and compare them with the LOG
+# this takes one more decoding pass of each disc having an EAC LOG
+ENABLE_LOG_VERIFICATION_IN_AR : bool = True
+
 # proxy and user agent to connect outside
 #! refactoring vgmdb with requests has not been completed
 #! for now, you can only use http proxy, i.e. no socks5
@@ -176,6 +214,14 @@ assert XCORR_RATIO >= 2 # 2 means only exactly match is accepted
 # NOTE 1 in 16-bit integer PCM == 1.5e-6 for floating PCM (2**16*1.5e-5=0.98)
 MAX_DIFF_MEAN : int = 1
 
+# VR compares the video content on the frames sampled every this number of seconds at the same timestamps of both inputs
+# the frames are downscaled to small grayscale images, which is enough to catch a wrong episode or a mis-trimmed encode
+VIDEO_CMP_INTERVAL : int = 30
+# a sampled frame is considered different if its PSNR (dB) is below this value
+# or its perceptual hash (64 bits) differs by more than this number of bits
+MIN_VIDEO_CMP_PSNR : float = 20.0
+MAX_VIDEO_CMP_HASH_DIST : int = 12
+
 #* others --------------------------------------------------------------------------------------------------------------
 
 # this is the show name that will be applied when the program didn't correctly catch your mistake of forgetting filling any title for VD. This should never appear on your hard disk - but if you see it, please fill a bug report.
@@ -215,6 +261,14 @@ else:
 del os, pathlib, TEMP_DIRPATH_DECOMPRESS
 
 
+import os, pathlib
+if FONT_NAME_CACHE_PATH:
+    FONT_NAME_CACHE = pathlib.Path(os.path.expandvars(FONT_NAME_CACHE_PATH))
+else:
+    FONT_NAME_CACHE = None
+del os, pathlib, FONT_NAME_CACHE_PATH
+
+
 if not LANGUAGE:
     import locale
     LANGUAGE = locale.getdefaultlocale()[0]
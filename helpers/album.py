@@ -7,14 +7,13 @@ from pathlib import Path
 from logging import Logger
 from typing import Iterable, Callable, Optional
 from operator import attrgetter
-from multiprocessing import Pool
 
 from langs import *
 from utils import *
 from configs import *
 from loggers import initLogger
 import configs.runtime as cr
-from .misc import handleResourceSrc
+from .misc import handleResourceSrc, iterResourceSrcs, getSharedPool, runJobWithCRC32
 from .image import ImageFile
 from .video import VideoFile
 from .scans import cleanScansFilenames
@@ -197,11 +196,14 @@ def lookupVGMDB(album_info: AlbumInfo, logger):
 
 
 
-def listAlbumDirs(root: Path, logger: Logger, root_is_cds: bool = True) -> list[Path]:
+def listAlbumDirs(
+    root: Path, logger: Logger, root_is_cds: bool = True, snapshot: DirSnapshot|None = None
+    ) -> list[Path]:
     '''
     List all possible ALBUM directories under the "CDs" dir.
     This function can identify grouped album folders.
     The function also check if there is unnecessary files directly under the "CDs" directory.
+    Supply `snapshot` to list from an existing `DirSnapshot` instead of walking the dir again.
 
     Return: list[Path]: the list of album folder under "cds_dir"
     '''
@@ -215,11 +217,14 @@ def listAlbumDirs(root: Path, logger: Logger, root_is_cds: bool = True) -> list[
     if root_is_cds: logger.info(AR_INSPECTING_2.format(root, 'CDs ROOT'))
     else: logger.info(AR_INSPECTING_2.format(root, 'CDs CLUSTER'))
 
+    if not (snapshot and snapshot.covers(root)):
+        snapshot = DirSnapshot(root)
+
     ret = []
-    for subdir in listDir(root, rglob=False):
+    for subdir in snapshot.listDir(root, rglob=False):
 
-        subsubdirs = listDir(subdir, rglob=False)
-        subsubfiles = listFile(subdir, ext=ALL_EXTS_IN_CDS, rglob=False)
+        subsubdirs = snapshot.listDir(subdir, rglob=False)
+        subsubfiles = snapshot.listFile(subdir, ext=ALL_EXTS_IN_CDS, rglob=False)
 
         if len(subsubdirs) == 0 and len(subsubfiles) == 0:
             logger.warning(AR_FOUND_EMPTY_DIR_1.format(subdir))
@@ -241,7 +246,7 @@ def listAlbumDirs(root: Path, logger: Logger, root_is_cds: bool = True) -> list[
         #! only go deeper if the parent is CDs
         elif root_is_cds and any(re.match(ALBUM_DIR_MIN_PATTERN, ssd.name.lower()) for ssd in subsubdirs):
             logger.info(AR_FOUND_CLUSTER_1.format(subdir.name))
-            ret += listAlbumDirs(subdir, logger, root_is_cds=False)
+            ret += listAlbumDirs(subdir, logger, root_is_cds=False, snapshot=snapshot)
 
         else:
             logger.warning(AR_IGNORED_DIR_1.format(subdir.relative_to(root)))
@@ -591,7 +596,7 @@ def sortAudioDirs2Discs(aud_dirs: Iterable[Path], logger: Logger, root: Path) ->
 
 
 
-def _mvAlbumCDs(cd_paths: list[list[Path]], dst_cds_dir: Path, logger: Logger, root: Path) -> list[tuple[Path, Path]]:
+def _mvAlbumCDs(cd_paths: list[list[Path]], dst_cds_dir: Path, logger: Logger, root: Path) -> list[tuple[Path, Path, str]]:
 
     dsts: list[Path] = []
     jobs: list[tuple[Callable, tuple]] = []
@@ -606,12 +611,12 @@ def _mvAlbumCDs(cd_paths: list[list[Path]], dst_cds_dir: Path, logger: Logger, r
                     jobs.append((tryHardlinkThenCopy, (src, dst)))
                 case 'flac':
                     dst = (dst_dir / src.name).with_suffix('.flac')
-                    jobs.append((replaceIfSmaller, (src, dst, afile.bit)))
+                    jobs.append((replaceIfSmaller, (src, dst, afile.bit, ENABLE_TRANSCODE_AS_VALIDATION_IN_AD)))
                 case 'm4a':
-                    if afile.format == 'alac':
+                    if afile.audio_format == 'alac':
                         dst = (dst_dir / src.name).with_suffix('.flac')
                         jobs.append((toFLAC, (src, dst)))
-                    elif afile.format == 'aac':
+                    elif afile.audio_format == 'aac':
                         dst = (dst_dir / src.name).with_suffix('.m4a')
                         jobs.append((tryHardlinkThenCopy, (src, dst)))
                     else:
@@ -640,15 +645,14 @@ def _mvAlbumCDs(cd_paths: list[list[Path]], dst_cds_dir: Path, logger: Logger, r
             dsts.append(dst)
 
     paths = list(itertools.chain.from_iterable(cd_paths))
-    with Pool(NUM_CPU_JOBS) as pool:
-        logger.info(PROCESSING_QUEUED_JOBS_0)
-        succs = pool.map(_runJob, jobs)
-    if DEBUG: assert len(paths) == len(jobs) == len(dsts) == len(succs)
-
-    ret: list[tuple[Path, Path]] = []
-    for succ, src, dst in zip(succs, paths, dsts):
-        if succ:
-            ret.append((src, dst))
+    logger.info(PROCESSING_QUEUED_JOBS_0)
+    crc32s = getSharedPool().map(runJobWithCRC32, jobs)
+    if DEBUG: assert len(paths) == len(jobs) == len(dsts) == len(crc32s)
+
+    ret: list[tuple[Path, Path, str]] = []
+    for crc32, src, dst in zip(crc32s, paths, dsts):
+        if crc32:
+            ret.append((src, dst, crc32))
         else:
             logger.error(FAILED_TO_HANDLE_FILE_1.format(src.relative_to(root)))
 
@@ -916,7 +920,7 @@ def placeAlbums(ap_csv_path: Path, dst_root: Optional[Path] = None):
 
 
 
-def _mvAlbumBKs(bk_paths: Iterable[Path], dst_bks_dir: Path, logger: Logger, root: Path) -> list[tuple[Path, Path]]:
+def _mvAlbumBKs(bk_paths: Iterable[Path], dst_bks_dir: Path, logger: Logger, root: Path) -> list[tuple[Path, Path, str]]:
     bk_paths = set(bk_paths)
 
     if not bk_paths:
@@ -944,17 +948,16 @@ def _mvAlbumBKs(bk_paths: Iterable[Path], dst_bks_dir: Path, logger: Logger, roo
                 logger.info(GOT_UNSUPP_FILE_1.format(src))
         dsts.append(dst)
 
-    with Pool(NUM_CPU_JOBS) as pool:
-        logger.info(PROCESSING_QUEUED_JOBS_0)
-        succs = pool.map(_runJob, jobs)
-    if DEBUG: assert len(bk_paths) == len(jobs) == len(dsts) == len(succs)
+    logger.info(PROCESSING_QUEUED_JOBS_0)
+    crc32s = getSharedPool().map(runJobWithCRC32, jobs)
+    if DEBUG: assert len(bk_paths) == len(jobs) == len(dsts) == len(crc32s)
 
-    records: dict[int|str, tuple[Path, Path]] = {}
-    for succ, src, dst in zip(succs, bk_paths, dsts):
-        if succ:
+    records: dict[int|str, tuple[Path, Path, str]] = {}
+    for crc32, src, dst in zip(crc32s, bk_paths, dsts):
+        if crc32:
             fid = getFileID(dst)
             if DEBUG: assert fid not in records.keys(), GOT_IDENTICAL_FILE_1.format(src)
-            records[fid] = (src, dst)
+            records[fid] = (src, dst, crc32)
         else:
             logger.error(FAILED_TO_HANDLE_FILE_1.format(src.relative_to(root)))
 
@@ -968,30 +971,35 @@ def _mvAlbumBKs(bk_paths: Iterable[Path], dst_bks_dir: Path, logger: Logger, roo
         shutil.rmtree(dst_bks_dir, ignore_errors=True)
         return []
 
-    ret: list[tuple[Path, Path]] = []
+    # the tidying up only renames files, so the file ID still links to the record
+    ret: list[tuple[Path, Path, str]] = []
     for new_dst in listFile(dst_bks_dir):
-        if paths := records.get(getFileID(new_dst)):
-            src, dst = paths
-            ret.append((src, new_dst))
+        if record := records.get(getFileID(new_dst)):
+            src, dst, crc32 = record
+            ret.append((src, new_dst, crc32))
     return ret
 
 
 
 
-def _mvAlbumMVs(mv_paths: Iterable[Path], dst_mvs_dir: Path, logger: Logger, root: Path) -> list[tuple[Path, Path]]:
+def _mvAlbumMVs(mv_paths: Iterable[Path], dst_mvs_dir: Path, logger: Logger, root: Path) -> list[tuple[Path, Path, str]]:
+    mv_paths = list(mv_paths)
 
-    records: dict[int|str, tuple[Path, Path]] = {}
+    records: dict[int|str, tuple[Path, Path, str]] = {}
 
     if not mv_paths:
         shutil.rmtree(dst_mvs_dir, ignore_errors=True)
         return []
 
-    for src in mv_paths:
-        dst = dst_mvs_dir / src.relative_to(root)
-        if tryHardlinkThenCopy(src, dst):
+    dsts = [dst_mvs_dir / src.relative_to(root) for src in mv_paths]
+    jobs: list[tuple[Callable, tuple]] = [(tryHardlinkThenCopy, (src, dst)) for src, dst in zip(mv_paths, dsts)]
+    crc32s = getSharedPool().map(runJobWithCRC32, jobs)
+
+    for crc32, src, dst in zip(crc32s, mv_paths, dsts):
+        if crc32:
             fid = getFileID(dst)
             assert fid not in records.keys(), GOT_IDENTICAL_FILE_1.format(src)
-            records[fid] = (src, dst)
+            records[fid] = (src, dst, crc32)
         else:
             logger.error(FAILED_TO_HANDLE_FILE_1.format(src.relative_to(root)))
 
@@ -1004,21 +1012,24 @@ def _mvAlbumMVs(mv_paths: Iterable[Path], dst_mvs_dir: Path, logger: Logger, roo
         shutil.rmtree(dst_mvs_dir, ignore_errors=True)
         return []
 
-    ret: list[tuple[Path, Path]] = []
+    ret: list[tuple[Path, Path, str]] = []
     for new_dst in listFile(dst_mvs_dir):
-        if paths := records.get(getFileID(new_dst)):
-            src, dst = paths
-            ret.append((src, new_dst))
+        if record := records.get(getFileID(new_dst)):
+            src, dst, crc32 = record
+            ret.append((src, new_dst, crc32))
     return ret
 
 
 
 
-def processAlbumSourceDir(src_path: Path, dst_dir: Path, logger: Logger):
+def processAlbumSourceDir(
+    src_path: Path, dst_dir: Path, logger: Logger, prepared: tuple[Path, Path|None]|None = None
+    ):
     '''
     Process an album source from `src_path`, and place the processed files in `dst_dir`.
     An album source may be a directory or an archive file that contains one or more discs.
         Nested archives inside the dir or file are not supported for now.
+    `prepared` is the `(tmp, ret)` from `iterResourceSrcs()` if the source has been handled in advance.
     NOTE: the function assumes that all album files under the source are of the same album.
     NOTE: if they're from different albums, the function can still process them, but the output is unusable for now.
     '''
@@ -1038,15 +1049,22 @@ def processAlbumSourceDir(src_path: Path, dst_dir: Path, logger: Logger):
     except:
         logger.error(DEST_DIR_NOT_AVAIL_1.format(dst_dir))
         shutil.rmtree(dst_dir, ignore_errors=True)
+        if prepared and prepared[1] == prepared[0]: shutil.rmtree(prepared[0], ignore_errors=True)
         return
 
     #* check input, decompress if required -----------------------------------------------------------------------------
 
     # TODO: can we decompress archives inside the archive?
 
-    tmp_dir = TEMP_DIR_DECOMPRESS / AD_TMP_DIRNAME
-    if isinstance(ret := handleResourceSrc(src_path, tmp_dir, logger), Path):
+    if prepared:  # already decompressed in background by `iterResourceSrcs()`
+        tmp_dir, ret = prepared
+    else:
+        tmp_dir = TEMP_DIR_DECOMPRESS / AD_TMP_DIRNAME
+        ret = handleResourceSrc(src_path, tmp_dir, logger)
+    if isinstance(ret, Path):
         remove_src: bool = (ret == tmp_dir)
+        # files are read from `src_dir` (the decompressed dir of an archive), but reported with `src_path`
+        src_dir = ret
     else:
         logger.error(CANT_HANDLE_SRC_1.format(src_path))
         shutil.rmtree(dst_dir, ignore_errors=True)
@@ -1060,25 +1078,25 @@ def processAlbumSourceDir(src_path: Path, dst_dir: Path, logger: Logger):
 
     #* validate input files --------------------------------------------------------------------------------------------
 
-    with Pool(NUM_CPU_JOBS) as pool:
+    pool = getSharedPool()
 
-        afs = [AlbumFile(path) for path in listFile(src_path, ext=AD_AUD_EXTS)]
-        a_vals = pool.map(attrgetter('is_valid'), afs)
-        val_afs = [f for valid, f in zip(a_vals, afs) if valid]
-        for f in set(afs).difference(val_afs):
-            logger.error(INVALID_FILE_1.format(f.path.relative_to(src_path)))
+    afs = [AlbumFile(path) for path in listFile(src_dir, ext=AD_AUD_EXTS)]
+    a_vals = pool.map(attrgetter('is_probed' if ENABLE_TRANSCODE_AS_VALIDATION_IN_AD else 'is_valid'), afs)
+    val_afs = [f for valid, f in zip(a_vals, afs) if valid]
+    for f in set(afs).difference(val_afs):
+        logger.error(INVALID_FILE_1.format(f.path.relative_to(src_dir)))
 
-        ifs = [ImageFile(path) for path in listFile(src_path, ext=AD_IMG_EXTS)]
-        i_vals = pool.map(attrgetter('is_valid'), ifs)
-        val_ifs = [f for valid, f in zip(i_vals, ifs) if valid]
-        for f in set(ifs).difference(val_ifs):
-            logger.error(INVALID_FILE_1.format(f.path.relative_to(src_path)))
+    ifs = [ImageFile(path) for path in listFile(src_dir, ext=AD_IMG_EXTS)]
+    i_vals = pool.map(attrgetter('is_valid'), ifs)
+    val_ifs = [f for valid, f in zip(i_vals, ifs) if valid]
+    for f in set(ifs).difference(val_ifs):
+        logger.error(INVALID_FILE_1.format(f.path.relative_to(src_dir)))
 
-        vfs = [VideoFile(path) for path in listFile(src_path, ext=AD_VID_EXTS)]
-        v_vals = pool.map(attrgetter('is_valid'), vfs)
-        val_vfs = [f for valid, f in zip(v_vals, vfs) if valid]
-        for f in set(vfs).difference(val_vfs):
-            logger.error(INVALID_FILE_1.format(f.path.relative_to(src_path)))
+    vfs = [VideoFile(path) for path in listFile(src_dir, ext=AD_VID_EXTS)]
+    v_vals = pool.map(attrgetter('is_valid'), vfs)
+    val_vfs = [f for valid, f in zip(v_vals, vfs) if valid]
+    for f in set(vfs).difference(val_vfs):
+        logger.error(INVALID_FILE_1.format(f.path.relative_to(src_dir)))
 
     if not all(a_vals + i_vals + v_vals):
         _cleanUp4Exit(e=SKIP_INVALID_SOURCE_1.format(src_path.name))
@@ -1089,46 +1107,57 @@ def processAlbumSourceDir(src_path: Path, dst_dir: Path, logger: Logger):
 
     #* split files -----------------------------------------------------------------------------------------------------
 
-    cd_paths: Iterable[list[Path]] = sortAudioDirs2Discs(set(f.path.parent for f in val_afs), logger, src_path)
+    cd_paths: Iterable[list[Path]] = sortAudioDirs2Discs(set(f.path.parent for f in val_afs), logger, src_dir)
     bk_paths: Iterable[Path] = set(f.path for f in val_ifs).difference(itertools.chain.from_iterable(cd_paths))
     mv_paths: Iterable[Path] = set(f.path for f in val_vfs)
     logger.info(AD_FOUND_IN_TOTAL_3.format(len(cd_paths), len(bk_paths), len(mv_paths)))
 
     #* transcode/move files --------------------------------------------------------------------------------------------
 
-    cd_paths_mapping: list[tuple[Path, Path]] = _mvAlbumCDs(cd_paths, dst_cds_dir, logger, src_path)
-    bk_paths_mapping: list[tuple[Path, Path]] = _mvAlbumBKs(bk_paths, dst_bks_dir, logger, src_path)
-    mv_paths_mapping: list[tuple[Path, Path]] = _mvAlbumMVs(mv_paths, dst_mvs_dir, logger, src_path)
+    # each worker job hashes its output right after writing it, so no more pass is needed to read back the outputs
+    cd_paths_mapping: list[tuple[Path, Path, str]] = _mvAlbumCDs(cd_paths, dst_cds_dir, logger, src_dir)
+    bk_paths_mapping: list[tuple[Path, Path, str]] = _mvAlbumBKs(bk_paths, dst_bks_dir, logger, src_dir)
+    mv_paths_mapping: list[tuple[Path, Path, str]] = _mvAlbumMVs(mv_paths, dst_mvs_dir, logger, src_dir)
+
+    if ENABLE_TRANSCODE_AS_VALIDATION_IN_AD:
+        # the audio was only probed, so any audio failed in transcoding makes the source invalid
+        handled_paths = set(src for src, _, _ in cd_paths_mapping)
+        queued_paths = set(itertools.chain.from_iterable(cd_paths))
+        if failed_afs := [f for f in val_afs if (f.path in queued_paths) and (f.path not in handled_paths)]:
+            for f in failed_afs:
+                logger.error(INVALID_FILE_1.format(f.path.relative_to(src_dir)))
+            _cleanUp4Exit(e=SKIP_INVALID_SOURCE_1.format(src_path.name))
+            return
 
     #* record files info -----------------------------------------------------------------------------------------------
 
     info_dicts: list[dict[str, str]] = []
-    for src, dst in cd_paths_mapping:
+    for src, dst, crc32 in cd_paths_mapping:
         info_dicts.append({
-            CRC32_CN: getCRC32(dst),
+            CRC32_CN: crc32,
             AD_FILE_TYPE_CN: '1',
-            SD_ORIG_PATH_CN: src.relative_to(src_path.parent).as_posix(),
+            SD_ORIG_PATH_CN: (Path(src_path.name) / src.relative_to(src_dir)).as_posix(),
             SD_PROC_PATH_CN: dst.relative_to(dst_cds_dir).as_posix(),
             })
-    for src, dst in bk_paths_mapping:
+    for src, dst, crc32 in bk_paths_mapping:
         info_dicts.append({
-            CRC32_CN: getCRC32(dst),
+            CRC32_CN: crc32,
             AD_FILE_TYPE_CN: '2',
-            SD_ORIG_PATH_CN: src.relative_to(src_path.parent).as_posix(),
+            SD_ORIG_PATH_CN: (Path(src_path.name) / src.relative_to(src_dir)).as_posix(),
             SD_PROC_PATH_CN: dst.relative_to(dst_bks_dir).as_posix(),
             })
-    for src, dst in mv_paths_mapping:
+    for src, dst, crc32 in mv_paths_mapping:
         info_dicts.append({
-            CRC32_CN: getCRC32(dst),
+            CRC32_CN: crc32,
             AD_FILE_TYPE_CN: '3',
-            AD_ORIG_PATH_CN: src.relative_to(src_path.parent).as_posix(),
+            AD_ORIG_PATH_CN: (Path(src_path.name) / src.relative_to(src_dir)).as_posix(),
             AD_PROC_PATH_CN: dst.relative_to(dst_mvs_dir).as_posix(),
             })
 
     if not writeCSV(info_csv_path, quotFields4CSV(info_dicts)):
         logger.error(FAILED_TO_WRITE_INFO_CSV_1.format(info_csv_path))
 
-    if remove_src: shutil.rmtree(src_path, ignore_errors=True)
+    if remove_src: shutil.rmtree(src_dir, ignore_errors=True)
     logger.info(PROCESSED_TO_1.format(dst_dir))
 
 
@@ -1143,6 +1172,10 @@ def processAlbumSourceDirs(input_paths: list[Path]):
     logger.info(USING_AD_1.format(AC_VERSION))
     logger.info(THE_OUTPUT_DIR_IS_1.format(dst_parent))
 
+    # the next source is decompressed in background while the current one is being processed in the shared pool
+    getSharedPool()  # spawn the workers before starting any background thread
     w = len(str(len(input_paths)))
-    for i, path in enumerate(input_paths, start=1):
-        processAlbumSourceDir(path, dst_parent / AD_DIRNAME_3.format(TIMESTAMP, f'{i:0>{w}}', path.name), logger)
\ No newline at end of file
+    srcs = iterResourceSrcs(input_paths, TEMP_DIR_DECOMPRESS / AD_TMP_DIRNAME, logger)
+    for i, (path, tmp, ret) in enumerate(srcs, start=1):
+        dst_dir = dst_parent / AD_DIRNAME_3.format(TIMESTAMP, f'{i:0>{w}}', path.name)
+        processAlbumSourceDir(path, dst_dir, logger, prepared=(tmp, ret))
\ No newline at end of file
@@ -101,6 +101,11 @@ class AlbumFile:
     def format(self) -> str:
         return fmt.lower() if (fmt := self.gtr.format) else self.ext
 
+    @property
+    def audio_format(self) -> str:
+        '''The codec of the audio track (e.g. 'alac'/'aac' in an m4a), unlike `format` which is the container.'''
+        return fmt.lower() if self.has_audio and (fmt := self.atr.format) else ''
+
     #* file type -------------------------------------------------------------------------------------------------------
 
     @property
@@ -156,9 +161,23 @@ class AlbumFile:
     def is_valid(self) -> bool:
         if not self.is_audio: return False
         if self.format != EXTS2FORMATS.get(self.ext): return False
+        if self.ext == 'flac' and (md5_ok := tstFlacMD5(self.path)) is not None: return md5_ok
         if not tstFFmpegDecode(self.path): return False
         return True
 
+    @property
+    def is_probed(self) -> bool:
+        '''
+        The cheap counterpart of `is_valid` for AD with `ENABLE_TRANSCODE_AS_VALIDATION_IN_AD`.
+        Files to be transcoded to FLAC are fully decoded by the transcoding anyway, so they are not decoded here,
+        while the files to be copied as-is only get their packets read out.
+        '''
+        if not self.is_audio: return False
+        if self.format != EXTS2FORMATS.get(self.ext): return False
+        if self.ext in ('flac', 'wav', 'wav64', 'tak', 'ape') or (self.ext == 'm4a' and self.audio_format == 'alac'):
+            return True
+        return tstFFmpegPackets(self.path)
+
     @property
     def is_hires(self) -> bool:
         return self.hr_bit > 0 or self.hr_freq > 0
@@ -33,9 +33,11 @@ __all__ = [
 
 class AlbumInfo:
 
-    def __init__(self, root: Path):
+    def __init__(self, root: Path, snapshot: DirSnapshot|None = None):
 
         self.root: Path = root
+        # the disc checks list files from this snapshot, so the album tree is walked only once
+        self.snapshot: DirSnapshot = snapshot if (snapshot and snapshot.covers(root)) else DirSnapshot(root)
 
         self.year: int = -100
         self.month: int = 0
@@ -106,7 +108,7 @@ class AlbumInfo:
 
         #* audio check ***************************************************
 
-        aud_files = listFile(disc_dir, ext=AUD_EXTS_IN_CDS, rglob=False)
+        aud_files = self.snapshot.listFile(disc_dir, ext=AUD_EXTS_IN_CDS, rglob=False)
         aud_minfos = [getMediaInfo(f) for f in aud_files]
 
         valid_aud_files = []
@@ -120,11 +122,12 @@ class AlbumInfo:
 
         aud_gtrs = [m.general_tracks[0] for m in valid_aud_minfos]
         aud_atrs = [m.audio_tracks[0] for m in valid_aud_minfos]
+        aud_oks = tstAudioFilesValid(valid_aud_files, mp=NUM_CPU_JOBS)
 
         seen_album_names = []
         seen_artists = []
 
-        for aud_file, gtr, atr in zip(valid_aud_files, aud_gtrs, aud_atrs):
+        for aud_file, gtr, atr, aud_ok in zip(valid_aud_files, aud_gtrs, aud_atrs, aud_oks):
             rel_path = aud_file.relative_to(aroot)
             match gtr.format:
                 case 'FLAC':
@@ -167,8 +170,8 @@ class AlbumInfo:
             if gtr.composer: seen_artists.append(gtr.composer)
             if gtr.album_composer: seen_artists.append(gtr.album_composer)
 
-            if not tstFFmpegDecode(aud_file):
-                self.logs.append((2, f'Decoding "{rel_path}" failed.'))
+            if not aud_ok:
+                self.logs.append((2, f'Decoding "{rel_path}" failed or mismatches the FLAC MD5 signature.'))
 
         seen_artists = list(set(seen_artists))
         if seen_artists and self.artists and not matchArtistsName(self.artists, seen_artists):
@@ -186,7 +189,7 @@ class AlbumInfo:
         #* log check *****************************************************
 
         # TODO add more LOG check
-        log_files = listFile(disc_dir, ext='log', rglob=False)
+        log_files = self.snapshot.listFile(disc_dir, ext='log', rglob=False)
         for log_file in log_files:
             if tstFileEncoding(log_file, 'utf-16-le'):
                 pass
@@ -198,10 +201,19 @@ class AlbumInfo:
                     ))
             else:
                 self.logs.append((2, f'EAC LOG "{log_file.relative_to(disc_dir)}" decoding failed.'))
+                continue
+            if ENABLE_LOG_VERIFICATION_IN_AR and (eac_log := parseEACLog(log_file)):
+                try:
+                    track_sums, whole_sums = calcDiscChecksums(valid_aud_files)
+                except ValueError:
+                    self.logs.append((2, f'Failed to verify EAC LOG "{log_file.relative_to(disc_dir)}" (decoding failed).'))
+                    continue
+                for mismatch in cmpDiscChecksumsWithLog(track_sums, whole_sums, eac_log):
+                    self.logs.append((2, f'EAC LOG "{log_file.relative_to(disc_dir)}" mismatches: {mismatch}.'))
 
         #* img check *****************************************************
 
-        img_files = listFile(disc_dir, ext=IMG_EXTS_IN_CDS, rglob=False)
+        img_files = self.snapshot.listFile(disc_dir, ext=IMG_EXTS_IN_CDS, rglob=False)
         for img_file in img_files:
             if not tstFFmpegDecode(img_file):
                 self.logs.append((2, f'Decoding "{img_file.relative_to(aroot)}" failed.'))
@@ -233,7 +245,7 @@ class AlbumInfo:
 
             #* audio check ***************************************************
 
-            aud_files = listFile(disc_dir, ext=AUD_EXTS_IN_CDS, rglob=False)
+            aud_files = self.snapshot.listFile(disc_dir, ext=AUD_EXTS_IN_CDS, rglob=False)
             aud_minfos = [getMediaInfo(f) for f in aud_files]
 
             valid_aud_files = []
@@ -247,8 +259,9 @@ class AlbumInfo:
 
             aud_gtrs = [m.general_tracks[0] for m in valid_aud_minfos]
             aud_atrs = [m.audio_tracks[0] for m in valid_aud_minfos]
+            aud_oks = tstAudioFilesValid(valid_aud_files, mp=NUM_CPU_JOBS)
 
-            for aud_file, gtr, atr in zip(valid_aud_files, aud_gtrs, aud_atrs):
+            for aud_file, gtr, atr, aud_ok in zip(valid_aud_files, aud_gtrs, aud_atrs, aud_oks):
                 rel_path = aud_file.relative_to(aroot)
                 match gtr.format:
                     case 'FLAC':
@@ -288,28 +301,29 @@ class AlbumInfo:
                         f'The album name in dirname is not seen in audio metadata data under "{disc_dir.relative_to(aroot)}".'
                         ))
 
-                if not tstFFmpegDecode(aud_file):
-                    logs.append((2, f'Decoding "{aud_file.relative_to(aroot)}" failed.'))
+                if not aud_ok:
+                    logs.append((2, f'Decoding "{aud_file.relative_to(aroot)}" failed or mismatches the FLAC MD5 signature.'))
 
             #* cue check *****************************************************
 
-            # TODO use utils.cuesheet to better check the files
-            cue_files = listFile(disc_dir, ext='cue', rglob=False)
+            cue_files = self.snapshot.listFile(disc_dir, ext='cue', rglob=False)
+            cue_sheets: list[tuple[CueSheet, list[Path]]] = []
             for cue_file in cue_files:
-                if tstFileEncoding(cue_file, 'utf-8-sig'):
-                    content = cue_file.read_text(encoding='utf-8-sig')
-                    if m := re.search(CUE_FILENAME_LINE_REGEX, content):
-                        filename = m.group('filename')
-                        if cue_file.with_name(filename) not in aud_files:
-                            logs.append(
-                                (2, f'Cannot find "{filename}" specified in CUESHEET "{cue_file.relative_to(aroot)}".')
-                                )
+                if tstFileEncoding(cue_file, 'utf-8-sig') and (cue := parseCueSheet(cue_file)):
+                    cue_aud_files = [cue_file.with_name(filename) for filename in cue.files]
+                    missing = [f.name for f in cue_aud_files if f not in aud_files]
+                    for filename in missing:
+                        logs.append(
+                            (2, f'Cannot find "{filename}" specified in CUESHEET "{cue_file.relative_to(aroot)}".')
+                            )
+                    if not missing:
+                        cue_sheets.append((cue, cue_aud_files))
                 else:
                     logs.append((2, f'Failed to parse "{cue_file.relative_to(aroot)}".'))
 
             #* log check *****************************************************
 
-            log_files = listFile(disc_dir, ext='log', rglob=False)
+            log_files = self.snapshot.listFile(disc_dir, ext='log', rglob=False)
             for log_file in log_files:
                 if tstFileEncoding(log_file, 'utf-16-le'):
                     pass
@@ -321,10 +335,20 @@ class AlbumInfo:
                         ))
                 else:
                     logs.append((2, f'EAC LOG "{log_file.relative_to(aroot)}" decoding failed.'))
+                    continue
+                # the checksums of a joint disc are split by its cuesheet, which must be the only one in the dir
+                if ENABLE_LOG_VERIFICATION_IN_AR and len(cue_sheets) == 1 and (eac_log := parseEACLog(log_file)):
+                    try:
+                        track_sums, whole_sums = calcDiscChecksums(cue_sheets[0][1], cue=cue_sheets[0][0])
+                    except ValueError:
+                        logs.append((2, f'Failed to verify EAC LOG "{log_file.relative_to(aroot)}" (decoding failed).'))
+                        continue
+                    for mismatch in cmpDiscChecksumsWithLog(track_sums, whole_sums, eac_log):
+                        logs.append((2, f'EAC LOG "{log_file.relative_to(aroot)}" mismatches: {mismatch}.'))
 
             #* img check *****************************************************
 
-            img_files = listFile(disc_dir, ext=IMG_EXTS_IN_CDS, rglob=False)
+            img_files = self.snapshot.listFile(disc_dir, ext=IMG_EXTS_IN_CDS, rglob=False)
             for img_file in img_files:
                 if not tstFFmpegDecode(img_file):
                     logs.append((2, f'Decoding "{img_file.relative_to(aroot)}" failed.'))
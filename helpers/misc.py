@@ -2,12 +2,15 @@ from __future__ import annotations
 
 import os
 import re
+import atexit
 import shutil
 import itertools
 from pathlib import Path
 from logging import Logger
-from concurrent.futures import ProcessPoolExecutor
-from typing import Callable, Optional, Iterable
+from multiprocessing import Pool
+from multiprocessing.pool import Pool as PoolType
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Optional, Iterable, Iterator
 import traceback
 import contextlib
 
@@ -31,6 +34,9 @@ __all__ = [
     'filterVxFilePaths',
     'guessVolNumsFromPaths',
     'handleResourceSrc',
+    'iterResourceSrcs',
+    'getSharedPool',
+    'runJobWithCRC32',
     ]
 
 
@@ -189,8 +195,9 @@ def filterVxFilePaths(src_path: Path, logger: Optional[Logger] = None) -> list[P
 
     if logger: logger.info(VP_LOCATING_0)
 
-    all_paths = filterOutCDsScans(listFile(src_path))
-    vx_paths = filterOutCDsScans(listFile(src_path, ext=VX_ALL_EXTS))
+    snapshot = DirSnapshot(src_path)
+    all_paths = filterOutCDsScans(snapshot.listFile(src_path))
+    vx_paths = filterOutCDsScans(snapshot.listFile(src_path, ext=VX_ALL_EXTS))
     for path in (diffs := set(all_paths).difference(vx_paths)):
         if logger: logger.info(DISALLOWED_FILE_1.format(path))
 
@@ -251,23 +258,26 @@ def guessVolNumsFromPaths(paths: list[Path], parent: Optional[Path] = None,
 
 
 
-def handleResourceSrc(src: Path, tmp: Path, logger: Optional[Logger] = None) -> Path|None:
+def handleResourceSrc(
+    src: Path, tmp: Path, logger: Optional[Logger] = None, password: str|None = None
+    ) -> Path|None:
     '''
     Check the availability of `src` dir and return it.
     Decompress `src` to `tmp` if it is an archive file, and return `tmp`.
+    Archives inside the archive are also decompressed, up to `MAX_NESTED_ARC_DEPTH` levels.
+    `password` is tried first, then the password is prompted if still required.
     '''
     if src.resolve().as_posix().lower() == tmp.resolve().as_posix().lower():
         if logger: logger.error(CANT_EXTRACT_TO_SRC_1.format(src))
         return
 
-    # TODO: can we decompress archives inside the archive?
     if src.is_file():
         if src.suffix.lower().endswith(AD_ARC_EXTS):
             if logger: logger.info(DECOMPRESSING_2.format(src, tmp))
             try:
                 assert not tmp.is_file()
                 tmp.mkdir(parents=True, exist_ok=True)
-                if extractArcWithPwdPrompt(src, tmp) != None:
+                if extractArcWithPwdPrompt(src, tmp, password, max_depth=MAX_NESTED_ARC_DEPTH, max_size=MAX_NESTED_ARC_SIZE) != None:
                     return tmp
             except:
                 if logger: logger.error(DECOMPRESS_FAILED_2.format(src, tmp))
@@ -281,3 +291,68 @@ def handleResourceSrc(src: Path, tmp: Path, logger: Optional[Logger] = None) ->
     else:
         if logger: logger.error(CANT_LOCATE_DIR_1.format(src))
         return
+
+
+
+
+def iterResourceSrcs(
+    srcs: list[Path], tmp_parent: Path, logger: Optional[Logger] = None
+    ) -> Iterator[tuple[Path, Path, Path|None]]:
+    '''
+    Yield `(src, tmp, ret)` for each of `srcs` in order, where `ret` is the return of `handleResourceSrc(src, tmp)`.
+    Each source gets its own `tmp` under `tmp_parent`,
+    so the next source can already be decompressing in background while the caller is processing the current one.
+    '''
+    w = len(str(len(srcs)))
+    tmps = [tmp_parent / f'{i:0>{w}}' for i in range(1, len(srcs) + 1)]
+    with ThreadPoolExecutor(1) as exe:
+
+        def submit(src: Path, tmp: Path):
+            # the password is asked here in the caller thread while the background is idle
+            # so the prompt never interleaves with the console output of the decompression
+            password = None
+            if src.is_file() and src.suffix.lower().endswith(AD_ARC_EXTS):
+                try:
+                    if (password := promptArchivePassword(src)) is None:
+                        return exe.submit(lambda: None)  # cancelled by the user
+                except:
+                    pass  # leave the error to `handleResourceSrc()`
+            return exe.submit(handleResourceSrc, src, tmp, logger, password)
+
+        futures = [submit(srcs[0], tmps[0])] if srcs else []
+        for i, (src, tmp) in enumerate(zip(srcs, tmps)):
+            ret = futures[i].result()
+            if i + 1 < len(srcs):
+                futures.append(submit(srcs[i + 1], tmps[i + 1]))
+            yield src, tmp, ret
+
+
+
+
+_SHARED_POOL: PoolType|None = None
+
+
+def _closeSharedPool():
+    global _SHARED_POOL
+    if _SHARED_POOL is not None:
+        _SHARED_POOL.close()
+        _SHARED_POOL.join()
+        _SHARED_POOL = None
+
+
+def getSharedPool() -> PoolType:
+    '''
+    Get the long-lived process pool shared by every source and every stage in AD/SD.
+    The workers are spawned once at the first call instead of per source/stage, and are closed at exit.
+    '''
+    global _SHARED_POOL
+    if _SHARED_POOL is None:
+        _SHARED_POOL = Pool(NUM_CPU_JOBS)
+        atexit.register(_closeSharedPool)
+    return _SHARED_POOL
+
+
+def runJobWithCRC32(job: tuple[Callable, tuple]) -> str:
+    '''Run a job of `(func, (src, dst, ...))` and hash `dst` in the same worker, return '' if the job failed.'''
+    if not job[0](*job[1]): return ''
+    return getCRC32(job[1][1])
@@ -1,7 +1,6 @@
 import os
 import shutil
 import logging
-import difflib
 import platform
 import traceback
 import itertools
@@ -9,17 +8,16 @@ from pathlib import Path
 from logging import Logger
 from operator import attrgetter
 from typing import Callable, Iterable, Optional
-from multiprocessing import Pool
 
 from langs import *
 from utils import *
 from configs import *
 from checkers.scans import chkScansNaming, chkScansFiles
-from utils.fileutils import listFile, listDir
+from utils.fileutils import listFile, listDir, DirSnapshot
 from loggers import initLogger
 from .summaries import logScansSummary
 from .image import ImageFile
-from .misc import handleResourceSrc
+from .misc import handleResourceSrc, iterResourceSrcs, getSharedPool, runJobWithCRC32
 from .dirgetter import *
 from .naming import *
 
@@ -50,8 +48,9 @@ def _runJob(job: tuple[Callable, tuple]) -> bool:
 
 def filterScansFiles(src_path: Path, logger: Optional[Logger] = None) -> list[Path]:
 
-    all_paths = listFile(src_path)
-    scans_files = listFile(src_path, ext=ALL_EXTS_IN_SCANS)
+    snapshot = DirSnapshot(src_path)
+    all_paths = snapshot.listFile(src_path)
+    scans_files = snapshot.listFile(src_path, ext=ALL_EXTS_IN_SCANS)
     for path in set(all_paths).difference(scans_files):
         if logger: logger.error(DISALLOWED_FILE_1.format(path))
     return scans_files
@@ -85,21 +84,7 @@ def cleanScansFilenames(scans_dir: Path, logger: Logger):
                 lower_filenames.append(file.name.lower())
                 lower2orig_filename_mapping[file.name.lower()] = file.name
 
-            groups: list[set[str]] = []
-            for i, lower_filename in enumerate(lower_filenames):
-                # using [i:] make the matching return a list at least containing itself
-                # using a cutoff 0.5 to make matches such as '01' vs '02'
-                matches = difflib.get_close_matches(
-                    lower_filename, lower_filenames[i:], n=len(lower_filenames[i:]), cutoff=0.5
-                    )
-                added = False
-                for group in groups:
-                    if any((match in group) for match in matches):
-                        group.update(matches)
-                        added = True
-                        break
-                if not added:
-                    groups.append(set(matches))
+            groups: list[set[str]] = groupSimilarNames(lower_filenames)
 
             if DEBUG:
                 for g1, g2 in itertools.combinations(groups, 2):
@@ -155,7 +140,7 @@ def getScansConfig(possible_paths: list[str|Path], logger: Logger|None = None) -
 
 
 
-def processScansSource(src_path: Path, dst_dir: Path, logger: Logger):
+def processScansSource(src_path: Path, dst_dir: Path, logger: Logger, prepared: tuple[Path, Path|None]|None = None):
 
     if DEBUG: logger.debug(PROCESSING_2.format(src_path, dst_dir))
     else: logger.info(PROCESSING_1.format(src_path))
@@ -170,12 +155,17 @@ def processScansSource(src_path: Path, dst_dir: Path, logger: Logger):
     except:
         logger.error(DEST_DIR_NOT_AVAIL_1.format(dst_dir))
         shutil.rmtree(dst_dir, ignore_errors=True)
+        if prepared and prepared[1] == prepared[0]: shutil.rmtree(prepared[0], ignore_errors=True)
         return
 
     #* check input, decompress if required -----------------------------------------------------------------------------
 
-    tmp_dir = TEMP_DIR_DECOMPRESS / SD_TMP_DIRNAME
-    if ret := handleResourceSrc(src_path, tmp_dir, logger):
+    if prepared:  # already decompressed in background by `iterResourceSrcs()`
+        tmp_dir, ret = prepared
+    else:
+        tmp_dir = TEMP_DIR_DECOMPRESS / SD_TMP_DIRNAME
+        ret = handleResourceSrc(src_path, tmp_dir, logger)
+    if ret:
         remove_src: bool = (ret == tmp_dir)
         src_path = ret
     else:
@@ -185,7 +175,7 @@ def processScansSource(src_path: Path, dst_dir: Path, logger: Logger):
 
     #* validate input files  -------------------------------------------------------------------------------------------
 
-    pool = Pool(NUM_CPU_JOBS)
+    pool = getSharedPool()
 
     ifs = [ImageFile(path) for path in listFile(src_path, ext=SD_IMG_EXTS)]
     vals = pool.map(attrgetter('is_valid'), ifs)
@@ -227,9 +217,12 @@ def processScansSource(src_path: Path, dst_dir: Path, logger: Logger):
         dsts.append(dst)
 
     logger.info(PROCESSING_QUEUED_JOBS_0)
-    succs = pool.map(_runJob, jobs)
+    crc32s = pool.map(runJobWithCRC32, jobs)
+    succs = [bool(crc32) for crc32 in crc32s]
     if DEBUG: assert len(succs) == len(val_ifs) == len(dsts)
-    crc32_to_orig_path: dict[str, Path] = {getCRC32(dst): img.path for (img, dst, s) in zip(val_ifs, dsts, succs) if s}
+    crc32_to_orig_path: dict[str, Path] = {crc32: img.path for (img, crc32) in zip(val_ifs, crc32s) if crc32}
+    # the tidying up below only renames files, so the file ID still links a file to its CRC32 hashed by the worker
+    fid_to_crc32: dict[int|str, str] = {getFileID(dst): crc32 for (dst, crc32) in zip(dsts, crc32s) if crc32}
 
     for img in (img for (img, succ) in zip(val_ifs, succs) if not succ):
         logger.error(FAILED_TO_HANDLE_FILE_1.format(img.path.relative_to(src_path)))
@@ -253,7 +246,7 @@ def processScansSource(src_path: Path, dst_dir: Path, logger: Logger):
 
     info_dicts: list[dict] = []
     for path in listFile(dst_scans_dir):
-        crc32 = getCRC32(path)
+        crc32 = fid_to_crc32.get(getFileID(path)) or getCRC32(path)
         info_dicts.append({
             CRC32_CN: crc32,
             SD_ORIG_PATH_CN: crc32_to_orig_path[crc32].relative_to(src_path.parent),
@@ -276,10 +269,13 @@ def processScansSourceDirs(src_paths: list[Path]):
     if DEBUG: assert dst_parent.is_dir(), CANT_INIT_OUTPUT_DIR_0
     logger = initLogger(dst_parent / SD_LOG_FILENAME)
     logger.info(USING_SD_1.format(AC_VERSION))
+    # the next source is decompressed in background while the current one is being processed in the shared pool
+    getSharedPool()  # spawn the workers before starting any background thread
     w = len(str(len(src_paths)))
-    for i, src_path in enumerate(src_paths, start=1):
+    srcs = iterResourceSrcs(src_paths, TEMP_DIR_DECOMPRESS / SD_TMP_DIRNAME, logger)
+    for i, (src_path, tmp, ret) in enumerate(srcs, start=1):
         dst_dir = dst_parent / SD_DIRNAME_3.format(TIMESTAMP, f'{i:0>{w}}', src_path.name)
-        processScansSource(src_path, dst_dir, logger)
+        processScansSource(src_path, dst_dir, logger, prepared=(tmp, ret))
         logger.info('')
 
 
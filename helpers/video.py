@@ -35,14 +35,14 @@ import logging
 import itertools
 from pathlib import Path
 from logging import Logger
-from typing import Optional, Iterable
+from typing import Optional, Iterable, Callable
 from multiprocessing import Pool
 
 from utils import *
 from langs import *
 from configs import *
 from checkers import *
-from loggers import initLogger
+from loggers import initLogger, initBufferedLogger, replayLogRecords
 from .naming import *
 from .misc import *
 from .subtitle import getAssTextLangDict
@@ -737,54 +737,67 @@ def doAutoIndexing(season: hsn.Season, logger: Logger):
     dep_cfs: list[hcf.CF] = [info for info in cfs if (info.f and re.match(CRC32_STRICT_REGEX, info.f))]
     named_cfs: list[hcf.CF] = [info for info in cfs if (info.f and not re.match(CRC32_STRICT_REGEX, info.f))]
 
-    state: dict[str, int|float] = {}
+    # the grouping keys are tuples of (e, g, t, l, c, x) or (e, g, t, l, c, i1, x)
+    # `remaining` counts the keys of the auto files not yet visited, so we dont need to rescan `auto_cfs[i + 1:]`
+    #! a file with `depends` reads its i1 from another file, which may get indexed in this loop
+    #! so its i1-key is not counted but looked up live, same as the old rescan did
+    remaining: dict[tuple[str, ...], int] = {}
+    own_keys: list[tuple[tuple[str, ...], ...]] = []
+    live_cfs: list[tuple[int, hcf.CF]] = []
+    for j, cf in enumerate(auto_cfs):
+        key1 = (cf.e, cf.g, cf.t, cf.l, cf.c, cf.x)
+        if cf.depends:
+            keys = (key1,)
+            live_cfs.append((j, cf))
+        else:
+            keys = (key1, (cf.e, cf.g, cf.t, cf.l, cf.c, '' if cf.i1 == None else cf.i1, cf.x))
+        for key in keys:
+            remaining[key] = remaining.get(key, 0) + 1
+        own_keys.append(keys)
+
+    state: dict[tuple[str, ...], int|float] = {}
     for i, acf in enumerate(auto_cfs):
+        for key in own_keys[i]:
+            remaining[key] -= 1
         i1 = acf.i1 if acf.i1 else ''
         i2 = acf.i1 if acf.i2 else ''
+        key1 = (acf.e, acf.g, acf.t, acf.l, acf.c, acf.x)
         if i1 and i2:
-            state[f'{acf.e}//{acf.g}//{acf.t}//{acf.l}//{acf.c}//{acf.x}'] = float(i1)
-            state[f'{acf.e}//{acf.g}//{acf.t}//{acf.l}//{acf.c}//{i1}//{acf.x}'] = float(i2)
+            state[key1] = float(i1)
+            state[(acf.e, acf.g, acf.t, acf.l, acf.c, i1, acf.x)] = float(i2)
         elif i1 and not i2:
-            state[f'{acf.e}//{acf.g}//{acf.t}//{acf.l}//{acf.c}//{acf.x}'] = float(i1)
+            state[key1] = float(i1)
             # whether we need to update i2 depends on whether there is a same key
-            key = f'{acf.e}//{acf.g}//{acf.t}//{acf.l}//{acf.c}//{i1}//{acf.x}'
+            key = (acf.e, acf.g, acf.t, acf.l, acf.c, i1, acf.x)
             if (v := state.get(key)):
                 v = int(v + 1)
                 acf.i2 = str(v)
                 state[key] = v
                 continue
-            else:  # we need to loop though the remaining to find the same key
-                for j, cf in enumerate(auto_cfs[i + 1:]):
-                    j1 = '' if cf.i1 == None else cf.i1
-                    j2 = '' if cf.i2 == None else cf.i2
-                    jey = f'{cf.e}//{cf.g}//{cf.t}//{cf.l}//{cf.c}//{j1}//{cf.x}'
-                    if key == jey:
-                        acf.i2 = str(1)
-                        state[key] = 1
-                        break
+            elif remaining.get(key) or any(
+                (cf.e, cf.g, cf.t, cf.l, cf.c, '' if cf.i1 == None else cf.i1, cf.x) == key
+                for j, cf in live_cfs if j > i
+                ):
+                acf.i2 = str(1)
+                state[key] = 1
         else:  # if not i1
-            key = f'{acf.e}//{acf.g}//{acf.t}//{acf.l}//{acf.c}//{acf.x}'
-            if (v := state.get(key)):
+            if (v := state.get(key1)):
                 v = int(v + 1)
                 acf.i1 = str(v)
-                state[key] = v
+                state[key1] = v
                 continue
-            else:  # we need to loop through the remaining to find the same key
-                for j, cf in enumerate(auto_cfs[i + 1:]):
-                    j1 = cf.i1 if cf.i1 else ''
-                    j2 = cf.i2 if cf.i2 else ''
-                    jey = f'{cf.e}//{cf.g}//{cf.t}//{cf.l}//{cf.c}//{cf.x}'
-                    if key == jey:
-                        acf.i1 = str(1)
-                        state[key] = 1
-                        break
+            elif remaining.get(key1):
+                acf.i1 = str(1)
+                state[key1] = 1
 
-    for i, dcf in enumerate(dep_cfs):
-        found = None
+    # only resolve crc32 when there is something to look up, the first file wins on duplicated crc32
+    crc32_to_cf: dict[str, hcf.CF] = {}
+    if dep_cfs:
         for cf in (auto_cfs + named_cfs):
-            if cf.crc == dcf.f:  # TODO use regex for dcf.c
-                found = cf
-                break
+            crc32_to_cf.setdefault(cf.crc, cf)
+
+    for i, dcf in enumerate(dep_cfs):
+        found = crc32_to_cf.get(dcf.f)  # TODO use regex for dcf.c
         if found != None:
             dcf.copyNaming(found)
             logger.info(f'File "{dcf.crc}" copied naming from file "{found.crc}".')
@@ -932,7 +945,10 @@ def writeCSV4ComplexVideoCmp(ouput_path: Path, grouping_dict: dict[str, list[tup
 
 
 
-def cmpVideoGroups(*groups: list[Path], grpname: str = '0', subgrps_names: list[str] = [], logger: Logger):
+def cmpVideoGroups(
+    *groups: list[Path], grpname: str = '0', subgrps_names: list[str] = [], logger: Logger, mp: int = NUM_CPU_JOBS
+    ):
+    '''`mp` caps the ffmpeg processes run at once by the comparisons.'''
 
     if len(groups) < 2:
         logger.error('At least 2 groups are required.')
@@ -943,23 +959,23 @@ def cmpVideoGroups(*groups: list[Path], grpname: str = '0', subgrps_names: list[
     elif not subgrps_names:
         subgrps_names = [str(i) for i in range(len(groups))]
 
-    for (n1, n2), (g1, g2) in zip(itertools.combinations(subgrps_names, 2), itertools.combinations(groups, 2)):
+    # probe each file once, and share its CF in all the pairs it joins
+    cf_groups = [[hcf.CF(f) for f in group] for group in groups]
+
+    for (n1, n2), (g1, g2) in zip(itertools.combinations(subgrps_names, 2), itertools.combinations(cf_groups, 2)):
 
         l1, l2 = len(g1), len(g2)
         if l1 == 0 or l2 == 0:
             logger.error(f'Cannot compare empty group.')
             continue
 
-        g1 = [hcf.CF(f) for f in g1]
-        g2 = [hcf.CF(f) for f in g2]
-
         if any(cf.has_video for cf in g1 + g2):
             logger.info('Comparing video...')
-            cmpVideoContent(g1, g2, logger)
+            cmpVideoContent(g1, g2, logger, mp=mp)
 
         if any(cf.has_audio for cf in g1 + g2):
             logger.info('Comparing audio...')
-            diff_audios = cmpCfAudContent(g1, g2, logger)
+            diff_audios = cmpCfAudContent(g1, g2, logger, mp=mp)
             for k, diff_audio, freq in diff_audios:
                 filename = f'VR-{TIMESTAMP}-DiffAudio-{grpname if grpname else 0}-{n1}vs{n2}-a{k}.log'
                 img_path = proposeFilePath([cf.path for cf in (g1 + g2)], filename)
@@ -974,8 +990,15 @@ def cmpVideoGroups(*groups: list[Path], grpname: str = '0', subgrps_names: list[
             cmpCfMenuContent(g1, g2, logger)
 
         if any(cf.has_image for cf in g1 + g2):
-            logger.info('Comparing menu...')
-            cmpImageContent(g1, g2, logger)
+            logger.info('Comparing image...')
+            diff_images = cmpImageContent(g1, g2, logger, mp=mp)
+            for k, diff_map in diff_images:
+                filename = f'VR-{TIMESTAMP}-DiffImage-{grpname if grpname else 0}-{n1}vs{n2}-{k}.png'
+                img_path = proposeFilePath([cf.path for cf in (g1 + g2)], filename)
+                if mkDiffHeatmap(img_path, diff_map):
+                    logger.info(SAVED_DIFF_HEATMAP_1.format(img_path))
+                else:
+                    logger.error(FAILED_TO_WRITE_1.format(img_path))
 
         if any(cf.has_text for cf in g1 + g2):
             logger.info('Comparing text...')
@@ -1237,6 +1260,45 @@ def findVideoMatchingBetweenDir(input1_dir: Path, input2_dir: Path):
 
 
 
+def _runVRJob(func: Callable, args: tuple, logger: Logger, mp: int):
+    # a failed group must not abort or hide the groups after it
+    try:
+        func(*args, logger=logger, mp=mp)
+    except Exception:
+        logger.exception(VR_GRP_FAILED_UNEXPECTEDLY_0)
+
+
+
+
+def _runVRJobWithBufferedLogger(job: tuple[Callable, tuple, int]) -> list[tuple[int, str]]:
+    func, args, mp = job
+    logger, records = initBufferedLogger('VR')
+    _runVRJob(func, args, logger, mp)
+    return records
+
+
+
+
+def _runVRJobsInOrder(jobs: list[tuple[Callable, tuple]], logger: Logger):
+    '''
+    Run the independent VR jobs `func(*args, logger=..., mp=...)` on a process pool bounded by the RAM,
+    and write out the log block of each job in the input order as soon as the preceding ones are finished.
+    The CPU jobs are shared among the workers, so `mp` of each job caps its own ffmpeg processes.
+    '''
+    num_workers = min(NUM_RAM_JOBS, len(jobs))
+    if num_workers > 1:
+        logger.info(VR_COMPARING_WITH_N_WORKERS_1.format(num_workers))
+        mp = max(1, NUM_CPU_JOBS // num_workers)
+        with Pool(num_workers) as pool:
+            for records in pool.imap(_runVRJobWithBufferedLogger, [(func, args, mp) for func, args in jobs]):
+                replayLogRecords(logger, records)
+    else:
+        for func, args in jobs:
+            _runVRJob(func, args, logger, NUM_CPU_JOBS)
+
+
+
+
 def cmpSimplyPairedVideos(paths: Iterable[Path]):
 
     paths = [Path(p) for p in paths]
@@ -1249,9 +1311,15 @@ def cmpSimplyPairedVideos(paths: Iterable[Path]):
     logger.info(VR_MODE_SIMP_PAIRED_CMP_0)
 
     total = len(group1)
-    for i, (path1, path2) in enumerate(zip(group1, group2)):
-        logger.info(VR_COMPARING_GRP_4.format(i + 1, total, path1, path2))
-        cmpVideoGroups([path1], [path2], logger=logger)
+    jobs = [(_cmpSimplyPairedVideo, (i + 1, total, path1, path2)) for i, (path1, path2) in enumerate(zip(group1, group2))]
+    _runVRJobsInOrder(jobs, logger)
+
+
+
+
+def _cmpSimplyPairedVideo(idx: int, total: int, path1: Path, path2: Path, logger: Logger, mp: int):
+    logger.info(VR_COMPARING_GRP_4.format(idx, total, path1, path2))
+    cmpVideoGroups([path1], [path2], logger=logger, mp=mp)
 
 
 
@@ -1268,61 +1336,64 @@ def cmpComplexlyPairedVideos(input_csv_path: Path):
         logging.shutdown()
         return
 
-    for group_id, group_items in groups.items():
+    jobs = [(_cmpComplexlyPairedGroup, (group_id, group_items)) for group_id, group_items in groups.items() if group_id]
+    _runVRJobsInOrder(jobs, logger)
 
-        if not group_id:
-            continue
 
-        logger.info('')
-        logger.info(VR_COMPARING_GRP_1.format(group_id))
 
-        subgrps, enableds, fullpaths = zip(*group_items)
-        enableds = toEnabledList(enableds)
-        for sub_grp, enabled, fullpath in zip(subgrps, enableds, fullpaths):
-            logger.info(VR_COMPARING_ITEM_1.format(sub_grp, ('E' if enabled else 'D'), fullpath))
 
-        if sum(enableds) < 2:
-            logger.error(VR_CANT_CHK_GRP_LT2_0)
-            continue
+def _cmpComplexlyPairedGroup(group_id: str, group_items: list[tuple[str, str, str]], logger: Logger, mp: int):
 
-        subgrps = [sub_grp for (sub_grp, enabled) in zip(subgrps, enableds) if enabled]
-        fullpaths = [full_path for (full_path, enabled) in zip(fullpaths, enableds) if enabled]
-        subgrp_tags = list(set(subgrps))
-        assert subgrp_tags  # this should never happen
-
-        fullpaths = [Path(fullpath) for fullpath in fullpaths]
-        all_files_exist = True
-        for fullpath in fullpaths:
-            if not fullpath.is_file():
-                logger.error(f'File "{fullpath}" is missing.')
-                all_files_exist = False
-        if not all_files_exist:
-            logger.error('Some files are missing. Please check again.')
-            continue
+    logger.info('')
+    logger.info(VR_COMPARING_GRP_1.format(group_id))
+
+    subgrps, enableds, fullpaths = zip(*group_items)
+    enableds = toEnabledList(enableds)
+    for sub_grp, enabled, fullpath in zip(subgrps, enableds, fullpaths):
+        logger.info(VR_COMPARING_ITEM_1.format(sub_grp, ('E' if enabled else 'D'), fullpath))
+
+    if sum(enableds) < 2:
+        logger.error(VR_CANT_CHK_GRP_LT2_0)
+        return
+
+    subgrps = [sub_grp for (sub_grp, enabled) in zip(subgrps, enableds) if enabled]
+    fullpaths = [full_path for (full_path, enabled) in zip(fullpaths, enableds) if enabled]
+    subgrp_tags = list(set(subgrps))
+    assert subgrp_tags  # this should never happen
+
+    fullpaths = [Path(fullpath) for fullpath in fullpaths]
+    all_files_exist = True
+    for fullpath in fullpaths:
+        if not fullpath.is_file():
+            logger.error(f'File "{fullpath}" is missing.')
+            all_files_exist = False
+    if not all_files_exist:
+        logger.error('Some files are missing. Please check again.')
+        return
 
-        # NOTE this is no longer considered as unsupported
-        # if len(valid_subgrps) > 2:
-        #     logger.error(f'>2 subgroups defined in group "{grouping_id}". It will be converted to 2 subgroups.')
-        #     valid_subgrps = valid_subgrps[:2]
-        #     subgrps = [(valid_subgrps[-1] if (sub_grp not in valid_subgrps) else sub_grp) for sub_grp in subgrps]
-        #     logger.info(f'Converted subgrouping:')
-        #     for sub_grp, fullpath in zip(subgrps, fullpaths):
-        #         logger.info(f'{sub_grp:s}: "{fullpath}"')
-
-        if len(subgrp_tags) == 1:
-            subgrps = ['1', '2']
-            if len(fullpaths) > 2:
-                logger.warning('>2 items defined in a single subgroup. Plz note auto subgrouping is not accurate.')
-                base_parent = fullpaths[0].parent
-                for i, fullpath in zip(itertools.count(), fullpaths):
-                    subgrps[i] = '1' if fullpath.is_relative_to(base_parent) else '2'
-                logger.info(f'Auto subgrouping:')
-                for sub_grp, fullpath in zip(subgrps, fullpaths):
-                    logger.info(f'{sub_grp:s}: "{fullpath}"')
-
-        src = [fullpath for (sub_grp, fullpath) in zip(subgrps, fullpaths) if sub_grp == subgrp_tags[0]]
-        refs = []
-        for subgrp_tag in subgrp_tags[1:]:
-            refs.append([fullpath for (sub_grp, fullpath) in zip(subgrps, fullpaths) if sub_grp == subgrp_tag])
-
-        cmpVideoGroups(src, *refs, grpname=group_id, subgrps_names=subgrp_tags, logger=logger)
+    # NOTE this is no longer considered as unsupported
+    # if len(valid_subgrps) > 2:
+    #     logger.error(f'>2 subgroups defined in group "{grouping_id}". It will be converted to 2 subgroups.')
+    #     valid_subgrps = valid_subgrps[:2]
+    #     subgrps = [(valid_subgrps[-1] if (sub_grp not in valid_subgrps) else sub_grp) for sub_grp in subgrps]
+    #     logger.info(f'Converted subgrouping:')
+    #     for sub_grp, fullpath in zip(subgrps, fullpaths):
+    #         logger.info(f'{sub_grp:s}: "{fullpath}"')
+
+    if len(subgrp_tags) == 1:
+        subgrps = ['1', '2']
+        if len(fullpaths) > 2:
+            logger.warning('>2 items defined in a single subgroup. Plz note auto subgrouping is not accurate.')
+            base_parent = fullpaths[0].parent
+            for i, fullpath in zip(itertools.count(), fullpaths):
+                subgrps[i] = '1' if fullpath.is_relative_to(base_parent) else '2'
+            logger.info(f'Auto subgrouping:')
+            for sub_grp, fullpath in zip(subgrps, fullpaths):
+                logger.info(f'{sub_grp:s}: "{fullpath}"')
+
+    src = [fullpath for (sub_grp, fullpath) in zip(subgrps, fullpaths) if sub_grp == subgrp_tags[0]]
+    refs = []
+    for subgrp_tag in subgrp_tags[1:]:
+        refs.append([fullpath for (sub_grp, fullpath) in zip(subgrps, fullpaths) if sub_grp == subgrp_tag])
+
+    cmpVideoGroups(src, *refs, grpname=group_id, subgrps_names=subgrp_tags, logger=logger, mp=mp)
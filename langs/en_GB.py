@@ -73,6 +73,7 @@ RENAMED_2 = 'Renamed "{}" -> "{}".'
 RUN_INTO_ERROR_0 = 'Run into an unexpected error as above. Please report.'
 SAVED_1 = 'Saved to "{}".'
 SAVED_SPECTROGRAM_1 = 'Saved spectrogram to "{}".'
+SAVED_DIFF_HEATMAP_1 = 'Saved image difference heatmap to "{}".'
 SKIPPING_UNSUPPORTED_FILE_1 = 'Skipping unsupported file "{}".'
 SRC_NO_AUD_FILE_1 = 'The source "{}" has no (valid) audio file.'
 SRC_NO_IMG_FILE_1 = 'The source "{}" has no (valid) image file.'
@@ -201,6 +202,8 @@ b: "{}"
 '''
 VR_COMPARING_GRP_1 = 'Comparing the group "{}" with the following items:'
 VR_COMPARING_ITEM_1 = '{} ({}): "{}"'
+VR_COMPARING_WITH_N_WORKERS_1 = 'Comparing the groups with {} workers ...'
+VR_GRP_FAILED_UNEXPECTEDLY_0 = 'The comparison of this group stopped due to an unexpected error. Please Report.'
 
 VR_MODE_SIMP_PAIRED_CMP_0 = 'VR Mode: compare simply paired videos (typically. dropped from cli)'
 VR_MODE_COMPLEX_PAIRED_CMP_0 = 'VR Mode: compare complexly paired videos (typically. dropped from cli)'
@@ -390,3 +393,4 @@ CANT_FIND_COMMON_PARENT_DIR_FOR_LOG_0 = '! Cannot find a common parent dir of yo
 
 FOUND_ASS_EXTRA_SECTION_1 = 'Found an extra ASS section "{}".'
 FOUND_ASS_GARBAGE_SECTION_0 = 'Found useless ASS section "Aegisub Garbage". Consider removing it using the standalone tools in the `scripts` folder.'
+FOUND_ASS_VSFILTERMOD_TAGS_1 = 'Found VSFilterMod-only tags "{}", which most players cannot render.'
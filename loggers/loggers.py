@@ -3,7 +3,7 @@ from pathlib import Path
 from configs.debug import LOG_LEVEL
 
 
-__all__ = ['initLogger']
+__all__ = ['initLogger', 'initBufferedLogger', 'replayLogRecords']
 
 
 
@@ -21,3 +21,38 @@ def initLogger(log_path: str|Path):
     logger.addHandler(logging.StreamHandler())  # print log to stdout
     logger.info(f'Initialised log at "{log_path}".')
     return logger
+
+
+
+
+class _ListHandler(logging.Handler):
+
+    def __init__(self, records: list[tuple[int, str]]):
+        super().__init__()
+        self.records = records
+
+    def emit(self, record: logging.LogRecord):
+        self.records.append((record.levelno, self.format(record)))
+
+
+
+
+def initBufferedLogger(name: str) -> tuple[logging.Logger, list[tuple[int, str]]]:
+    '''
+    Get a logger which keeps the (level, message) in a list instead of writing them out.
+    This is for the workers of a process pool, whose records are then sent back and replayed by `replayLogRecords()`.
+    '''
+    records = []
+    logger = logging.getLogger(name)
+    logger.handlers.clear()
+    logger.propagate = False
+    logger.setLevel(LOG_LEVEL)
+    logger.addHandler(_ListHandler(records))
+    return logger, records
+
+
+
+
+def replayLogRecords(logger: logging.Logger, records: list[tuple[int, str]]):
+    for level, msg in records:
+        logger.log(level, msg)
@@ -0,0 +1,60 @@
+import sys
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+
+import utils.cuesheet as cuesheet
+
+
+# the AR v1/v2 of the 1st track of `make_track(588 * 40, seed=1)`, as computed by the reference loop below
+KNOWN_FIRST_TRACK_AR = ('41fc55ff', '4a142395')
+
+
+def make_track(num_samples, seed=0):
+    """Generate a deterministic track of `num_samples` stereo 16-bit samples as LE uint32."""
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 2**32, num_samples, dtype=np.uint64).astype('<u4')
+
+
+def reference_ar(samples, first, last):
+    """The per-sample AccurateRip loop of accuraterip-checksum.c: 0-based `i`, multiplier `i + 1`."""
+    check_start = 5 * 588 - 1 if first else 0
+    check_end = len(samples) - 5 * 588 if last else len(samples)
+    v1 = v2 = 0
+    for i, sample in enumerate(samples.tolist()):
+        if check_start <= i < check_end:
+            prod = sample * (i + 1)
+            v1 = (v1 + prod) & 0xffffffff
+            v2 = (v2 + (prod & 0xffffffff) + (prod >> 32)) & 0xffffffff
+    return f'{v1:08x}', f'{v2:08x}'
+
+
+def streamed_ar(samples, first, last, chunk):
+    """Feed `_TrackChecksums` in chunks of `chunk` samples, as `calcDiscChecksums` does."""
+    acc = cuesheet._TrackChecksums(first=first)
+    data = samples.tobytes()
+    for i in range(0, len(data), chunk * 4):
+        acc.update(data[i:i + chunk * 4])
+    ret = acc.finish(last=last)
+    return ret['ar_v1'], ret['ar_v2']
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the AccurateRip checksums against a reference loop")
+    parser.add_argument("-n", "--sectors", type=int, default=40, help="track length in sectors")
+    args = parser.parse_args()
+
+    track = make_track(588 * 40, seed=1)
+    assert reference_ar(track, True, False) == KNOWN_FIRST_TRACK_AR, "the reference loop is broken"
+    assert streamed_ar(track, True, False, 4096) == KNOWN_FIRST_TRACK_AR, "1st track mismatches the known AR"
+
+    track = make_track(588 * args.sectors)
+    for first, last in ((True, False), (False, False), (False, True)):
+        expected = reference_ar(track, first, last)
+        for chunk in (1, 587, 588, 4096, len(track)):
+            got = streamed_ar(track, first, last, chunk)
+            assert got == expected, f"first={first} last={last} chunk={chunk}: {got} != {expected}"
+        print(f"first={first!s:<5} last={last!s:<5} v1={expected[0]} v2={expected[1]} ok")
@@ -0,0 +1,70 @@
+import argparse
+import os
+import sys
+import time
+import shutil
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import py7zr
+import pyzipper
+
+import utils.archive as archive
+
+
+def make_archives(folder, count, size):
+    """Generate `count` 7z and zip archives, each holding a semi-compressible payload of `size` MiB."""
+    payload = folder / "payload"
+    payload.mkdir()
+    block = os.urandom(2**16)
+    for i in range(4):
+        with (payload / f"{i:02d}.bin").open("wb") as fo:
+            for _ in range(size * 2**20 // 4 // (2 * len(block))):
+                fo.write(block)
+                fo.write(os.urandom(len(block)))
+    arcs = []
+    for i in range(count):
+        arc = folder / f"test_{i:02d}.7z"
+        with py7zr.SevenZipFile(arc, "w") as fo:
+            fo.writeall(payload, "payload")
+        arcs.append(arc)
+        arc = folder / f"test_{i:02d}.zip"
+        with pyzipper.ZipFile(arc, "w", compression=pyzipper.ZIP_DEFLATED) as fo:
+            for f in payload.iterdir():
+                fo.write(f, f"payload/{f.name}")
+        arcs.append(arc)
+    shutil.rmtree(payload)
+    return arcs
+
+
+def bench(arcs, folder, mp, native):
+    archive.ARC_USE_NATIVE_BACKEND = native
+    out = folder / f"out_{'native' if native else 'python'}_{mp}"
+    start = time.perf_counter()
+    ret = archive.extractMultiple(arcs, out, mp=mp)
+    elapsed = time.perf_counter() - start
+    shutil.rmtree(out, ignore_errors=True)
+    return elapsed, sum(1 for r in ret if r)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the archive extraction backends")
+    parser.add_argument("-n", "--count", type=int, default=4, help="number of 7z/zip archive pairs")
+    parser.add_argument("-s", "--size", type=int, default=64, help="payload size in MiB per archive")
+    parser.add_argument("-j", "--jobs", type=int, default=4, help="concurrent archives in the parallel run")
+    args = parser.parse_args()
+
+    print(f"native 7z: {archive._findNativeBackend('7z')}")
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = Path(tmp)
+        arcs = make_archives(folder, args.count, args.size)
+        for native in (False, True):
+            if native and not archive._findNativeBackend("7z"):
+                print("native backend not found, skipped")
+                continue
+            for mp in (1, args.jobs):
+                elapsed, ok = bench(arcs, folder, mp, native)
+                name = "native" if native else "python"
+                print(f"{name:>6} mp={mp:<2} {elapsed:8.2f}s  {ok}/{len(arcs)} ok")
@@ -0,0 +1,137 @@
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from ass_parser import read_ass
+from ass_tag_parser import parse_ass, AssTagFontName, AssTagResetStyle
+
+import utils.subtitle as subtitle
+
+
+HEADER = """[Script Info]
+ScriptType: v4.00+
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
+Style: Default,Source Han Sans,60,&H00FFFFFF,&H000000FF,&H00000000,&H00000000,0,0,0,0,100,100,0,0,1,2,2,2,10,10,10,1
+Style: Sign,Source Han Serif,48,&H00FFFFFF,&H000000FF,&H00000000,&H00000000,0,0,0,0,100,100,0,0,1,2,2,2,10,10,10,1
+Style: Karaoke,FOT-Rodin Pro,52,&H00FFFFFF,&H000000FF,&H00000000,&H00000000,0,0,0,0,100,100,0,0,1,2,2,2,10,10,10,1
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+"""
+
+
+def make_ass(n):
+    """Generate an ASS with `n` typesetting/karaoke-like events, most of which share the same override blocks."""
+    rnd = random.Random(0)
+    fonts = ["Source Han Sans", "Source Han Serif", "FOT-Rodin Pro", "A-OTF Shin Go Pro"]
+    lines = [HEADER]
+    for i in range(n):
+        t = f"0:{i // 6000 % 60:02d}:{i // 100 % 60:02d}.{i % 100:02d}"
+        if i % 3 == 0:
+            text = "".join(f"{{\\k{rnd.randint(5, 30)}\\fn{rnd.choice(fonts)}}}ka" for _ in range(8))
+            style = "Karaoke"
+        elif i % 3 == 1:
+            text = f"{{\\an7\\pos({i % 1920},{i % 1080})\\fn{rnd.choice(fonts)}\\fs{rnd.randint(40, 60)}\\rSign}}sign"
+            style = "Sign"
+        elif i % 50 == 2:  # a broken tag and an unclosed block, on which ass_tag_parser fails
+            text = f"{{\\fn{rnd.choice(fonts)}\\bord}}broken{{\\rKaraoke"
+            style = "Default"
+        else:
+            text = "{\\blur3\\bord2}dialogue\\N{\\i1}line{\\i0}"
+            style = "Default"
+        kind = "Comment" if i % 97 == 0 else "Dialogue"
+        lines.append(f"{kind}: 0,{t},{t},{style},,0,0,0,,{text}\n")
+    return read_ass("".join(lines))
+
+
+def old_listStyleNamesInAssFileObj(obj, used_only=False):
+    """The previous per-event style listing, kept as the reference."""
+    styles = {style.name: False for style in obj.styles}
+    if not used_only:
+        return True, [str(k) for k in styles.keys()]
+    ok = True
+    for event in obj.events:
+        if event.is_comment:
+            continue
+        if event.style_name and (event.style_name in styles.keys()):
+            styles[event.style_name] = True
+        try:
+            for tag in parse_ass(event.text):
+                if isinstance(tag, AssTagResetStyle):
+                    if tag.style and (tag.style in styles.keys()):
+                        styles[tag.style] = True
+        except:
+            ok = False
+        finally:
+            for style in subtitle._getStyleNameFromAssText(event.text):
+                if style and (style in styles.keys()):
+                    styles[style] = True
+    return ok, sorted(set([str(k) for (k, v) in styles.items() if v]))
+
+
+def old_listFontNamesInAssFileObj(obj, used_only=False):
+    """The previous per-event font listing, kept as the reference."""
+    ok, fonts = True, []
+    if not used_only:
+        for style in obj.styles:
+            if style.font_name: fonts.append(style.font_name)
+    else:
+        sub_ok, stylenames = old_listStyleNamesInAssFileObj(obj, used_only=used_only)
+        ok = ok if sub_ok else False
+        for style in obj.styles:
+            if style.name in stylenames:
+                if style.font_name: fonts.append(style.font_name)
+    for event in obj.events:
+        if event.is_comment:
+            continue
+        try:
+            for tag in parse_ass(event.text):
+                if isinstance(tag, AssTagFontName):
+                    fonts.append(tag.name)
+        except:
+            ok = False
+        finally:
+            fonts.extend(subtitle._getFontNamesFromAssText(event.text))
+    return ok, sorted(set(fonts))
+
+
+LISTINGS = (
+    (old_listFontNamesInAssFileObj, subtitle.listFontNamesInAssFileObj),
+    (old_listStyleNamesInAssFileObj, subtitle.listStyleNamesInAssFileObj),
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check and benchmark the ASS override tag scanning")
+    parser.add_argument("-n", "--events", type=int, default=50000, help="number of events")
+    args = parser.parse_args()
+
+    obj = make_ass(args.events)
+    print(f"{len(obj.events)} events")
+
+    for old, new in LISTINGS:
+        for used_only in (False, True):
+            assert old(obj, used_only) == new(obj, used_only), f"{new.__name__}(used_only={used_only}) differs"
+    print("font/style listings: identical output")
+
+    start = time.perf_counter()
+    for old, _ in LISTINGS:
+        old(obj, True)
+    print(f"per-event parse   {time.perf_counter() - start:8.3f}s")
+
+    subtitle._tokeniseOverrideBlock.cache_clear()
+    start = time.perf_counter()
+    subtitle.listFontNamesInAssFileObj(obj, used_only=True)
+    subtitle.listStyleNamesInAssFileObj(obj, used_only=True)
+    print(f"block cache cold  {time.perf_counter() - start:8.3f}s")
+
+    start = time.perf_counter()
+    subtitle.listFontNamesInAssFileObj(obj, used_only=True)
+    subtitle.listStyleNamesInAssFileObj(obj, used_only=True)
+    print(f"block cache warm  {time.perf_counter() - start:8.3f}s")
@@ -0,0 +1,155 @@
+import re
+import sys
+import copy
+import time
+import random
+import logging
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from configs import CRC32_STRICT_REGEX
+from helpers.video import doAutoIndexing
+
+
+class Record:
+    """A stand-in of CoreFile holding only the naming fields used by doAutoIndexing, with the same `depends` fallback."""
+
+    def __init__(self, crc, e, g, t, l, c, x, i1="", i2="", f="", depends=None):
+        self.crc, self.e, self.x, self.depends = crc, e, x, depends
+        self._g, self._t, self._l, self._c = g, t, l, c
+        self._i1, self._i2, self._s, self._f = i1, i2, "", f
+
+    def _field(name):
+        def getter(self):
+            return getattr(self.depends, name) if self.depends else getattr(self, "_" + name)
+        def setter(self, value):
+            setattr(self, "_" + name, value)
+        return property(getter, setter)
+
+    g, t, l, c = _field("g"), _field("t"), _field("l"), _field("c")
+    i1, i2, s, f = _field("i1"), _field("i2"), _field("s"), _field("f")
+
+    def copyNaming(self, cf):
+        self.l, self.c, self.i1, self.i2, self.s, self.f = cf.l, cf.c, cf.i1, cf.i2, cf.s, cf.f
+
+    def naming(self):
+        return (self.l, self.c, self.i1, self.i2, self.s, self.f)
+
+
+class Season:
+
+    def __init__(self, files):
+        self.files = files
+
+
+def make_records(n, seed=0):
+    """Generate `n` naming records of a typical BD season: episodes, menus, CMs/PVs, audio and subtitle companions."""
+    rnd = random.Random(seed)
+    records, targets = [], []  # `targets` are the records not referring to others by crc32
+    for k in range(n):
+        crc = f"{k:08x}"
+        kind = rnd.random()
+        if kind < 0.15 and targets:  # a companion (e.g. mka/ass) following the naming of a video
+            records.append(Record(crc, rnd.choice(("mka", "ass")), "VCB", "Show", "", "", "",
+                                  depends=rnd.choice(targets)))
+        elif kind < 0.2 and targets:  # copy the naming from another file by crc32
+            records.append(Record(crc, "mkv", "VCB", "Show", "", "", "", f=rnd.choice(targets).crc))
+            continue
+        elif kind < 0.25:  # already named
+            records.append(Record(crc, "mkv", "VCB", "Show", "", "", "", f=f"Extra {k}"))
+        else:
+            c = rnd.choice(("", "", "Menu", "CM", "PV", "NCOP", "NCED"))
+            l = rnd.choice(("", "BD1", "BD2", "BD3"))
+            i1 = rnd.choice(("", "", str(rnd.randint(1, 12))))
+            i2 = rnd.choice(("", "", "", str(rnd.randint(1, 3)))) if i1 else ""
+            records.append(Record(crc, rnd.choice(("mkv", "mkv", "png")), "VCB", "Show", l, c, "", i1, i2))
+        targets.append(records[-1])
+    return records
+
+
+def old_doAutoIndexing(season, logger):
+    """The previous implementation of doAutoIndexing, kept as the reference."""
+
+    cfs = season.files
+
+    auto_cfs = [info for info in cfs if not info.f]
+    dep_cfs = [info for info in cfs if (info.f and re.match(CRC32_STRICT_REGEX, info.f))]
+    named_cfs = [info for info in cfs if (info.f and not re.match(CRC32_STRICT_REGEX, info.f))]
+
+    state = {}
+    for i, acf in enumerate(auto_cfs):
+        i1 = acf.i1 if acf.i1 else ''
+        i2 = acf.i1 if acf.i2 else ''
+        if i1 and i2:
+            state[f'{acf.e}//{acf.g}//{acf.t}//{acf.l}//{acf.c}//{acf.x}'] = float(i1)
+            state[f'{acf.e}//{acf.g}//{acf.t}//{acf.l}//{acf.c}//{i1}//{acf.x}'] = float(i2)
+        elif i1 and not i2:
+            state[f'{acf.e}//{acf.g}//{acf.t}//{acf.l}//{acf.c}//{acf.x}'] = float(i1)
+            key = f'{acf.e}//{acf.g}//{acf.t}//{acf.l}//{acf.c}//{i1}//{acf.x}'
+            if (v := state.get(key)):
+                v = int(v + 1)
+                acf.i2 = str(v)
+                state[key] = v
+                continue
+            else:
+                for j, cf in enumerate(auto_cfs[i + 1:]):
+                    j1 = '' if cf.i1 == None else cf.i1
+                    jey = f'{cf.e}//{cf.g}//{cf.t}//{cf.l}//{cf.c}//{j1}//{cf.x}'
+                    if key == jey:
+                        acf.i2 = str(1)
+                        state[key] = 1
+                        break
+        else:
+            key = f'{acf.e}//{acf.g}//{acf.t}//{acf.l}//{acf.c}//{acf.x}'
+            if (v := state.get(key)):
+                v = int(v + 1)
+                acf.i1 = str(v)
+                state[key] = v
+                continue
+            else:
+                for j, cf in enumerate(auto_cfs[i + 1:]):
+                    jey = f'{cf.e}//{cf.g}//{cf.t}//{cf.l}//{cf.c}//{cf.x}'
+                    if key == jey:
+                        acf.i1 = str(1)
+                        state[key] = 1
+                        break
+
+    for i, dcf in enumerate(dep_cfs):
+        found = None
+        for cf in (auto_cfs + named_cfs):
+            if cf.crc == dcf.f:
+                found = cf
+                break
+        if found != None:
+            dcf.copyNaming(found)
+            logger.info(f'File "{dcf.crc}" copied naming from file "{found.crc}".')
+        else:
+            logger.error('Cannot find the file with the target CRC32 {} to copy the naming from.')
+            raise ValueError('Trying to refer to the naming of an inexisting/disabled file.')
+
+
+def run(func, records):
+    records = copy.deepcopy(records)
+    start = time.perf_counter()
+    func(Season(records), logging.getLogger("bench"))
+    return time.perf_counter() - start, [r.naming() for r in records]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check and benchmark doAutoIndexing against the previous implementation")
+    parser.add_argument("-n", "--records", type=int, default=3000, help="number of naming records per season")
+    parser.add_argument("-s", "--seeds", type=int, default=20, help="number of random seasons to check")
+    args = parser.parse_args()
+
+    t_old = t_new = 0.0
+    for seed in range(args.seeds):
+        records = make_records(args.records, seed)
+        e_old, ret_old = run(old_doAutoIndexing, records)
+        e_new, ret_new = run(doAutoIndexing, records)
+        t_old, t_new = t_old + e_old, t_new + e_new
+        assert ret_old == ret_new, f"output differs on seed {seed}"
+    print(f"{args.seeds} seasons x {args.records} records: identical output")
+    print(f"old {t_old:8.3f}s")
+    print(f"new {t_new:8.3f}s")
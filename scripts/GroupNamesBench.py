@@ -0,0 +1,85 @@
+import os
+import sys
+import time
+import random
+import difflib
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from utils.chars import groupSimilarNames
+
+
+# typical naming styles in a scans folder, each used for a series of indexed pages
+STYLES = ["bk{:02d}.webp", "booklet_{:03d}.png", "cd{:d}.webp", "obi_{:02d}.jpg", "img_{:04d}.jpg",
+          "scan {:03d}.tif", "p{:03d}-{:03d}.webp", "dvd{:d}_disc.png", "photobook_{:04d}.webp", "card{:02d}.jpg"]
+# and some one-off names
+SINGLES = ["cover.jpg", "back.jpg", "spine.webp", "obi.webp", "digipak_front.png", "digipak_back.png",
+           "sticker.png", "box_front.tif", "box_back.tif", "box_side.tif"]
+
+
+def make_folder(num_files, seed=0):
+    """
+    Generate a synthetic scans folder of about `num_files` files.
+    Return the lowered filenames split by extension and sorted, as cleanScansFilenames groups them.
+    """
+    rnd = random.Random(seed)
+    names = set(SINGLES)
+    while len(names) < num_files:
+        style = rnd.choice(STYLES)
+        start = rnd.randint(0, 50)
+        for i in range(start, start + rnd.randint(5, 400)):
+            names.add(style.format(i, i + 1))
+    by_ext = {}
+    for name in sorted(names)[:num_files]:
+        by_ext.setdefault(os.path.splitext(name)[1], []).append(name)
+    return list(by_ext.values())
+
+
+def old_groupSimilarNames(names, cutoff=0.5):
+    """The previous per-name difflib grouping of cleanScansFilenames/chkScansNaming."""
+    groups = []
+    for i, name in enumerate(names):
+        matches = difflib.get_close_matches(name, names[i:], n=len(names[i:]), cutoff=cutoff)
+        added = False
+        for group in groups:
+            if any((match in group) for match in matches):
+                group.update(matches)
+                added = True
+                break
+        if not added:
+            groups.append(set(matches))
+    return groups
+
+
+def canonical(groups):
+    return sorted(sorted(group) for group in groups)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check and benchmark groupSimilarNames against the previous grouping")
+    parser.add_argument("-n", "--files", type=int, default=10000, help="number of files in the benchmark folder")
+    parser.add_argument("-c", "--check", type=int, default=1000, help="number of files in the equivalence check folders")
+    parser.add_argument("-s", "--seeds", type=int, default=5, help="number of random folders to check")
+    parser.add_argument("--old", action="store_true", help="also time the previous grouping on the benchmark folder")
+    args = parser.parse_args()
+
+    # the previous grouping is quadratic in the number of files, so the equivalence is checked on smaller folders
+    # NOTE it is also order-dependent (and may even return overlapping groups on a shuffled input)
+    # so the names are fed in the listing order as the callers do
+    for seed in range(args.seeds):
+        for names in make_folder(args.check, seed):
+            new, old = canonical(groupSimilarNames(names)), canonical(old_groupSimilarNames(names))
+            assert new == old, f"seed {seed} differs on {names[0]!r}..."
+    print(f"{args.seeds} folders x {args.check} files: identical grouping")
+
+    folder = make_folder(args.files, seed=args.seeds)
+    start = time.perf_counter()
+    groups = [groupSimilarNames(names) for names in folder]
+    print(f"new {time.perf_counter() - start:8.3f}s  {sum(map(len, folder))} files  {sum(map(len, groups))} groups")
+    if args.old:
+        start = time.perf_counter()
+        old_groups = [old_groupSimilarNames(names) for names in folder]
+        identical = all(canonical(g1) == canonical(g2) for g1, g2 in zip(groups, old_groups))
+        print(f"old {time.perf_counter() - start:8.3f}s  identical={identical}")
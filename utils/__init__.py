@@ -1,8 +1,10 @@
 
 from .archive import *
 from .chars import *
+from .cuesheet import *
 from .fileid import *
 from .fileutils import *
+from .flacutils import *
 from .formatter import *
 from .ffmpegutils import *
 from .fontutils import *
@@ -13,5 +15,3 @@ from .subtitle import *
 from .language import *
 from .webputils import *
 from .vgmdb import *
-
-# from .cuesheet import *
\ No newline at end of file
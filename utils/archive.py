@@ -5,17 +5,28 @@ __all__ = [
     'extractZIP',
     'extractARC',
     'extractArcWithPwdPrompt',
+    'findArchivePassword',
+    'promptArchivePassword',
     'extractMultiple',
     'tstArchive',
     'getFileList',
+    'walkArchive',
+    'hasNestedArchive',
+    'extractNested',
     ]
 
+import os
 import shutil
-from pathlib import Path
-from typing import Optional
+import tempfile
+import subprocess
+from pathlib import Path, PurePosixPath
+from functools import cache
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Callable, IO
 
 from langs import *
 from configs.time import TIMESTAMP
+from configs.user import ARC_USE_NATIVE_BACKEND
 
 import py7zr
 import rarfile
@@ -44,16 +55,62 @@ def isArchive(path: Path) -> bool:
 
 
 
+@cache
+def _findNativeBackend(fmt: str) -> str|None:
+    '''Return the path of a native decompressor binary for the archive format on PATH, or None.'''
+    match fmt:
+        case '7z':
+            names = ('7zz', '7z', '7za')
+        case 'rar':
+            names = ('unrar',)
+        case _:
+            names = ()
+    for name in names:
+        if exe := shutil.which(name):
+            return exe
+    return None
+
+
+def _extractWithNativeBackend(exe: str, fmt: str, src_path: Path, dst_dir: Path, password: Optional[str] = None) -> bool:
+    '''
+    Decompress the archive by the native binary, which is multithreaded and much faster than the python libraries.
+    The password is only passed if given. With the stdin closed, the binary fails instead of prompting for it.
+    '''
+    match fmt:
+        case '7z':
+            pwd_args = [f'-p{password}'] if password else []
+            cmd = [exe, 'x', '-y', '-bd', '-mmt=on', *pwd_args, f'-o{dst_dir}', '--', str(src_path)]
+        case 'rar':
+            cmd = [exe, 'x', '-y', '-o+', '-idq', f'-p{password or "-"}', '--', str(src_path), f'{dst_dir}{os.sep}']
+        case _:
+            return False
+    try:
+        proc = subprocess.run(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except OSError:
+        return False
+    return proc.returncode == 0
+
+
+
+
 def extract7Z(src_path: Path, dst_dir: Path, password: Optional[str] = None) -> bool:
-    '''Decompress a 7z file to the given (must be already existing) output dir.'''
+    '''
+    Decompress a 7z file to the given (must be already existing) output dir.
+    A native 7-Zip binary is used if available, otherwise py7zr.
+    '''
     if not src_path.is_file(): return False
     if not dst_dir.is_dir(): return False
     if not isArchive(src_path): return False
+    if ARC_USE_NATIVE_BACKEND and (exe := _findNativeBackend('7z')):
+        return _extractWithNativeBackend(exe, '7z', src_path, dst_dir, password)
     try:
-        with py7zr.SevenZipFile(src_path) as archive:
-            if not archive.needs_password():
-                archive.extractall(dst_dir)
-                return True
+        try:
+            with py7zr.SevenZipFile(src_path) as archive:
+                if not archive.needs_password():
+                    archive.extractall(dst_dir)
+                    return True
+        except py7zr.exceptions.PasswordRequired:  # encrypted header
+            pass
         if not password: return False
         with py7zr.SevenZipFile(src_path, password=password) as archive:
             archive.extractall(dst_dir)
@@ -68,6 +125,8 @@ def extractRAR(src_path: Path, dst_dir: Path, password: Optional[str] = None) ->
     if not src_path.is_file(): return False
     if not dst_dir.is_dir(): return False
     if not isArchive(src_path): return False
+    if ARC_USE_NATIVE_BACKEND and (exe := _findNativeBackend('rar')):
+        return _extractWithNativeBackend(exe, 'rar', src_path, dst_dir, password)
     try:
         with rarfile.RarFile(src_path, 'r') as archive:
             if archive.needs_password():
@@ -120,17 +179,112 @@ def extractZIP(src_path: Path, dst_dir: Path, password: Optional[str] = None) ->
 
 
 
+def _needsPassword(src_path: Path) -> bool:
+    match src_path.suffix.lower():
+        case '.7z':
+            try:
+                with py7zr.SevenZipFile(src_path) as archive:
+                    return archive.needs_password()
+            except py7zr.exceptions.PasswordRequired:  # encrypted header
+                return True
+        case '.rar':
+            with rarfile.RarFile(src_path, 'r') as archive:
+                return archive.needs_password()
+        case '.zip':
+            return _isEncryptedZIP(src_path)
+        case _:
+            return False
+
+
+# the password check prefers a member at least this large, as a tiny one may pass with a wrong password
+ARC_PWD_PROBE_MIN_SIZE = 4096
+
+
+def _pickPasswordProbe(infos: list, size: Callable) -> object|None:
+    '''
+    Pick the member to check the password on from the non-solid `infos`:
+    the smallest one with a real payload, or the largest one if all of them are tiny.
+    '''
+    infos = [info for info in infos if size(info) > 0]
+    if not infos: return None
+    payloads = [info for info in infos if size(info) >= ARC_PWD_PROBE_MIN_SIZE]
+    return min(payloads, key=size) if payloads else max(infos, key=size)
+
+
+def _tstPassword(src_path: Path, password: str) -> bool:
+    '''
+    Check the password by decrypting a single member, instead of a full extraction attempt.
+    In a solid archive it is the first non-empty member, so that only the head of the solid block is decompressed.
+    The member CRC is verified by the library, so a wrong password is very unlikely to pass,
+    but an archive with only empty members cannot be checked and any password passes (unless its header is encrypted).
+    '''
+    try:
+        match src_path.suffix.lower():
+            case '.7z':
+                # an encrypted header fails to parse here with a wrong password
+                with py7zr.SevenZipFile(src_path, 'r', password=password) as archive:
+                    # the members are listed in the folder order, so this is the first one of the first folder
+                    probe = next((info for info in archive.list() if not info.is_directory and info.uncompressed), None)
+                    if probe is None: return True
+                    with tempfile.TemporaryDirectory() as temp_dir:
+                        archive.extract(temp_dir, targets=[probe.filename])
+                    return True
+            case '.rar':
+                with rarfile.RarFile(src_path, 'r') as archive:
+                    archive.setpassword(password)
+                    infos = [info for info in archive.infolist() if not info.is_dir()]
+                    if archive.is_solid():
+                        probe = next((info for info in infos if info.file_size), None)
+                    else:
+                        probe = _pickPasswordProbe(infos, lambda info: info.file_size)
+                    if probe is None: return True
+                    with archive.open(probe) as fo:
+                        while fo.read(2**20): pass
+                    return True
+            case '.zip':
+                with pyzipper.AESZipFile(src_path, 'r') as archive:
+                    archive.setpassword(password.encode('utf-8'))
+                    infos = [info for info in archive.infolist() if info.flag_bits & 0x1]
+                    probe = _pickPasswordProbe(infos, lambda info: info.file_size)
+                    if probe is None: return True
+                    with archive.open(probe) as fo:
+                        while fo.read(2**20): pass
+                    return True
+            case _:
+                return False
+    except:
+        return False
+
+
+def findArchivePassword(src_path: Path, passwords: str|list[str]|None = None, mp: int = 4) -> str|None:
+    '''
+    Find the correct password of the archive among the candidates, which are tested concurrently.
+    Return an empty string if the archive is not encrypted, None if no candidate is correct.
+    '''
+    try:
+        if not _needsPassword(src_path): return ''
+    except:
+        return None
+    if not passwords: return None
+    pwds = [passwords] if isinstance(passwords, str) else [pwd for pwd in passwords if pwd]
+    mp = int(mp)
+    if mp > 1 and len(pwds) > 1:
+        with ThreadPoolExecutor(min(mp, len(pwds))) as executor:
+            oks = list(executor.map(lambda pwd: _tstPassword(src_path, pwd), pwds))
+    else:
+        oks = [_tstPassword(src_path, pwd) for pwd in pwds]
+    for pwd, ok in zip(pwds, oks):
+        if ok: return pwd
+    return None
+
+
+
+
 def extractARC(src_path: Path, dst_dir: Path, passwords: Optional[str|list[str]] = None) -> bool:
 
     if not src_path.is_file(): return False
     if not dst_dir.is_dir(): return False
     if not isArchive(src_path): return False
-    if passwords == None:
-        pwds = [None]
-    elif isinstance(passwords, str):
-        pwds = [None, passwords]
-    else:
-        pwds = [None] + passwords
 
     match src_path.suffix.lower():
         case '.7z':
@@ -143,28 +297,46 @@ def extractARC(src_path: Path, dst_dir: Path, passwords: Optional[str|list[str]]
             return False
 
     try:
-        for pwd in pwds:
-            if decompressor(src_path, dst_dir, password=pwd):
-                return True
+        # only verify the candidates cheaply, and do the full extraction once with the correct one
+        pwd = findArchivePassword(src_path, passwords)
+        if pwd is None: return False
+        return decompressor(src_path, dst_dir, password=pwd if pwd else None)
     except:
         return False
-    else:
-        return False
 
 
 
 
-def extractArcWithPwdPrompt(src_path: Path, dst_dir: Path, passwords: str|list[str]|None = None) -> str|None:
+def promptArchivePassword(src_path: Path, passwords: str|list[str]|None = None) -> str|None:
+    '''
+    Find the password of the archive among `passwords`, or keep prompting for it in the console.
+    Return the password (an empty string if not encrypted), or None if the user cancelled.
+    '''
+    pwd = findArchivePassword(src_path, passwords)
+    while pwd is None:
+        try:
+            print(FOUND_PWD_PROTECTED_1.format(src_path))
+            password = input(PROMPT_PWD_0)
+            if _tstPassword(src_path, password): pwd = password
+            else: print(INCORRECT_PWD_1.format(password))
+        except KeyboardInterrupt:
+            return None
+    return pwd
+
+
+
+
+def extractArcWithPwdPrompt(src_path: Path, dst_dir: Path, passwords: str|list[str]|None = None,
+                            max_depth: int = 0, max_size: int = 256 * 1024**3) -> str|None:
+    '''
+    Decompress the archive, prompting for the password if none of `passwords` works.
+    If `max_depth` > 0, the inner archives are also decompressed (see `extractNested()`).
+    Return the used password (an empty string if not encrypted), or None if failed.
+    '''
 
     if not src_path.is_file(): return None
     if not dst_dir.is_dir(): return None
     if not isArchive(src_path): return None
-    if passwords == None:
-        pwds = [None]
-    elif isinstance(passwords, str):
-        pwds = [None, passwords]
-    else:
-        pwds = [None] + passwords
 
     match src_path.suffix.lower():
         case '.7z':
@@ -176,20 +348,14 @@ def extractArcWithPwdPrompt(src_path: Path, dst_dir: Path, passwords: str|list[s
         case _:
             return None
 
-    ok = False
     try:
-        for pwd in pwds:
-            ok = decompressor(src_path, dst_dir, password=pwd)
-            if ok: return pwd if pwd else ''
-        while not ok:
-            try:
-                print(FOUND_PWD_PROTECTED_1.format(src_path))
-                password = input(PROMPT_PWD_0)
-                ok = decompressor(src_path, dst_dir, password=password)
-                if not ok: print(INCORRECT_PWD_1.format(password))
-                else: return password
-            except KeyboardInterrupt:
-                return None
+        if (pwd := promptArchivePassword(src_path, passwords)) is None:
+            return None
+        if max_depth > 0 and hasNestedArchive(src_path, pwd if pwd else None):
+            ok = extractNested(src_path, dst_dir, pwd if pwd else None, max_depth=max_depth, max_size=max_size)
+        else:
+            ok = decompressor(src_path, dst_dir, password=pwd if pwd else None)
+        if ok: return pwd
     except:
         return None
 
@@ -197,9 +363,10 @@ def extractArcWithPwdPrompt(src_path: Path, dst_dir: Path, passwords: str|list[s
 
 
 def extractMultiple(src_paths: list[Path], dst_parent_dir: Path,
-                    passwords: str|list[str]|None = None) -> list[Path|None]:
+                    passwords: str|list[str]|None = None, mp: int = 1) -> list[Path|None]:
     '''
     Decompresses a batch of archive files to the given output dir.
+    At most `mp` archives are decompressed concurrently, as the work is mostly done in the native binary or zlib/lzma.
     Return each sub output dir if succeeded, otherwise None.
     '''
 
@@ -212,18 +379,23 @@ def extractMultiple(src_paths: list[Path], dst_parent_dir: Path,
     except:
         return [None] * len(src_paths)
 
-    ret: list[Path|None] = [None] * len(src_paths)
-    for i, src_path in enumerate(src_paths):
+    def extract(src_path: Path) -> Path|None:
         dst_dir = outdir.joinpath(src_path.name)
         try:
+            if not isArchive(src_path): return None
             dst_dir.mkdir(parents=True, exist_ok=True)
-            if not isArchive(src_path): continue
-            if extractARC(src_path, outdir, passwords=passwords):
-                ret[i] = dst_dir
+            if extractARC(src_path, dst_dir, passwords=passwords):
+                return dst_dir
         except:
-            shutil.rmtree(outdir, ignore_errors=True)
             pass
-    return ret
+        shutil.rmtree(dst_dir, ignore_errors=True)
+        return None
+
+    mp = int(mp)
+    if mp > 1 and len(src_paths) > 1:
+        with ThreadPoolExecutor(min(mp, len(src_paths))) as executor:
+            return list(executor.map(extract, src_paths))
+    return list(map(extract, src_paths))
 
 
 
@@ -254,18 +426,287 @@ def tstArchive(path: Path) -> bool:
 
 
 
-def getFileList(path: Path) -> list[str]:
-    '''Return the file list inside the given archive file.'''
-    if not path.is_file(): return []
-    match path.suffix.lower():
-        case '.7z':
-            with py7zr.SevenZipFile(path, 'r') as archive:
+def getFileList(path: Path|IO[bytes], password: Optional[str] = None, fmt: Optional[str] = None) -> list[str]:
+    '''
+    Return the file list inside the given archive file.
+    `path` can also be a seekable file object, then `fmt` ('7z'/'rar'/'zip') is required as in `walkArchive()`.
+    '''
+    if fmt is None:
+        if not path.is_file(): return []
+        fmt = path.suffix.lower().lstrip('.')
+    match fmt:
+        case '7z':
+            with py7zr.SevenZipFile(path, 'r', password=password) as archive:
                 return archive.getnames()
-        case '.rar':
+        case 'rar':
             with rarfile.RarFile(path, 'r') as archive:
+                if password: archive.setpassword(password)
                 return archive.namelist()
-        case '.zip':
+        case 'zip':
             with pyzipper.ZipFile(path, 'r') as archive:
                 return archive.namelist()
         case _:
             return []
+
+
+
+
+# the member larger than this will be spooled to a temp file instead of held in memory during `walkArchive()`
+ARC_MEMBER_SPOOL_SIZE = 64 * 2**20
+
+
+def _copyMember(src: IO[bytes], dst: IO[bytes], progress: Optional[Callable[[int], None]] = None):
+    while chunk := src.read(2**20):
+        if progress: progress(len(chunk))
+        dst.write(chunk)
+
+
+def _spoolMember(src: IO[bytes], spool_size: int, progress: Optional[Callable[[int], None]] = None) -> IO[bytes]:
+    fo = tempfile.SpooledTemporaryFile(max_size=spool_size)
+    try:
+        _copyMember(src, fo, progress)
+    except:
+        fo.close()
+        raise
+    fo.seek(0)
+    return fo
+
+
+try:
+    from py7zr.io import Py7zIO, WriterFactory
+
+    class _Spooled7zIO(Py7zIO):
+        '''Collect a 7z member, and hand it to the callback as soon as py7zr finishes writing it.'''
+
+        def __init__(self, name: str, callback: Callable[[str, IO[bytes]], None], spool_size: int):
+            self.name = name
+            self.callback = callback
+            self.fo = tempfile.SpooledTemporaryFile(max_size=spool_size)
+            self.done = False
+        def write(self, s: bytes|bytearray) -> int:
+            return self.fo.write(s)
+        def read(self, size: int|None = None) -> bytes:
+            return self.fo.read(size if size is not None else -1)
+        def seek(self, offset: int, whence: int = 0) -> int:
+            return self.fo.seek(offset, whence)
+        def flush(self) -> None:
+            self.fo.flush()
+        def size(self) -> int:
+            return self.fo.tell()
+        def close(self) -> None:
+            if self.done: return
+            self.done = True
+            self.fo.seek(0)
+            try:
+                self.callback(self.name, self.fo)
+            finally:
+                self.fo.close()
+
+    class _Sink7zIO(Py7zIO):
+        '''Write a 7z member straight to the file object given by the sink of `walkArchive()`.'''
+
+        def __init__(self, fo: IO[bytes]):
+            self.fo = fo
+            self.written = 0
+            self.done = False
+        def write(self, s: bytes|bytearray) -> int:
+            self.written += len(s)
+            return self.fo.write(s)
+        def read(self, size: int|None = None) -> bytes:
+            return b''
+        def seek(self, offset: int, whence: int = 0) -> int:
+            return self.written
+        def flush(self) -> None:
+            self.fo.flush()
+        def size(self) -> int:
+            return self.written
+        def close(self) -> None:
+            if self.done: return
+            self.done = True
+            self.fo.close()
+
+    class _Spooled7zFactory(WriterFactory):
+
+        def __init__(self, callback: Callable[[str, IO[bytes]], None], spool_size: int,
+                     sink: Optional[Callable[[str], IO[bytes]|None]] = None):
+            self.callback = callback
+            self.spool_size = spool_size
+            self.sink = sink
+            self.writers: list[Py7zIO] = []
+        def create(self, filename: str) -> Py7zIO:
+            # an older py7zr may not call `close()`, so finishing the previous member here is the fallback
+            for writer in self.writers: writer.close()
+            if self.sink and (fo := self.sink(filename)) is not None:
+                self.writers = [_Sink7zIO(fo)]
+            else:
+                self.writers = [_Spooled7zIO(filename, self.callback, self.spool_size)]
+            return self.writers[0]
+
+except ImportError:
+    _Spooled7zFactory = None
+
+
+def walkArchive(
+    path: Path|IO[bytes],
+    callback: Callable[[str, IO[bytes]], None],
+    password: Optional[str] = None,
+    spool_size: int = ARC_MEMBER_SPOOL_SIZE,
+    fmt: Optional[str] = None,
+    progress: Optional[Callable[[int], None]] = None,
+    sink: Optional[Callable[[str], IO[bytes]|None]] = None,
+    ):
+    '''
+    Decompress the archive in a single pass, and call `callback(name, fo)` for each member file in order,
+    where `fo` is a readable file object of the member content, held in memory or spooled to a temp file if large.
+    The member content is only valid during the callback.
+    The member CRC is verified by the underlying library, so a corrupted archive raises here as in extraction.
+    `path` can also be a seekable file object (e.g. a member of another archive), then `fmt` ('7z'/'rar'/'zip') is required.
+    `progress(n)` is called with the size of every decompressed chunk before it is spooled (for 7z, the declared size
+    of all members at once), and raising in it aborts the walk.
+    `sink(name)` may return a writable file object for a member, then the member is written straight to it
+    (and closed) instead of being spooled and passed to the callback.
+    '''
+    if fmt is None:
+        fmt = Path(path).suffix.lower().lstrip('.')
+    match fmt:
+        case '7z':
+            with py7zr.SevenZipFile(path, 'r', password=password) as archive:
+                # py7zr may expand a whole member into one buffer before writing it out
+                # but never beyond its declared size, so the declared sizes are counted ahead
+                if progress: progress(sum(info.uncompressed for info in archive.list() if not info.is_directory))
+                if _Spooled7zFactory:
+                    factory = _Spooled7zFactory(callback, spool_size, sink)
+                    archive.extractall(factory=factory)
+                    for writer in factory.writers: writer.close()
+                else:  # py7zr<1.0 cannot write members to custom objects
+                    with tempfile.TemporaryDirectory() as temp_dir:
+                        archive.extractall(temp_dir)
+                        for member in sorted(p for p in Path(temp_dir).rglob('*') if p.is_file()):
+                            name = member.relative_to(temp_dir).as_posix()
+                            with member.open('rb') as fo:
+                                if sink and (dst := sink(name)) is not None:
+                                    with dst: shutil.copyfileobj(fo, dst, 2**20)
+                                else:
+                                    callback(name, fo)
+        case 'rar':
+            with rarfile.RarFile(path, 'r') as archive:
+                if password: archive.setpassword(password)
+                for info in archive.infolist():
+                    if info.is_dir(): continue
+                    with archive.open(info) as src:
+                        if sink and (dst := sink(info.filename)) is not None:
+                            with dst: _copyMember(src, dst, progress)
+                            continue
+                        with _spoolMember(src, spool_size, progress) as fo:
+                            callback(info.filename, fo)
+        case 'zip':
+            with pyzipper.AESZipFile(path, 'r') as archive:
+                if password: archive.setpassword(password.encode('utf-8'))
+                for info in archive.infolist():
+                    if info.is_dir(): continue
+                    with archive.open(info) as src:
+                        if sink and (dst := sink(info.filename)) is not None:
+                            with dst: _copyMember(src, dst, progress)
+                            continue
+                        with _spoolMember(src, spool_size, progress) as fo:
+                            callback(info.filename, fo)
+        case _:
+            raise ValueError(f'Unsupported archive "{path}".')
+
+
+
+
+ARC_EXTS = ('.7z', '.rar', '.zip')
+
+
+def hasNestedArchive(path: Path, password: Optional[str] = None) -> bool:
+    '''Check if any member of the archive is an archive file by its extension.'''
+    try:
+        return any(name.lower().endswith(ARC_EXTS) for name in getFileList(path, password))
+    except:
+        return False
+
+
+def extractNested(
+    src_path: Path,
+    dst_dir: Path,
+    password: Optional[str] = None,
+    max_depth: int = 2,
+    max_size: int = 256 * 1024**3,
+    ) -> bool:
+    '''
+    Decompress the archive to the given (must be already existing) output dir,
+    and also decompress the inner archives, up to `max_depth` levels, each into a dir named after it.
+    The ordinary members are written straight to `dst_dir`, while the inner archives are spooled
+    (in memory or a temp file if large) and read from there, never written to `dst_dir`.
+    An inner archive that fails to decompress (e.g. needs another password) or exceeds the depth is written as-is.
+    Fail if the total decompressed size exceeds `max_size`.
+    The size is counted while decompressing (inner archives included), so a nested bomb is stopped before expanded.
+    This always uses the python libraries, as the native binaries cannot count the size while decompressing.
+    '''
+    if not src_path.is_file(): return False
+    if not dst_dir.is_dir(): return False
+    if not isArchive(src_path): return False
+
+    decompressed = 0
+
+    def progress(n: int):
+        nonlocal decompressed
+        decompressed += n
+        if decompressed > max_size:
+            raise OverflowError(f'Decompressed size exceeds {max_size}B.')
+
+    def relPath(name: str) -> Path:
+        return Path(*(part for part in PurePosixPath(name.replace('\\', '/')).parts if part not in ('', '/', '..')))
+
+    def extract(src: Path|IO[bytes], fmt: str, dst: Path, depth: int):
+
+        # all the paths taken by the members, so that the dir of an inner archive never merges into a real one
+        taken = set()
+        for name in getFileList(src, password, fmt):
+            rel = relPath(name)
+            taken.add(rel)
+            taken.update(rel.parents)
+        if not isinstance(src, Path): src.seek(0)
+
+        def isNested(rel: Path) -> bool:
+            return depth < max_depth and rel.suffix.lower() in ARC_EXTS
+
+        def sink(name: str) -> IO[bytes]|None:
+            rel = relPath(name)
+            if not rel.parts or isNested(rel): return None
+            out = dst.joinpath(rel)
+            out.parent.mkdir(parents=True, exist_ok=True)
+            return out.open('wb')
+
+        def callback(name: str, fo: IO[bytes]):
+            rel = relPath(name)
+            if not rel.parts: return
+            if isNested(rel):
+                inner_rel, i = rel.parent.joinpath(rel.stem), 1
+                while inner_rel in taken or dst.joinpath(inner_rel).exists():
+                    i += 1
+                    inner_rel = rel.parent.joinpath(f'{rel.stem} ({i})')
+                inner_dst = dst.joinpath(inner_rel)
+                try:
+                    inner_dst.mkdir(parents=True)
+                    # the inner archive is mostly protected by the same password as the outer one, if any
+                    extract(fo, rel.suffix.lower().lstrip('.'), inner_dst, depth + 1)
+                    return
+                except OverflowError:
+                    raise
+                except:
+                    shutil.rmtree(inner_dst, ignore_errors=True)
+                    fo.seek(0)
+            out = dst.joinpath(rel)
+            out.parent.mkdir(parents=True, exist_ok=True)
+            with out.open('wb') as dst_fo:
+                shutil.copyfileobj(fo, dst_fo, 2**20)
+
+        walkArchive(src, callback, password=password, fmt=fmt, progress=progress, sink=sink)
+
+    try:
+        extract(src_path, src_path.suffix.lower().lstrip('.'), dst_dir, 0)
+        return True
+    except:
+        return False
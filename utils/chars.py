@@ -6,9 +6,12 @@ __all__ = [
     'unquotFields4CSV',
     'suppressPunctuation',
     'getPrintLen',
+    'groupSimilarNames',
     ]
 
+import re
 import string
+import difflib
 from typing import Optional
 from configs.chars import FLEXIBLE_PUNCTUATIONS
 
@@ -120,3 +123,38 @@ def getPrintLen(chars: str) -> int:
     # which maximizes the UE with fonts such as Sarasa Unispaces
     len_doublespace = (len(chars) - len_unispace) * 2
     return len_unispace + len_doublespace
+
+
+
+
+_DIGIT_RUN_REGEX = re.compile(r'[0-9]+')
+
+
+def groupSimilarNames(names: list[str], cutoff: float = 0.5) -> list[set[str]]:
+    '''
+    Cluster names of a similar naming style e.g. 'bk01.webp' and 'bk02.webp', used to find scans of the same series.
+
+    Names are first bucketed by their template, i.e. the name with every digit run replaced by a placeholder,
+    which puts typical indexed names into one bucket by a hash lookup.
+    Only one representative of each bucket then goes through the (quadratic) difflib fuzzy matching,
+    so the cost is bounded by the number of naming styles instead of the number of files.
+    '''
+    buckets: dict[str, list[str]] = {}
+    for name in names:
+        buckets.setdefault(_DIGIT_RUN_REGEX.sub('#', name), []).append(name)
+    reps = [bucket[0] for bucket in buckets.values()]
+    rep_to_bucket = {bucket[0]: bucket for bucket in buckets.values()}
+
+    rep_groups: list[set[str]] = []
+    for i, rep in enumerate(reps):
+        # using [i:] make the matching return a list at least containing itself
+        # using a cutoff 0.5 to make matches such as '01' vs '02'
+        matches = difflib.get_close_matches(rep, reps[i:], n=len(reps[i:]), cutoff=cutoff)
+        for group in rep_groups:
+            if any((match in group) for match in matches):
+                group.update(matches)
+                break
+        else:
+            rep_groups.append(set(matches))
+
+    return [set(name for rep in group for name in rep_to_bucket[rep]) for group in rep_groups]
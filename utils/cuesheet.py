@@ -0,0 +1,366 @@
+import re
+import zlib
+import threading
+from pathlib import Path
+
+import ffmpeg
+import numpy as np
+
+
+__all__ = [
+    'CueTrack',
+    'CueSheet',
+    'EACLogTrack',
+    'EACLog',
+    'parseCueSheet',
+    'parseEACLog',
+    'calcDiscChecksums',
+    'cmpDiscChecksumsWithLog',
+    ]
+
+
+
+
+SAMPLES_PER_FRAME = 588  # CDDA: 1 sector/frame = 2352 bytes = 588 stereo 16bit samples
+AR_SKIPPED_HEAD = SAMPLES_PER_FRAME * 5  # AccurateRip skips the 1st 5 sectors of the 1st track (but its last sample)
+AR_SKIPPED_TAIL = SAMPLES_PER_FRAME * 5  # and the last 5 sectors of the last track
+_U32 = 0xffffffff
+
+_CUE_LINE_REGEX = re.compile(r'^\s*(?P<cmd>[A-Z]+)\s*(?P<args>.*?)\s*$', re.I)
+_CUE_FILE_ARGS_REGEX = re.compile(r'^(?:"(?P<quoted>.*)"|(?P<plain>\S+))(?:\s+(?P<type>\S+))?$')
+_CUE_TIME_REGEX = re.compile(r'^(?P<m>[0-9]+):(?P<s>[0-9]{2}):(?P<f>[0-9]{2})$')
+
+_LOG_TRACK_REGEX = re.compile(r'^\s*Track\s+(?P<num>[0-9]+)\s*$')
+_LOG_COPY_CRC_REGEX = re.compile(r'^\s*Copy CRC\s+(?P<crc>[0-9A-F]{8})\s*$', re.I)
+_LOG_TEST_CRC_REGEX = re.compile(r'^\s*Test CRC\s+(?P<crc>[0-9A-F]{8})\s*$', re.I)
+_LOG_AR_REGEX = re.compile(
+    r'^\s*(Track\s+(?P<num>[0-9]+)\s+)?accurately ripped \(confidence (?P<conf>[0-9]+)\)\s+'
+    r'\[(?P<crc>[0-9A-F]{8})\]\s+\(AR v(?P<ver>[12])\)', re.I)
+_LOG_RANGE_REGEX = re.compile(r'^\s*Range status and errors\s*$', re.I)
+_LOG_TOC_REGEX = re.compile(
+    r'^\s*(?P<num>[0-9]+)\s*\|\s*[0-9:.]+\s*\|\s*[0-9:.]+\s*\|\s*(?P<start>[0-9]+)\s*\|\s*(?P<end>[0-9]+)\s*$')
+
+
+
+
+class CueTrack:
+
+    def __init__(self, number: int, file: str):
+        self.number: int = number
+        self.file: str = file
+        self.title: str = ''
+        self.performer: str = ''
+        self.indexes: dict[int, int] = {}  # index number -> position in CD frames (1/75 s) in `file`
+
+    @property
+    def start(self) -> int:
+        '''The INDEX 01 position in samples.'''
+        return self.indexes.get(1, 0) * SAMPLES_PER_FRAME
+
+
+
+
+class CueSheet:
+
+    def __init__(self):
+        self.title: str = ''
+        self.performer: str = ''
+        self.files: list[str] = []
+        self.tracks: list[CueTrack] = []
+
+
+
+
+def _unquote(chars: str) -> str:
+    if len(chars) >= 2 and chars[0] == chars[-1] == '"':
+        return chars[1:-1]
+    return chars
+
+
+def _parseCueTime(chars: str) -> int|None:
+    if not (m := _CUE_TIME_REGEX.match(chars)): return None
+    return (int(m.group('m')) * 60 + int(m.group('s'))) * 75 + int(m.group('f'))
+
+
+def parseCueSheet(path: Path, encoding: str = 'utf-8-sig') -> CueSheet|None:
+    '''
+    Parse the FILE/TRACK/INDEX structure (and the TITLE/PERFORMER) of a cuesheet.
+    Return None if the file cannot be decoded or is structurally broken.
+    '''
+
+    try:
+        lines = Path(path).read_text(encoding=encoding).splitlines()
+    except (OSError, UnicodeDecodeError):
+        return None
+
+    cue = CueSheet()
+    track: CueTrack|None = None
+    for line in lines:
+        if not (m := _CUE_LINE_REGEX.match(line)): continue
+        cmd, args = m.group('cmd').upper(), m.group('args')
+        match cmd:
+            case 'FILE':
+                if not (fm := _CUE_FILE_ARGS_REGEX.match(args)): return None
+                cue.files.append(fm.group('quoted') if fm.group('quoted') is not None else fm.group('plain'))
+                track = None
+            case 'TRACK':
+                if not cue.files: return None
+                number = args.split()[0] if args.split() else ''
+                if not number.isdecimal(): return None
+                track = CueTrack(int(number), cue.files[-1])
+                cue.tracks.append(track)
+            case 'INDEX':
+                parts = args.split()
+                if not track or len(parts) != 2 or not parts[0].isdecimal(): return None
+                if (pos := _parseCueTime(parts[1])) is None: return None
+                track.indexes[int(parts[0])] = pos
+            case 'TITLE':
+                if track: track.title = _unquote(args)
+                else: cue.title = _unquote(args)
+            case 'PERFORMER':
+                if track: track.performer = _unquote(args)
+                else: cue.performer = _unquote(args)
+            case _:
+                pass
+
+    if not cue.tracks or any(1 not in tr.indexes for tr in cue.tracks):
+        return None
+    return cue
+
+
+
+
+class EACLogTrack:
+
+    def __init__(self, number: int):
+        self.number: int = number
+        self.copy_crc: str = ''
+        self.test_crc: str = ''
+        self.ar_crc: str = ''
+        self.ar_version: int = 0
+        self.ar_confidence: int = 0
+
+
+
+
+class EACLog:
+
+    def __init__(self):
+        self.toc: list[tuple[int, int, int]] = []  # (track number, start sector, end sector)
+        self.tracks: dict[int, EACLogTrack] = {}
+        self.range_copy_crc: str = ''
+        self.range_test_crc: str = ''
+
+    @property
+    def is_range(self) -> bool:
+        return bool(self.range_copy_crc)
+
+
+
+
+def parseEACLog(path: Path) -> EACLog|None:
+    '''
+    Parse the TOC, the per-track (or per-range) Test/Copy CRC and the AccurateRip results from an English EAC LOG.
+    Return None if the file cannot be decoded or contains no checksum at all.
+    '''
+
+    try:
+        raw_data = Path(path).read_bytes()
+        if raw_data[:2] in (b'\xff\xfe', b'\xfe\xff'):
+            text = raw_data.decode('utf-16')
+        else:
+            text = raw_data.decode('utf-8-sig')
+    except (OSError, UnicodeDecodeError):
+        return None
+
+    log = EACLog()
+    track: EACLogTrack|None = None
+    in_range = False
+    for line in text.splitlines():
+        if m := _LOG_TOC_REGEX.match(line):
+            log.toc.append((int(m.group('num')), int(m.group('start')), int(m.group('end'))))
+        elif m := _LOG_TRACK_REGEX.match(line):
+            track = log.tracks.setdefault(int(m.group('num')), EACLogTrack(int(m.group('num'))))
+            in_range = False
+        elif _LOG_RANGE_REGEX.match(line):
+            track, in_range = None, True
+        elif m := _LOG_COPY_CRC_REGEX.match(line):
+            if track: track.copy_crc = m.group('crc').lower()
+            elif in_range: log.range_copy_crc = m.group('crc').lower()
+        elif m := _LOG_TEST_CRC_REGEX.match(line):
+            if track: track.test_crc = m.group('crc').lower()
+            elif in_range: log.range_test_crc = m.group('crc').lower()
+        elif m := _LOG_AR_REGEX.match(line):
+            # a range rip reports AccurateRip as "Track  N  accurately ripped ..." in a summary block
+            if m.group('num'):
+                ar_track = log.tracks.setdefault(int(m.group('num')), EACLogTrack(int(m.group('num'))))
+            elif track:
+                ar_track = track
+            else:
+                continue
+            ar_track.ar_crc = m.group('crc').lower()
+            ar_track.ar_version = int(m.group('ver'))
+            ar_track.ar_confidence = int(m.group('conf'))
+
+    if not log.range_copy_crc and not any((tr.copy_crc or tr.ar_crc) for tr in log.tracks.values()):
+        return None
+    return log
+
+
+
+
+class _TrackChecksums:
+    '''Streaming accumulator of the EAC CRC32 (w/ and w/o null samples) and AccurateRip v1/v2 of a track.'''
+
+    def __init__(self, first: bool, ar: bool = True):
+        self.ar = ar
+        self.crc32 = 0
+        self.crc32_wo_null = 0
+        self.ar_v1 = 0
+        self.ar_v2 = 0
+        self.num_samples = 0
+        self.head = AR_SKIPPED_HEAD if first else 0
+        self.tail = np.empty(0, dtype=np.uint32)
+
+    def update(self, data: bytes|memoryview):
+        self.crc32 = zlib.crc32(data, self.crc32)
+        samples16 = np.frombuffer(data, dtype='<i2')
+        self.crc32_wo_null = zlib.crc32(samples16[samples16 != 0].tobytes(), self.crc32_wo_null)
+
+        if not self.ar: return
+
+        # AccurateRip treats a stereo sample as a LE uint32 and sums it with its 1-based position as the multiplier
+        samples = np.frombuffer(data, dtype='<u4')
+        muls = np.arange(self.num_samples + 1, self.num_samples + 1 + len(samples), dtype=np.uint64)
+        self.__accumulate(samples, muls, 1)
+        self.num_samples += len(samples)
+        if len(samples) >= AR_SKIPPED_TAIL:
+            self.tail = samples[-AR_SKIPPED_TAIL:]
+        else:
+            self.tail = np.concatenate((self.tail, samples))[-AR_SKIPPED_TAIL:]
+
+    def __accumulate(self, samples: np.ndarray, muls: np.ndarray, sign: int):
+        # every product fits in uint64, and a chunk of <2**32 products cannot overflow the uint64 sums
+        # on the 1st track, the multipliers count from 1 but only those >= 2940 are summed
+        selected = muls >= self.head
+        prods = samples[selected].astype(np.uint64) * muls[selected]
+        lo, hi = int((prods & _U32).sum()), int((prods >> 32).sum())
+        self.ar_v1 = (self.ar_v1 + sign * lo) & _U32
+        self.ar_v2 = (self.ar_v2 + sign * (lo + hi)) & _U32
+
+    def finish(self, last: bool) -> dict[str, str]:
+        if last and len(self.tail):
+            # the length of the last track is only known at the end, so take back the contribution of its tail
+            muls = np.arange(self.num_samples - len(self.tail) + 1, self.num_samples + 1, dtype=np.uint64)
+            self.__accumulate(self.tail, muls, -1)
+        return {
+            'crc32': f'{self.crc32:08x}',
+            'crc32_wo_null': f'{self.crc32_wo_null:08x}',
+            'ar_v1': f'{self.ar_v1:08x}',
+            'ar_v2': f'{self.ar_v2:08x}',
+            }
+
+
+def _iterPCM(path: Path, read_size: int):
+    proc = (ffmpeg.input(Path(path).resolve())['a:0']
+                  .output('pipe:', format='s16le', acodec='pcm_s16le', ac=2, ar=44100)
+                  .global_args('-v', 'error')
+                  .run_async(pipe_stdout=True, pipe_stderr=True))
+    # drain stderr aside, otherwise a chatty ffmpeg blocks on a full stderr pipe while we wait on stdout
+    errs: list[bytes] = []
+    drainer = threading.Thread(target=lambda: errs.append(proc.stderr.read()), daemon=True)
+    drainer.start()
+    remainder = b''
+    while chunk := proc.stdout.read(read_size):
+        chunk = remainder + chunk
+        cut = len(chunk) - len(chunk) % 4
+        remainder = chunk[cut:]
+        if cut: yield chunk[:cut]
+    proc.wait()
+    drainer.join()
+    if proc.returncode:
+        raise ValueError(f'Failed to decode "{path}": {b"".join(errs).decode("utf-8", errors="replace").strip()}')
+
+
+def calcDiscChecksums(
+    files: list[Path],
+    cue: CueSheet|None = None,
+    read_size: int = 4 * 2**20,
+    ) -> tuple[list[dict[str, str]], dict[str, str]]:
+    '''
+    Decode the audio of a disc only once and compute the EAC Copy CRC (w/ and w/o null samples)
+    and the AccurateRip v1/v2 checksums of every track, plus the CRC of the whole range.
+
+    files: the audio files of the disc in order
+    cue: if given, tracks are split by the INDEX 01 of each TRACK in `cue.files` (`files` must match in order),
+    otherwise every file is regarded as exactly one track (i.e. a split disc)
+
+    Return: (per-track checksums in track order, whole range checksums)
+    Raise ValueError if any file failed to decode.
+    '''
+
+    # starts[i] = sorted sample positions of the tracks starting in files[i]
+    if cue:
+        if len(cue.files) != len(files):
+            raise ValueError(f'The cuesheet refers to {len(cue.files)} files but {len(files)} are given.')
+        starts = [sorted(tr.start for tr in cue.tracks if tr.file == f) for f in cue.files]
+    else:
+        starts = [[0] for _ in files]
+
+    tracks: list[_TrackChecksums] = []
+    whole = _TrackChecksums(first=False, ar=False)
+    for path, file_starts in zip(files, starts):
+        pos = 0
+        bounds = file_starts[:]
+        for data in _iterPCM(path, read_size):
+            whole.update(data)
+            data = memoryview(data)
+            while data:
+                # samples before the first track start in this file belong to the previous track (or the HTOA)
+                if bounds and pos >= bounds[0]:
+                    bounds.pop(0)
+                    tracks.append(_TrackChecksums(first=not tracks))
+                step = len(data) // 4 if not bounds else min(len(data) // 4, bounds[0] - pos)
+                if tracks: tracks[-1].update(data[:step * 4])
+                data = data[step * 4:]
+                pos += step
+
+    results = [tr.finish(last=(i == len(tracks) - 1)) for i, tr in enumerate(tracks)]
+    whole_result = whole.finish(last=False)
+    return results, {'crc32': whole_result['crc32'], 'crc32_wo_null': whole_result['crc32_wo_null']}
+
+
+
+
+def cmpDiscChecksumsWithLog(
+    tracks: list[dict[str, str]],
+    whole: dict[str, str],
+    log: EACLog,
+    ) -> list[str]:
+    '''
+    Compare the checksums from `calcDiscChecksums()` with what is recorded in the EAC LOG.
+    Return a list of human-readable mismatches (empty if everything recorded matches).
+    '''
+
+    mismatches: list[str] = []
+
+    if log.is_range:
+        if log.range_copy_crc not in (whole['crc32'], whole['crc32_wo_null']):
+            mismatches.append(f'range Copy CRC {log.range_copy_crc} != actual {whole["crc32"]}')
+    elif len(log.tracks) != len(tracks):
+        mismatches.append(f'LOG has {len(log.tracks)} tracks but the audio has {len(tracks)}')
+
+    for number, log_track in sorted(log.tracks.items()):
+        if not (1 <= number <= len(tracks)):
+            continue
+        actual = tracks[number - 1]
+        if log_track.copy_crc and log_track.copy_crc not in (actual['crc32'], actual['crc32_wo_null']):
+            mismatches.append(f'track {number} Copy CRC {log_track.copy_crc} != actual {actual["crc32"]}')
+        if log_track.ar_crc:
+            ar_key = 'ar_v2' if log_track.ar_version == 2 else 'ar_v1'
+            if log_track.ar_crc != actual[ar_key]:
+                mismatches.append(
+                    f'track {number} AccurateRip v{log_track.ar_version} {log_track.ar_crc} != actual {actual[ar_key]}'
+                    )
+
+    return mismatches
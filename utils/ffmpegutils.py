@@ -1,8 +1,13 @@
+import time
 import shutil
+import bisect
+import subprocess
 from pathlib import Path
+from typing import BinaryIO
+from concurrent.futures import ThreadPoolExecutor
 
 from utils.fileutils import tryHardlink
-from configs import DEFAULT_WEBP_QUALITY, DEFAULT_JPEG_QUALITY
+from configs import DEFAULT_WEBP_QUALITY, DEFAULT_JPEG_QUALITY, NUM_CPU_JOBS
 
 import ffmpeg
 
@@ -10,8 +15,13 @@ import ffmpeg
 
 __all__ = [
     'tstFFmpegDecode',
+    'tstFFmpegDecodeFile',
     'tstFFmpegAudioDecode',
     'tstFFmpegVideoDecode',
+    'tstFFmpegPackets',
+    'getKeyframeTimes',
+    'getSubtitleEvents',
+    'getFFmpegDecodeErrors',
     'FFprobe',
     'toWebp',
     'toFLAC',
@@ -32,6 +42,17 @@ def tstFFmpegDecode(path: Path) -> bool:
 
 
 
+def tstFFmpegDecodeFile(fo: BinaryIO) -> bool:
+    '''Similar to `tstFFmpegDecode` but decode from a file object (e.g. an archive member) piped to ffmpeg.'''
+    try:
+        ffmpeg.input('pipe:').output('-', format='null').run(input=fo.read(), quiet=True)
+    except ffmpeg._run.Error:
+        return False
+    return True
+
+
+
+
 def tstFFmpegAudioDecode(path: Path, id: int = 0) -> bool:
     try:
         ffmpeg.input(path.resolve())[f'a:{id}'].output('-', format='null').run(quiet=True)
@@ -51,6 +72,119 @@ def tstFFmpegVideoDecode(path: Path, id: int = 0) -> bool:
 
 
 
+def tstFFmpegPackets(path: Path) -> bool:
+    '''
+    The cheap tier of integrity check: demux and stream-copy every packet to null without decoding.
+    This catches truncated/corrupted containers at nearly disk speed, but not a broken bitstream.
+    '''
+    try:
+        _, err = (ffmpeg.input(path.resolve())
+                        .output('-', format='null', map='0', c='copy')
+                        .global_args('-v', 'error')
+                        .run(capture_stdout=True, capture_stderr=True))
+    except ffmpeg._run.Error:
+        return False
+    return not err.strip()
+
+
+
+
+def getKeyframeTimes(path: Path, id: int = 0) -> list[int]:
+    '''
+    Return the timestamps (in ms, relative to the file start) of keyframes in the video track `id`.
+    This only reads packet flags from the demuxer, so it's much faster than decoding.
+    '''
+    try:
+        probe = ffmpeg.probe(path.resolve(), select_streams=f'v:{id}', show_entries='packet=pts_time,flags')
+    except ffmpeg._run.Error:
+        return []
+    offset = float(probe.get('format', {}).get('start_time', 0) or 0)
+    ret = set()
+    for packet in probe.get('packets', []):
+        if 'K' in packet.get('flags', '') and (pts := packet.get('pts_time')) not in (None, 'N/A'):
+            ret.add(max(0, round((float(pts) - offset) * 1000)))
+    return sorted(ret)
+
+
+
+
+def getSubtitleEvents(path: Path) -> dict[int, list[tuple[int, int, str]]]:
+    '''
+    Read out the events of all subtitle tracks in a single demuxing pass, without decoding or dumping the payloads.
+    Each event is (start, end, hash), the timestamps in ms relative to the file start, and the hash is the MD5
+    of the packet payload, i.e. the event line for ASS/SRT, or the display set bitmap for PGS (end == start if unknown).
+
+    Return: dict[int, list[tuple[int, int, str]]] the sorted events of each subtitle track (indexed among subtitles).
+    '''
+    try:
+        probe = ffmpeg.probe(path.resolve(), select_streams='s', show_data_hash='MD5',
+                             show_entries='packet=stream_index,pts_time,duration_time,data_hash')
+    except ffmpeg._run.Error:
+        return {}
+    offset = float(probe.get('format', {}).get('start_time', 0) or 0)
+    sub_idxs = [stream['index'] for stream in probe.get('streams', []) if stream.get('codec_type') == 'subtitle']
+    ret : dict[int, list[tuple[int, int, str]]] = {i: [] for i in range(len(sub_idxs))}
+    for packet in probe.get('packets', []):
+        if (idx := packet.get('stream_index')) not in sub_idxs: continue
+        if (pts := packet.get('pts_time')) in (None, 'N/A'): continue
+        start = max(0, round((float(pts) - offset) * 1000))
+        dur = packet.get('duration_time')
+        end = start + (round(float(dur) * 1000) if dur not in (None, 'N/A') else 0)
+        ret[sub_idxs.index(idx)].append((start, end, packet.get('data_hash', '')))
+    for events in ret.values():
+        events.sort()
+    return ret
+
+
+
+
+def _decodeSegment(path: Path, id: int, start: int, length: int) -> list[str]:
+    '''Decode the video track `id` from `start` for `length` (both in ms, 0 length to the end) to null.'''
+    kwargs = {'ss': f'{start / 1000:.3f}'}
+    if length > 0: kwargs['t'] = f'{length / 1000:.3f}'
+    try:
+        _, err = (ffmpeg.input(path.resolve(), **kwargs)[f'v:{id}']
+                        .output('-', format='null')
+                        .global_args('-v', 'error')
+                        .run(capture_stdout=True, capture_stderr=True))
+    except ffmpeg._run.Error as e:
+        err = e.stderr if e.stderr else b'ffmpeg exited abnormally'
+    return [line for line in err.decode('utf-8', errors='replace').splitlines() if line.strip()]
+
+
+
+
+def getFFmpegDecodeErrors(
+    path: Path, id: int = 0, num_segments: int = NUM_CPU_JOBS, num_workers: int = NUM_CPU_JOBS
+    ) -> list[tuple[int, str]]:
+    '''
+    Fully decode the video track `id`, but split the timeline into keyframe-aligned segments and decode them
+    concurrently with input seeking, so a long video can use more than one core.
+
+    Return: list[tuple[int, str]]
+    The ffmpeg error messages with the starting timestamp (ms) of the segment they come from, ordered by time.
+    An empty list means the video decoded cleanly.
+    '''
+
+    keyframes = getKeyframeTimes(path, id) if num_segments > 1 else []
+    starts = [0]
+    if len(keyframes) > 1:
+        duration = keyframes[-1]
+        for k in range(1, num_segments):
+            # the closest keyframe before the even split point
+            i = bisect.bisect_right(keyframes, duration * k // num_segments) - 1
+            if keyframes[i] > starts[-1]:
+                starts.append(keyframes[i])
+    lengths = [(end - start) for start, end in zip(starts, starts[1:])] + [0]
+
+    with ThreadPoolExecutor(max(1, min(num_workers, len(starts)))) as exe:
+        futures = [exe.submit(_decodeSegment, path, id, start, length) for start, length in zip(starts, lengths)]
+        results = [f.result() for f in futures]
+
+    return [(start, line) for start, lines in zip(starts, results) for line in lines]
+
+
+
 
 def FFprobe(path: Path, id: int = 0) -> dict:
     try:
@@ -143,28 +277,50 @@ def toJPG(src: Path, dst: Path) -> bool:
 
 
 
-def replaceIfSmaller(src: Path, dst: Path, bit:int, **kwds) -> bool:
+def replaceIfSmaller(src: Path, dst: Path, bit:int, validate: bool = False, interval: float = 0.1, **kwds) -> bool:
+    '''
+    Re-encode `src` to FLAC at `dst`, or place `src` itself at `dst` if the re-encoded one is not smaller.
+
+    The output is written to a temp file beside `dst` (so the final rename is atomic) instead of held in memory.
+    ffmpeg needs a seekable output to finalize the STREAMINFO (MD5 etc.), so we poll its size rather than pipe it,
+    and the encoding is stopped as soon as the output has grown past the source size.
+    If `validate`, the encoding instead goes on to the end, so that a False return still means a failed decoding.
+    '''
     if not src.is_file(): return False
     format = f's{bit}le'
     acodec = f'pcm_s{bit}le'
     file_size = src.stat().st_size
     remove_dst = not dst.is_file()
-    try:
-        stream = ffmpeg.input(src.resolve().as_posix())
-        stream = stream.output('pipe:', f='flac', compression_level=12, **kwds)
-        output = stream.run(quiet=True, capture_stdout=True)[0]
-    except ffmpeg._run.Error:
-        if remove_dst: dst.unlink(missing_ok=True)
-        return False
+    tmp = dst.with_name(f'.{dst.stem}.tmp{dst.suffix}')
     try:
         dst.parent.mkdir(parents=True, exist_ok=True)
-        if len(output) > file_size:
+        stream = ffmpeg.input(src.resolve().as_posix())
+        stream = stream.output(tmp.resolve().as_posix(), f='flac', compression_level=12, **kwds)
+        args = ffmpeg.compile(stream, overwrite_output=True)
+        proc = subprocess.Popen(args, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        oversize = False
+        while proc.poll() is None:
+            if not validate and tmp.is_file() and tmp.stat().st_size > file_size:
+                proc.kill()
+                proc.wait()
+                oversize = True
+                break
+            time.sleep(interval)
+        if not oversize:
+            if proc.returncode:
+                tmp.unlink(missing_ok=True)
+                if remove_dst: dst.unlink(missing_ok=True)
+                return False
+            oversize = tmp.stat().st_size > file_size
+        if oversize:
+            tmp.unlink(missing_ok=True)
+            dst.unlink(missing_ok=True)
             if not tryHardlink(src, dst):
                 shutil.copy2(src, dst)
         else:
-            # TODO: high memory usage may occur when writing large files
-            dst.write_bytes(output)
+            tmp.replace(dst)
     except:
+        tmp.unlink(missing_ok=True)
         if remove_dst: dst.unlink(missing_ok=True)
         return False
     return True
@@ -1,9 +1,11 @@
 '''Generic file io operations.'''
 
 __all__ = [
+    'DirSnapshot',
     'listFile',
     'listDir',
     'tstFileEncoding',
+    'decodeStrict',
     'tstMkHardlink',
     'tstMkHardlinks',
     'tstMkHardlinkInDir',
@@ -37,6 +39,162 @@ import yaml
 
 
 
+class DirSnapshot:
+    '''
+    A file tree listed by a single `os.scandir` walk, so checkers can query it again and again without touching
+    the disk. This matters a lot on NAS/SMB mounts where every extra `rglob` costs seconds.
+
+    The queries `listFile()` and `listDir()` behave the same as the module-level functions of the same names.
+    Any query outside the snapshot root silently falls back to the module-level functions.
+
+    NOTE the snapshot is not updated if the tree is changed afterwards, create a new one in that case.
+    '''
+
+    def __init__(self, root: str|Path):
+
+        self.__root: Path = Path(Path(root).as_posix())
+        self.__entries: dict[Path, os.DirEntry] = {}
+        self.__files_by_parent: dict[Path, list[Path]] = {}
+        self.__dirs_by_parent: dict[Path, list[Path]] = {}
+        self.__files_by_ext: dict[str, list[Path]] = {}
+        self.__files_by_depth: dict[int, list[Path]] = {}
+
+        if self.__root.is_dir():
+            self.__walk()
+
+    def __walk(self):
+        stack: list[tuple[Path, int]] = [(self.__root, 0)]
+        self.__dirs_by_parent[self.__root] = []
+        self.__files_by_parent[self.__root] = []
+        # the symlinked dirs are followed as `listDir()` does, and the (dev, inode) guards against symlink loops
+        visited: set[tuple[int, int]] = set()
+        while stack:
+            parent, depth = stack.pop()
+            try:
+                st = os.stat(parent)
+                if (st.st_dev, st.st_ino) in visited: continue
+                visited.add((st.st_dev, st.st_ino))
+                it = os.scandir(parent)
+            except OSError:
+                continue
+            with it:
+                for entry in it:
+                    path = parent.joinpath(entry.name)
+                    try:
+                        if entry.is_dir():
+                            self.__entries[path] = entry
+                            self.__dirs_by_parent[parent].append(path)
+                            self.__dirs_by_parent[path] = []
+                            self.__files_by_parent[path] = []
+                            stack.append((path, depth + 1))
+                        elif entry.is_file():
+                            self.__entries[path] = entry
+                            self.__files_by_parent[parent].append(path)
+                            self.__files_by_ext.setdefault(path.suffix.lower(), []).append(path)
+                            self.__files_by_depth.setdefault(depth, []).append(path)
+                    except OSError:
+                        continue
+
+    #* basic info ------------------------------------------------------------------------------------------------------
+
+    @property
+    def root(self) -> Path:
+        return self.__root
+
+    def __contains__(self, path: str|Path) -> bool:
+        path = Path(Path(path).as_posix())
+        return (path == self.__root) or (path in self.__entries)
+
+    def covers(self, path: str|Path) -> bool:
+        '''Whether the dir `path` is inside the snapshot i.e. can be queried without touching the disk.'''
+        return Path(Path(path).as_posix()) in self.__dirs_by_parent
+
+    def stat(self, path: str|Path) -> os.stat_result:
+        '''The stat result is cached by the underlying `os.DirEntry`, so repeated calls are free.'''
+        path = Path(Path(path).as_posix())
+        if entry := self.__entries.get(path):
+            return entry.stat()
+        return path.stat()
+
+    def size(self, path: str|Path) -> int:
+        return self.stat(path).st_size
+
+    #* indexes ---------------------------------------------------------------------------------------------------------
+
+    def filesByExt(self, ext: str|Iterable[str]) -> list[Path]:
+        '''All files having the extension(s), which follows the matching rule of `listFile()`.'''
+        exts = (ext, ) if isinstance(ext, str) else tuple(ext)
+        ret: list[Path] = []
+        for suffix, paths in self.__files_by_ext.items():
+            if suffix.endswith(exts):
+                ret += paths
+        return sorted(ret)
+
+    def filesByDepth(self, depth: int) -> list[Path]:
+        '''All files at the given depth, where depth 0 means the files directly under the root.'''
+        return sorted(self.__files_by_depth.get(depth, []))
+
+    def filesByParent(self, parent: str|Path) -> list[Path]:
+        return sorted(self.__files_by_parent.get(Path(Path(parent).as_posix()), []))
+
+    def dirsByParent(self, parent: str|Path) -> list[Path]:
+        return sorted(self.__dirs_by_parent.get(Path(Path(parent).as_posix()), []))
+
+    def depth(self, path: str|Path) -> int:
+        '''The depth of a file as in `filesByDepth()`, or the depth of the files directly under a dir.'''
+        path = Path(Path(path).as_posix())
+        return len(path.relative_to(self.__root).parts) - (0 if path in self.__dirs_by_parent else 1)
+
+    def __iterDirs(self, top: Path) -> list[Path]:
+        ret: list[Path] = [top]
+        stack = [top]
+        while stack:
+            subdirs = self.__dirs_by_parent[stack.pop()]
+            ret += subdirs
+            stack += subdirs
+        return ret
+
+    #* queries ---------------------------------------------------------------------------------------------------------
+
+    def listFile(
+        self, *paths, ext: Optional[str|Iterable[str]] = None, rglob: bool = True, reduce: bool = True, sort: bool = True
+        ) -> list[Path]:
+        paths = [Path(Path(p).as_posix()) for p in paths]
+        ret: list[Path] = []
+        for p in paths:
+            if p in self.__dirs_by_parent:
+                for d in (self.__iterDirs(p) if rglob else [p]):
+                    ret += self.__files_by_parent[d]
+            elif p in self.__entries:
+                ret.append(p)
+            else:
+                ret += listFile(p, rglob=rglob, reduce=False, sort=False)
+        if ext:
+            exts = (ext, ) if isinstance(ext, str) else tuple(ext)
+            ret = [p for p in ret if p.suffix.lower().endswith(exts)]
+        if reduce:
+            ret = list(set(ret))
+        if sort:
+            ret = sorted(ret)
+        return ret
+
+    def listDir(self, *inp_paths, rglob: bool = True, reduce: bool = True, sort: bool = True) -> list[Path]:
+        inp_paths = list(Path(Path(p).as_posix()) for p in inp_paths)
+        ret: list[Path] = []
+        for p in inp_paths:
+            if p in self.__dirs_by_parent:
+                ret += self.__iterDirs(p) if rglob else self.__dirs_by_parent[p]
+            else:
+                ret += listDir(p, rglob=rglob, reduce=False, sort=False)
+        if reduce:
+            ret = list(set(ret))
+        if sort:
+            ret = sorted(ret)
+        return ret
+
+
+
+
 def listFile(
     *paths, ext: Optional[str|Iterable[str]] = None, rglob: bool = True, reduce: bool = True, sort: bool = True
     ) -> list[Path]:
@@ -75,15 +233,10 @@ def listDir(*inp_paths, rglob: bool = True, reduce: bool = True, sort: bool = Tr
 
 
 
-def tstFileEncoding(path: Path, encoding: str = 'utf-8-sig') -> bool:
-    '''Test if the given encoding can decode the path file without any problem.'''
-
-    # TODO integrate with chardet to achieve a better result?
+def decodeStrict(raw_data: bytes, encoding: str = 'utf-8-sig') -> str|None:
+    '''Decode the bytes if the given encoding (with the BOM expected for utf-8-sig/utf-16) fits it, otherwise None.'''
 
     try:
-        path = Path(path)
-        assert path.is_file()
-        raw_data = path.read_bytes()
         match encoding.lower():
             case 'utf-8-sig'|'utf_8_sig':
                 assert raw_data[:3] == b'\xef\xbb\xbf'
@@ -91,12 +244,23 @@ def tstFileEncoding(path: Path, encoding: str = 'utf-8-sig') -> bool:
                 assert raw_data[:2] == b'\xff\xfe'
             case 'utf-16-be'|'utf_16_be':
                 assert raw_data[:2] == b'\xfe\xff'
-        path.read_text(encoding=encoding, errors='strict')
+        return raw_data.decode(encoding=encoding, errors='strict')
     except AssertionError:
-        return False
+        return None
     except UnicodeError:
-        return False
-    return True
+        return None
+
+
+
+
+def tstFileEncoding(path: Path, encoding: str = 'utf-8-sig') -> bool:
+    '''Test if the given encoding can decode the path file without any problem.'''
+
+    # TODO integrate with chardet to achieve a better result?
+
+    path = Path(path)
+    if not path.is_file(): return False
+    return decodeStrict(path.read_bytes(), encoding) is not None
 
 
 
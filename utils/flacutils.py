@@ -0,0 +1,117 @@
+from pathlib import Path
+from multiprocessing import Pool
+
+import ffmpeg
+
+from .ffmpegutils import tstFFmpegDecode
+
+
+__all__ = [
+    'readFlacStreamInfo',
+    'getFlacPcmMD5',
+    'tstFlacMD5',
+    'tstAudioFilesValid',
+    ]
+
+
+
+
+def readFlacStreamInfo(path: Path) -> dict|None:
+    '''
+    Read the STREAMINFO metadata block of a FLAC file, which is always the first block after the 'fLaC' marker.
+    A leading ID3v2 tag (not standard but seen in the wild) is skipped.
+
+    Return: dict with keys `sample_rate`, `channels`, `bits_per_sample`, `total_samples`, `md5` (hex string),
+    or None if the file is not a valid FLAC.
+    '''
+    try:
+        with Path(path).open('rb') as fo:
+            head = fo.read(10)
+            if head[:3] == b'ID3' and len(head) == 10:
+                size = (head[6] & 0x7f) << 21 | (head[7] & 0x7f) << 14 | (head[8] & 0x7f) << 7 | (head[9] & 0x7f)
+                if head[5] & 0x10: size += 10  # footer present
+                fo.seek(10 + size)
+            else:
+                fo.seek(0)
+            if fo.read(4) != b'fLaC':
+                return None
+            block_header = fo.read(4)
+            if len(block_header) != 4 or (block_header[0] & 0x7f) != 0:
+                return None
+            block = fo.read(34)
+            if len(block) != 34:
+                return None
+    except OSError:
+        return None
+
+    # bytes 10-17: 20b sample rate, 3b (channels - 1), 5b (bps - 1), 36b total samples
+    packed = int.from_bytes(block[10:18], 'big')
+    return {
+        'sample_rate': packed >> 44,
+        'channels': ((packed >> 41) & 0x7) + 1,
+        'bits_per_sample': ((packed >> 36) & 0x1f) + 1,
+        'total_samples': packed & 0xfffffffff,
+        'md5': block[18:34].hex(),
+        }
+
+
+
+
+# FLAC computes the signature on the little-endian signed samples of the original width
+# ffmpeg decodes FLAC into s16/s32 left-aligned samples, so only the byte-aligned depths map back exactly
+_MD5_PCM_CODECS = {8: 'pcm_s8', 16: 'pcm_s16le', 24: 'pcm_s24le', 32: 'pcm_s32le'}
+
+
+def getFlacPcmMD5(path: Path, bits_per_sample: int) -> str:
+    '''
+    Decode the audio to raw PCM of the given bit depth and return the MD5 over the samples.
+    Return an empty string if ffmpeg fails to decode the file.
+    '''
+    try:
+        out, _ = (ffmpeg.input(Path(path).resolve())['a:0']
+                        .output('-', format='md5', acodec=_MD5_PCM_CODECS[bits_per_sample])
+                        .run(capture_stdout=True, capture_stderr=True))
+    except ffmpeg._run.Error:
+        return ''
+    return out.decode('utf-8').strip().removeprefix('MD5=').lower()
+
+
+
+
+def tstFlacMD5(path: Path) -> bool|None:
+    '''
+    Verify a FLAC file by comparing the MD5 of its decoded samples against the STREAMINFO signature.
+    This streams the decoded audio into a hash instead of a full decoding to null plus a separate hashing pass.
+
+    Return: True if matched; False if mismatched or failed to decode;
+    None if the STREAMINFO is unreadable or has no usable signature (unset/zero or non byte-aligned bit depth),
+    in which case the caller should fall back to a plain decoding test.
+    '''
+    info = readFlacStreamInfo(path)
+    if not info:
+        return None
+    if not int(info['md5'], 16) or info['bits_per_sample'] not in _MD5_PCM_CODECS:
+        return None
+    return getFlacPcmMD5(path, info['bits_per_sample']) == info['md5']
+
+
+
+
+def _tstAudioFileValid(path: Path) -> bool:
+    if (md5_ok := tstFlacMD5(path)) is not None:
+        return md5_ok
+    return tstFFmpegDecode(Path(path))
+
+
+def tstAudioFilesValid(paths: list[Path], mp: int = 1) -> list[bool]:
+    '''
+    Verify the audio files in a batch: FLAC against their STREAMINFO MD5 signature,
+    and the others (or FLAC without a usable signature) by a plain decoding test.
+    '''
+    mp = int(mp)
+    if mp > 1 and len(paths) > 1:
+        with Pool(mp) as pool:
+            results = list(pool.map(_tstAudioFileValid, paths))
+    else:
+        results = list(map(_tstAudioFileValid, paths))
+    return results
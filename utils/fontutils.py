@@ -1,19 +1,37 @@
 
+import os
+import json
 import logging
 import itertools
 from pathlib import Path
+from typing import BinaryIO
+from functools import lru_cache
+from multiprocessing import Pool
 
 from .subtitle import *
+from .fileid import getCRC32
 from .fileutils import listFile
 from configs.commons import *
 from configs.runtime import *
+from configs.user import FONT_NAME_CACHE
 
+import numpy as np
+from ass_parser import AssFile
 from fontTools.ttLib import TTFont, TTCollection
 
 
 
 
-__all__ = ['tstFontPath', 'getValidFontPaths', 'toTTFontObjs', 'listFontNamesInTTFontObjs']
+__all__ = [
+    'tstFontPath',
+    'tstFontFile',
+    'getValidFontPaths',
+    'toTTFontObjs',
+    'listFontNamesInTTFontObjs',
+    'readFontNames',
+    'getFontNameIndex',
+    'getFontCmap',
+    ]
 
 
 
@@ -43,6 +61,23 @@ def tstFontPath(path:Path) -> bool:
 
 
 
+def tstFontFile(fo: BinaryIO, name: str) -> bool:
+    '''Similar to `tstFontPath` but test a font from a file object e.g. an archive member, `name` decides its type.'''
+
+    try:
+        if name.lower().endswith(COMMON_F_FONT_EXTS):
+            TTFont(fo, checkChecksums=2)
+        elif name.lower().endswith(COMMON_C_FONT_EXTS):
+            TTCollection(fo, checkChecksums=2)
+        else:
+            return False
+    except:
+        return False
+    return True
+
+
+
+
 def getValidFontPaths(*inp: Path) -> list[Path]:
     possible_fonts = listFile(*inp, ext=COMMON_FONT_EXTS, rglob=False)
     ret = []
@@ -63,33 +98,207 @@ def toTTFontObjs(*inp:Path) -> list[TTFont]:
 
 
 
+def _listFontNamesInTTFontObj(f:TTFont) -> list[str]:
+    ret = []
+    base_names : list[str] = []
+    sub_family_names : list[str] = []
+    for n in f['name'].names: # TODO here is a type warning, fix it
+        # print(f'{n.nameID:4d} {n.langID:4d} {n.platformID:4d} {n.platEncID:4d} {n.toUnicode()}')
+        if n.nameID in ENABLED_FONT_NAME_IDS:
+            try:
+                base_names.append(n.toUnicode())
+            except:
+                base_names.append(n.toStr())
+        elif n.nameID in FONT_SUBFAMILY_NAME_IDS:
+            try:
+                sub_family_names.append(n.toUnicode())
+            except:
+                sub_family_names.append(n.toStr())
+    if sub_family_names:
+        for b, s in itertools.product(base_names, sub_family_names):
+            ret.append(f'{b} {s}')
+    ret.extend(base_names)
+    return ret
+
+
+
+
 def listFontNamesInTTFontObjs(*inp:TTFont) -> list[str]:
     ret = []
     for f in inp:
-        base_names : list[str] = []
-        sub_family_names : list[str] = []
-        for n in f['name'].names: # TODO here is a type warning, fix it
-            # print(f'{n.nameID:4d} {n.langID:4d} {n.platformID:4d} {n.platEncID:4d} {n.toUnicode()}')
-            if n.nameID in ENABLED_FONT_NAME_IDS:
-                try:
-                    base_names.append(n.toUnicode())
-                except:
-                    base_names.append(n.toStr())
-            elif n.nameID in FONT_SUBFAMILY_NAME_IDS:
-                try:
-                    sub_family_names.append(n.toUnicode())
-                except:
-                    sub_family_names.append(n.toStr())
-        if sub_family_names:
-            for b, s in itertools.product(base_names, sub_family_names):
-                ret.append(f'{b} {s}')
-        ret.extend(base_names)
+        ret.extend(_listFontNamesInTTFontObj(f))
     return sorted((set(ret)))
 
 
 
 
-def chkFontSufficiency(ass_files:list[Path], font_files:list[Path], logger:logging.Logger):
+def readFontNames(path:Path) -> list[str]:
+    '''
+    Similar to `listFontNamesInTTFontObjs(*toTTFontObjs(path))` but only the `name` table is loaded,
+    so it is much faster on large CJK fonts.
+    '''
+    if path.suffix.lower().endswith(COMMON_C_FONT_EXTS):
+        with TTCollection(path, lazy=True) as c:
+            return sorted(set(itertools.chain(*(_listFontNamesInTTFontObj(f) for f in c.fonts))))
+    with TTFont(path, lazy=True) as f:
+        return sorted(set(_listFontNamesInTTFontObj(f)))
+
+
+
+
+def _indexFont(path:Path) -> tuple[bool, list[str]]:
+    '''Return the validity and the font names of the font file.'''
+    if not tstFontPath(path):
+        return False, []
+    try:
+        return True, readFontNames(path)
+    except:
+        return False, []
+
+
+
+
+def _loadFontNameCache(cache_path:Path) -> dict:
+    try:
+        cache = json.loads(cache_path.read_text('utf-8'))
+        assert isinstance(cache.get('fonts'), dict) and isinstance(cache.get('stats'), dict)
+        return cache
+    except:
+        return {'fonts': {}, 'stats': {}}
+
+
+
+
+def _saveFontNameCache(cache_path:Path, cache:dict):
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_name(f'.{cache_path.name}.{os.getpid()}.tmp')
+        tmp_path.write_text(json.dumps(cache, ensure_ascii=False), 'utf-8')
+        tmp_path.replace(cache_path)
+    except:
+        pass
+
+
+
+
+def getFontNameIndex(paths:list[Path], mp:int=1, cache_path:Path|None=FONT_NAME_CACHE) -> dict[Path, tuple[bool, list[str]]]:
+    '''
+    Return the validity (see `tstFontPath`) and the font names (see `readFontNames`) of each font file.
+
+    The result is kept in a persistent index at `cache_path` keyed by the CRC32 of the font file,
+    and the CRC32 is in turn remembered by the file path, size and mtime,
+    so the fonts already seen before are not hashed again, and those seen under other paths are only hashed.
+    Only the fonts of an unknown CRC32 are validated and parsed. This is done by `mp` processes.
+    '''
+    cache = _loadFontNameCache(cache_path) if cache_path else {'fonts': {}, 'stats': {}}
+    fonts : dict[str, list] = cache['fonts']
+    stats : dict[str, list] = cache['stats']
+
+    ret : dict[Path, tuple[bool, list[str]]] = {}
+    missed : list[Path] = []
+    for path in paths:
+        st = path.stat()
+        stat = stats.get(str(path.resolve()))
+        if stat and stat[:2] == [st.st_size, st.st_mtime_ns] and stat[2] in fonts:
+            valid, names = fonts[stat[2]]
+            ret[path] = (valid, names)
+        else:
+            missed.append(path)
+
+    if missed:
+        mp = int(mp)
+        # the same content under several paths is only parsed once
+        if mp > 1 and len(missed) > 1:
+            with Pool(mp) as pool:
+                crc32s = pool.map(getCRC32, missed)
+                unknown = {crc32: path for path, crc32 in zip(missed, crc32s) if crc32 not in fonts}
+                results = pool.map(_indexFont, list(unknown.values()))
+        else:
+            crc32s = list(map(getCRC32, missed))
+            unknown = {crc32: path for path, crc32 in zip(missed, crc32s) if crc32 not in fonts}
+            results = list(map(_indexFont, unknown.values()))
+        for crc32, (valid, names) in zip(unknown.keys(), results):
+            fonts[crc32] = [valid, names]
+        for path, crc32 in zip(missed, crc32s):
+            st = path.stat()
+            stats[str(path.resolve())] = [st.st_size, st.st_mtime_ns, crc32]
+            valid, names = fonts[crc32]
+            ret[path] = (valid, names)
+        if cache_path: _saveFontNameCache(cache_path, cache)
+
+    return ret
+
+
+
+
+def _readFontCmap(path:Path) -> np.ndarray:
+    '''Return the sorted codepoints mapped by the font (all faces if a collection), only the `cmap` table is loaded.'''
+    if path.suffix.lower().endswith(COMMON_C_FONT_EXTS):
+        with TTCollection(path, lazy=True) as c:
+            cmaps = [(f.getBestCmap() or {}).keys() for f in c.fonts]
+    else:
+        with TTFont(path, lazy=True) as f:
+            cmaps = [(f.getBestCmap() or {}).keys()]
+    return np.unique(np.fromiter(itertools.chain(*cmaps), dtype=np.uint32))
+
+
+@lru_cache(maxsize=1024)
+def _getFontCmap(path:Path, size:int, mtime_ns:int) -> np.ndarray:
+    return _readFontCmap(path)
+
+
+def getFontCmap(path:Path) -> np.ndarray:
+    '''Cached `_readFontCmap()`, invalidated if the file is modified.'''
+    st = path.stat()
+    return _getFontCmap(path.resolve(), st.st_size, st.st_mtime_ns)
+
+
+
+
+def _chkGlyphCoverage(ass_objs:list[AssFile], font_index:dict[Path, tuple[bool, list[str]]],
+                      logger:logging.Logger, mp:int=1):
+
+    used : dict[str, np.ndarray] = {}
+    for ass_obj in ass_objs:
+        for font, codepoints in listCodepointsByFontInAssFileObj(ass_obj).items():
+            used[font] = np.union1d(used[font], codepoints) if font in used else codepoints
+
+    # renderers match the font name case-insensitively
+    name_to_paths : dict[str, list[Path]] = {}
+    for path, (valid, names) in font_index.items():
+        if not valid: continue
+        for name in names:
+            name_to_paths.setdefault(name.lower(), []).append(path)
+
+    # only load the cmap of the fonts actually used
+    paths = sorted(set(itertools.chain(*(name_to_paths.get(font.lower(), []) for font in used))))
+    mp = int(mp)
+    if mp > 1 and len(paths) > 1:
+        with Pool(mp) as pool:
+            cmaps = dict(zip(paths, pool.map(_readFontCmap, paths)))
+    else:
+        cmaps = {path: getFontCmap(path) for path in paths}
+
+    for font, codepoints in sorted(used.items()):
+        if not (font_paths := name_to_paths.get(font.lower())):
+            continue  # already reported by the name checking
+        cmap = cmaps[font_paths[0]]
+        for path in font_paths[1:]:
+            cmap = np.union1d(cmap, cmaps[path])
+        if (missing := np.setdiff1d(codepoints, cmap, assume_unique=True)).size:
+            chars = ''.join(chr(c) for c in missing[:50])
+            logger.warning(f'The font "{font}" lacks {missing.size} glyphs used in ASS: "{chars}"'
+                           + ('...' if missing.size > 50 else ''))
+
+
+
+
+def chkFontSufficiency(ass_files:list[Path], font_files:list[Path], logger:logging.Logger, mp:int=1,
+                       coverage:bool=False):
+    '''
+    Check if the fonts used in the ASS files are all provided.
+    If `coverage`, also check if each font has the glyphs of all characters rendered in it.
+    '''
 
     # TODO this is currently a preliminary implementation
 
@@ -97,7 +306,8 @@ def chkFontSufficiency(ass_files:list[Path], font_files:list[Path], logger:loggi
     font_files = listFile(font_files, ext=COMMON_FONT_EXTS, rglob=False)
 
     valid_ass_files = filterValidASSFiles(*ass_files)
-    valid_font_files = getValidFontPaths(*font_files)
+    font_index = getFontNameIndex(font_files, mp=mp)
+    valid_font_files = [f for f in font_files if font_index[f][0]]
 
     if len(ass_files) != len(valid_ass_files):
         logger.warning('Some input ASS files are invalid.')
@@ -110,10 +320,12 @@ def chkFontSufficiency(ass_files:list[Path], font_files:list[Path], logger:loggi
         logger.warning('Some ASS files contain tags that cannot be parsed by the library. '
                        'The accuracy of font listing may be lowered a little bit.')
 
-    ttfont_objs = toTTFontObjs(*valid_font_files)
-    all_font_names_in_font_files = listFontNamesInTTFontObjs(*ttfont_objs)
+    all_font_names_in_font_files = sorted(set(itertools.chain(*(font_index[f][1] for f in valid_font_files))))
 
     if diff := set(all_font_names_in_ass_files).difference(all_font_names_in_font_files):
         logger.warning('Some fonts in ASS may be missing in the font 7z/zip/rar:')
         for i, font in enumerate(diff):
             logger.warning(f'{i:03d}: {font}')
+
+    if coverage:
+        _chkGlyphCoverage(ass_font_objs, {f: font_index[f] for f in valid_font_files}, logger, mp=mp)
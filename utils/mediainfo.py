@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import BinaryIO
 from multiprocessing import Pool
 from configs import *
 from pymediainfo import MediaInfo
@@ -17,7 +18,7 @@ MI = MediaInfo
 
 
 
-def getMediaInfo(path:Path) -> MediaInfo:
+def getMediaInfo(path:Path|BinaryIO) -> MediaInfo:
     '''
     This is used to suppress the type mismatch warning.
     MI.parse() only returns MediaInfo if `output=None`. Never str.
@@ -1,6 +1,6 @@
 import difflib
-import itertools
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
 import utils.mediainfo
 from configs import *
@@ -8,14 +8,17 @@ from configs import *
 
 import ffmpeg # NOTE if using ffmpeg but numpy, place the functions in ffmpegutils.py
 import numpy as np
-import scipy.signal as sps
+import scipy.fft as spf
 
 
-__all__ = ['readAudio',
+__all__ = ['readAudio', 'readAudios',
            'pickAudioSamples', 'cmpAudioSamples',
            'calcAudioOffset', 'getAudioFileOffset',
            'subtractAudio', 'subtractAudioFile',
-           'mkSpectrogram']
+           'mkSpectrogram',
+           'readVideoFrame', 'readVideoFrames',
+           'resizeArea', 'calcDHash', 'cmpFrames',
+           'readImage', 'calcImageDiff', 'matchImageHashes', 'mkDiffHeatmap']
 
 
 
@@ -41,6 +44,21 @@ def readAudio(path: Path, id: str | int = 0, start: int = 0, length: int = 0) ->
 
 
 
+def readAudios(items: list[tuple], mp: int = 2) -> list[np.ndarray]:
+    '''
+    Run `readAudio()` for each (path, id, start, length) concurrently in at most `mp` ffmpeg processes.
+    Each pipe is drained in its own thread, so a slow decoder does not stall the others.
+    '''
+    mp = int(mp)
+    job = lambda item: readAudio(*item)
+    if mp > 1 and len(items) > 1:
+        with ThreadPoolExecutor(min(mp, len(items))) as executor:
+            return list(executor.map(job, items))
+    return list(map(job, items))
+
+
+
+
 def pickAudioSamples(path: Path) -> str:
     '''
     Simply use the idx of max value as the anchor point
@@ -109,20 +127,70 @@ def getMatchedSubSequence(list1, list2):
 
 
 
-def calcAudioOffset(a1:np.ndarray, a2:np.ndarray, start:int=0, length:int=1440000) -> tuple[int, int]:
+def _xcorr(a1:np.ndarray, a2:np.ndarray) -> tuple[np.ndarray, int]:
+    '''
+    Cross-correlate by a float32 real FFT padded to a fast length, i.e. c[lag] = sum(a1[t+lag] * a2[t]).
+    Return the correlation of all lags in ascending order, and the lag of its first element.
+    '''
+    nfft = spf.next_fast_len(len(a1) + len(a2) - 1, real=True)
+    c = spf.irfft(spf.rfft(a1, nfft) * np.conj(spf.rfft(a2, nfft)), nfft)
+    # non-negative lags are at the head, the negative ones wrap around to the tail
+    return np.concatenate((c[nfft - len(a2) + 1:], c[:len(a1)])), 1 - len(a2)
+
+
+
+
+def _decimate(a:np.ndarray, factor:int) -> np.ndarray:
+    '''Downsample by averaging every `factor` samples, which is also a (rough) anti-aliasing filter.'''
+    return a[:len(a) // factor * factor].reshape(-1, factor).mean(axis=1, dtype=np.float32)
+
+
+
+
+def calcAudioOffset(a1:np.ndarray, a2:np.ndarray, start:int=0, length:int=1440000,
+                    decimation:int=16, refine_len:int=2**16) -> tuple[int, int]:
     '''
     Calculate the offset between 2 audio `ndarray` by samples within [start, start+length].
     Return the starting sample index.
+
+    The lag is first searched on the audio decimated by `decimation`,
+    then refined at the full rate on a short window (`refine_len`) of the highest energy around the coarse lag.
+    So a long search window (i.e. a large head offset) is affordable.
     '''
     if len(a1.shape) > 1: a1 = a1[:, 0]
     if len(a2.shape) > 1: a2 = a2[:, 0]
     if len(a1) < length: a1 = np.pad(a1, (0, length - len(a1)))
     if len(a2) < length: a2 = np.pad(a2, (0, length - len(a2)))
-    xcorr = sps.fftconvolve(a1, a2[::-1])
-    idx = int(np.argmax(xcorr))
-    if (a1**2 + a2**2).sum() / xcorr[idx] <= XCORR_RATIO:
-        idx = idx - len(a2) + 1
-        start1, start2 = (max(0, idx), abs(min(0, idx)))
+    x1, x2 = a1.astype(np.float32), a2.astype(np.float32)
+
+    if decimation > 1 and min(len(x1), len(x2)) >= decimation * refine_len // 4:
+        c, base = _xcorr(_decimate(x1, decimation), _decimate(x2, decimation))
+        coarse = (int(np.argmax(c)) + base) * decimation
+        # pick the window of a2 with the highest energy in the overlap of the coarse lag
+        lo, hi = max(0, -coarse), min(len(x2), len(x1) - coarse)
+        w = min(refine_len, max(hi - lo, 1))
+        energies = (x2[lo:lo + (hi - lo) // w * w].reshape(-1, w) ** 2).sum(axis=1) if hi - lo >= w else [0]
+        s = lo + int(np.argmax(energies)) * w
+        margin = 2 * decimation
+        b1 = min(max(0, s + coarse - margin), len(x1) - 1)
+        e1 = min(len(x1), s + coarse + w + margin)
+        c, base = _xcorr(x1[b1:e1], x2[s:s + w])
+        # only search the lags within the margin of the coarse lag
+        i0 = max(0, coarse - margin - b1 + s - base)
+        i1 = min(len(c), coarse + margin - b1 + s - base + 1)
+        lag = (i0 + int(np.argmax(c[i0:i1])) + base + b1 - s) if i1 > i0 else coarse
+    else:
+        c, base = _xcorr(x1, x2)
+        lag = int(np.argmax(c)) + base
+
+    # the exact peak and the energies in float64, so no int16 overflow
+    if lag >= 0:
+        peak = np.dot(a1[lag:lag + len(a2)].astype(np.float64), a2[:len(a1) - lag].astype(np.float64))
+    else:
+        peak = np.dot(a1[:len(a2) + lag].astype(np.float64), a2[-lag:-lag + len(a1)].astype(np.float64))
+    energy = np.square(a1, dtype=np.float64).sum() + np.square(a2, dtype=np.float64).sum()
+    if peak > 0 and energy / peak <= XCORR_RATIO:
+        start1, start2 = (max(0, lag), abs(min(0, lag)))
     else:
         start1, start2 = (0, 0)
     return start1, start2
@@ -139,7 +207,7 @@ def getAudioFileOffset(f1: tuple[Path, str|int],
     Calculate the offset between 2 audio [`path`, `track_id`] by samples within [start, start+length].
     Return the starting sample index.
     '''
-    a1, a2 = itertools.starmap(readAudio, ((*f1, start, length), (*f2, start, length)))
+    a1, a2 = readAudios([(*f1, start, length), (*f2, start, length)])
     return calcAudioOffset(a1, a2, start, length)
 
 
@@ -169,7 +237,7 @@ def subtractAudioFile(f1: tuple[Path, str|int, int], f2: tuple[Path, str|int, in
     The reason why we return audio sample count here instead of using mediainfo is that
     audio header may be incorrect due to concatenating etc.
     '''
-    a1, a2 = itertools.starmap(readAudio, (f1, f2))
+    a1, a2 = readAudios([f1, f2])
     l1, l2 = len(a1), len(a2)
     if l := (l1 - l2):
         a1, a2 = a1[:l1 - l], a2[:l2 + l]
@@ -188,3 +256,158 @@ def mkSpectrogram(img_path: Path, audio: np.ndarray, fs: int = 48000) -> bool:
     except:
         return False
     return True
+
+
+
+
+def readVideoFrame(path: Path, time: float, id: str|int = 0, width: int = 144, height: int = 80) -> np.ndarray|None:
+    '''
+    Decode the frame at `time` (second) of the video track `id`, downscaled to a `width`x`height` grayscale image.
+    The input seeking only decodes from the nearest keyframe, so no full decoding is needed.
+    Return None if failed e.g. `time` is beyond the end.
+    '''
+    try:
+        out = (ffmpeg.input(path.resolve(), ss=f'{time:.3f}')[f'v:{id}']
+                     .filter('scale', width, height, flags='area')
+                     .output('-', vframes=1, format='rawvideo', pix_fmt='gray')
+                     .run(capture_stdout=True, quiet=True)[0])
+    except ffmpeg._run.Error:
+        return None
+    if len(out) != width * height:
+        return None
+    return np.frombuffer(out, np.uint8).reshape(height, width)
+
+
+
+
+def readVideoFrames(items: list[tuple[Path, float]], id: str|int = 0, width: int = 144, height: int = 80,
+                    mp: int = 1) -> list[np.ndarray|None]:
+    '''Run `readVideoFrame()` for each (path, time) concurrently in at most `mp` ffmpeg processes.'''
+    mp = int(mp)
+    job = lambda item: readVideoFrame(item[0], item[1], id=id, width=width, height=height)
+    if mp > 1 and len(items) > 1:
+        with ThreadPoolExecutor(min(mp, len(items))) as executor:
+            return list(executor.map(job, items))
+    return list(map(job, items))
+
+
+
+
+def resizeArea(a: np.ndarray, height: int, width: int) -> np.ndarray:
+    '''Downscale the images `a[..., H, W]` to `[..., height, width]` by averaging, requiring H>=height and W>=width.'''
+    H, W = a.shape[-2:]
+    ys = (np.arange(height + 1) * H) // height
+    xs = (np.arange(width + 1) * W) // width
+    sums = np.add.reduceat(np.add.reduceat(a.astype(np.float32), ys[:-1], axis=-2), xs[:-1], axis=-1)
+    return sums / (np.diff(ys)[:, None] * np.diff(xs)[None, :])
+
+
+
+
+def calcDHash(a: np.ndarray) -> np.ndarray:
+    '''Return the 64-bit difference hash of the grayscale images `a[..., H, W]` as a bool array `[..., 64]`.'''
+    small = resizeArea(a, 8, 9)
+    return (small[..., :, 1:] > small[..., :, :-1]).reshape(*a.shape[:-2], 64)
+
+
+
+
+def cmpFrames(f1: np.ndarray, f2: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    Compare the 2 stacks of grayscale images `[N, H, W]` pairwise.
+    Return the PSNR (dB, inf if identical), the global SSIM (no sliding window) and the dHash distance (bits) of each pair.
+    '''
+    a1, a2 = f1.astype(np.float32), f2.astype(np.float32)
+    mse = ((a1 - a2) ** 2).mean(axis=(-2, -1))
+    with np.errstate(divide='ignore'):
+        psnr = 10 * np.log10(255.0 ** 2 / mse)
+    mu1, mu2 = a1.mean(axis=(-2, -1)), a2.mean(axis=(-2, -1))
+    var1, var2 = a1.var(axis=(-2, -1)), a2.var(axis=(-2, -1))
+    cov = ((a1 - mu1[..., None, None]) * (a2 - mu2[..., None, None])).mean(axis=(-2, -1))
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    ssim = ((2 * mu1 * mu2 + c1) * (2 * cov + c2)) / ((mu1 ** 2 + mu2 ** 2 + c1) * (var1 + var2 + c2))
+    dist = (calcDHash(f1) != calcDHash(f2)).sum(axis=-1)
+    return psnr, ssim, dist
+
+
+
+
+def readImage(path: Path, width: int, height: int) -> np.ndarray|None:
+    '''Decode the image of the given size to a RGB `ndarray[height, width, 3]` (uint8), or None if failed.'''
+    try:
+        out = (ffmpeg.input(path.resolve())['v:0']
+                     .output('-', vframes=1, format='rawvideo', pix_fmt='rgb24')
+                     .run(capture_stdout=True, quiet=True)[0])
+    except ffmpeg._run.Error:
+        return None
+    if len(out) != width * height * 3:
+        return None
+    return np.frombuffer(out, np.uint8).reshape(height, width, 3)
+
+
+
+
+def calcImageDiff(a1: np.ndarray, a2: np.ndarray) -> tuple[np.ndarray, np.ndarray, float, np.ndarray]:
+    '''
+    Compare 2 images `[H, W, C]` of the same size.
+    Return the per-channel mean and max absolute difference, the ratio of differing pixels,
+    and the difference map `[H, W]` (max over channels).
+    '''
+    diff = np.abs(a1.astype(np.int16) - a2.astype(np.int16)).astype(np.uint8)
+    diff_map = diff.max(axis=-1)
+    return diff.mean(axis=(0, 1)), diff.max(axis=(0, 1)), float((diff_map > 0).mean()), diff_map
+
+
+
+
+_POPCOUNT_U8 = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def _popcount64(x: np.ndarray) -> np.ndarray:
+    if hasattr(np, 'bitwise_count'):  # numpy>=2.0
+        return np.bitwise_count(x)
+    return _POPCOUNT_U8[x.view(np.uint8)].reshape(*x.shape, 8).sum(axis=-1, dtype=np.uint8)
+
+
+def matchImageHashes(h1s: np.ndarray, h2s: np.ndarray, max_dist: int, block: int = 1024) -> list[tuple[int, int, int]]:
+    '''
+    Match the images by their hashes `[N, 64]` and `[M, 64]` (see `calcDHash()`) one-to-one.
+    The pairs are taken greedily in ascending hash distance, and only pairs within `max_dist` bits are matched.
+    Return the list of (idx1, idx2, distance).
+
+    NOTE this is O(N*M) as all the pairwise distances are computed (then only the K candidate pairs within `max_dist`
+    are sorted), which is fine for the images of a group (up to some thousands) but not meant for large collections.
+    The hashes are packed into uint64 and compared by the popcount of their XOR, `block` rows at a time,
+    so the memory is bounded by `block * M` words.
+    '''
+    if not len(h1s) or not len(h2s): return []
+    p1s = np.packbits(h1s, axis=-1).view('>u8').reshape(-1)
+    p2s = np.packbits(h2s, axis=-1).view('>u8').reshape(-1)
+    i1s, i2s, ds = [], [], []
+    for start in range(0, len(p1s), block):
+        dists = _popcount64(p1s[start:start + block, None] ^ p2s[None, :])
+        i1, i2 = np.nonzero(dists <= max_dist)
+        i1s.append(i1 + start); i2s.append(i2); ds.append(dists[i1, i2])
+    i1s, i2s, ds = np.concatenate(i1s), np.concatenate(i2s), np.concatenate(ds)
+    order = np.argsort(ds, kind='stable')
+    used1, used2, ret = set(), set(), []
+    for i, j, d in zip(i1s[order], i2s[order], ds[order]):
+        if i in used1 or j in used2: continue
+        used1.add(i); used2.add(j)
+        ret.append((int(i), int(j), int(d)))
+    return ret
+
+
+
+
+def mkDiffHeatmap(img_path: Path, diff_map: np.ndarray, gain: int = 8) -> bool:
+    '''Draw the difference map `[H, W]` amplified by `gain` to `img_path`.'''
+    h, w = diff_map.shape
+    try:
+        (ffmpeg.input('pipe:', format='rawvideo', pix_fmt='gray', s=f'{w}x{h}')
+               .output(str(img_path.resolve()), vframes=1)
+               .run(input=np.clip(diff_map.astype(np.int32) * gain, 0, 255).astype(np.uint8).tobytes(),
+                    overwrite_output=True, quiet=True))
+    except:
+        return False
+    return True
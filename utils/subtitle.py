@@ -1,15 +1,22 @@
+import io
 import re
+import functools
 from pathlib import Path
+from collections import OrderedDict
+from multiprocessing import Pool
 
-from .fileutils import tstFileEncoding
+from .fileutils import decodeStrict
 from configs.regex import ASS_INLINE_FONTNAME_BASE_PATTERN, ASS_INLINE_STYLENAME_BASE_PATTERN
+from configs.runtime import ASS_VSFILTERMOD_TAGS
 
+import numpy as np
 import ass
 from ass_parser import read_ass, AssFile
 from ass_tag_parser import parse_ass, AssTagFontName, AssTagResetStyle, AssTagAnimation
 
 
 __all__ = [
+    'loadAssFile',
     'tstAssFile',
     'filterValidASSFiles',
     'toAssFileObj',
@@ -18,23 +25,84 @@ __all__ = [
     'listFontNamesInAssFileObj',
     'listFontNamesInAssFileObjs',
     'listStyleNamesInAssFileObj',
+    'listCodepointsByFontInAssFileObj',
+    'compileAssTagScanner',
+    'scanAssTags',
+    'scanAssTagsInAssFileObj',
+    'scanAssTagsList',
     # 'listStyleNamesInAssFileObjs', # seems not useful
     ]
 
 
 
 
-def tstAssFile(path:Path, encoding='utf-8-sig'):
+class _AssCacheEntry:
+    def __init__(self, obj: AssFile|None):
+        self.obj = obj
+        self.strict: bool|None = None
+
+
+def _readAssText(path:Path, encoding:str) -> str|None:
+    text = decodeStrict(path.read_bytes(), encoding)
+    if text is not None:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
+
+
+# the most recently used parsed ASS files keyed by (path, size, mtime, encoding)
+ASS_CACHE_SIZE = 256
+_ASS_CACHE: OrderedDict[tuple[str, int, int, str], _AssCacheEntry] = OrderedDict()
+
+
+def loadAssFile(path:Path, encoding:str='utf-8-sig', strict:bool=False) -> AssFile|None:
+    '''
+    Read and decode the ASS file once, parse it by `ass_parser`, and cache the result by the file identity,
+    so the repeated checks on the same file never read or parse it again.
+    If `strict`, the file must also pass the parsing of `ass` (done only once on first request).
+    Only the last `ASS_CACHE_SIZE` files are kept, and the decoded text is not kept after parsing.
+    NOTE the returned `AssFile` is shared by all callers of the same file, so it must not be modified.
+    Return None if the file is invalid, or of a wrong encoding.
+    '''
     try:
-        if not tstFileEncoding(path, encoding=encoding):
-            return False
-        # NOTE use 2 existing ass libs to verify
-        read_ass(path.read_text(encoding=encoding))
-        with path.open('r', encoding=encoding) as fo:
-            ass.parse(fo)
-        return True
-    except:
-        return False
+        st = path.stat()
+        key = (str(path.resolve()), st.st_size, st.st_mtime_ns, encoding.lower())
+    except OSError:
+        return None
+
+    text = None
+    if (entry := _ASS_CACHE.get(key)) is None:
+        obj = None
+        if (text := _readAssText(path, encoding)) is not None:
+            try:
+                obj = read_ass(text)
+            except:
+                pass
+        entry = _ASS_CACHE[key] = _AssCacheEntry(obj)
+        if len(_ASS_CACHE) > ASS_CACHE_SIZE:
+            _ASS_CACHE.popitem(last=False)
+    else:
+        _ASS_CACHE.move_to_end(key)
+
+    if entry.obj is None:
+        return None
+    if strict:
+        if entry.strict is None:
+            # NOTE use 2 existing ass libs to verify
+            try:
+                if text is None: text = _readAssText(path, encoding)
+                ass.parse(io.StringIO(text))
+                entry.strict = True
+            except:
+                entry.strict = False
+        if not entry.strict:
+            return None
+    return entry.obj
+
+
+
+
+def tstAssFile(path:Path, encoding='utf-8-sig'):
+    return loadAssFile(path, encoding=encoding, strict=True) is not None
 
 
 
@@ -46,10 +114,7 @@ def filterValidASSFiles(*path:Path, encoding:str='utf-8-sig') -> list[Path]:
 
 
 def toAssFileObj(path:Path, encoding:str='utf-8-sig', test:bool=False) -> AssFile|None:
-    if test:
-        return read_ass(path.read_text(encoding=encoding)) if tstAssFile(path) else None
-    else:
-        return read_ass(path.read_text(encoding=encoding))
+    return loadAssFile(path, encoding=encoding, strict=test)
 
 
 
@@ -62,6 +127,68 @@ def toAssFileObjs(paths:list[Path], encoding:str|list[str]='utf-8-sig', test:boo
 
 
 
+# an override block, also accept an unclosed one at the end of the text
+_ASS_OVERRIDE_BLOCK_PATTERN = re.compile(r'(\{[^}]*\}?)')
+
+
+@functools.lru_cache(maxsize=2**16)
+def _tokeniseOverrideBlock(block:str) -> tuple[bool, tuple[str, ...], tuple[str, ...]]:
+    '''
+    Return the font names and the reset style names in an override block e.g. `{\\fnArial\\rAlt}`.
+    The typesetting/karaoke events repeat the same blocks a lot, so the result is cached by the block string.
+
+    Return:
+    bool: False means that the ass_tag_parser failed => the parsing may be incomplete (very low risk).
+    tuple[str]: the font names.
+    tuple[str]: the style names.
+    '''
+    ok, fonts, styles = True, [], []
+    try:
+        for tag in parse_ass(block):
+            if isinstance(tag, AssTagFontName):
+                fonts.append(tag.name)
+            if isinstance(tag, AssTagResetStyle):
+                if tag.style: styles.append(tag.style)
+            if isinstance(tag, AssTagAnimation):
+                pass # TODO it seems AssFile has no handling of this?
+    except:
+        ok = False
+    # always run the regex-based font/style name finder
+    fonts.extend(_getFontNamesFromAssText(block))
+    styles.extend(_getStyleNameFromAssText(block))
+    return ok, tuple(fonts), tuple(styles)
+
+
+
+
+def _scanAssEvents(assfile_obj:AssFile) -> tuple[bool, set[str], set[str], set[str]]:
+    '''
+    Walk the non-comment events once, and collect everything the font/style listing needs.
+
+    Return:
+    bool: False means that the ass_tag_parser failed on some override block.
+    set[str]: the inline font names.
+    set[str]: the style names of the events.
+    set[str]: the inline reset style names.
+    '''
+    ok, fonts, event_styles, inline_styles = True, set(), set(), set()
+    blocks : set[str] = set()
+    for event in assfile_obj.events:
+        if event.is_comment:
+            continue
+        if event.style_name:
+            event_styles.add(event.style_name)
+        blocks.update(_ASS_OVERRIDE_BLOCK_PATTERN.findall(event.text))
+    for block in blocks:
+        sub_ok, sub_fonts, sub_styles = _tokeniseOverrideBlock(block)
+        ok = ok if sub_ok else False
+        fonts.update(sub_fonts)
+        inline_styles.update(sub_styles)
+    return ok, fonts, event_styles, inline_styles
+
+
+
+
 def _getFontNamesFromAssText(text:str) -> list[str]:
     # https://stackoverflow.com/a/71993116/14040883 is good but the pattern does not work for python
     # let's use a bit ugly implementation by ourselves
@@ -73,34 +200,28 @@ def _getFontNamesFromAssText(text:str) -> list[str]:
 
 
 
-def listFontNamesInAssFileObj(assfile_obj:AssFile, used_only:bool=False) -> tuple[bool, list[str]]:
-    ok, fonts = True, []
+def _getUsedStyleNames(assfile_obj:AssFile, scan:tuple[bool, set[str], set[str], set[str]]) -> list[str]:
+    _, _, event_styles, inline_styles = scan
+    # NOTE check if the style is defined is beyond the scope of the current project
+    defined = set(style.name for style in assfile_obj.styles)
+    return sorted(set(str(name) for name in (event_styles | inline_styles) if name and name in defined))
+
 
 
+
+def listFontNamesInAssFileObj(assfile_obj:AssFile, used_only:bool=False) -> tuple[bool, list[str]]:
+    scan = _scanAssEvents(assfile_obj)
+    ok, fonts = scan[0], list(scan[1])
+
     if not used_only:
         for style in assfile_obj.styles:
             if style.font_name: fonts.append(style.font_name)
     else:
-        sub_ok, stylenames = listStyleNamesInAssFileObj(assfile_obj, used_only=used_only)
-        ok = ok if sub_ok else False
+        stylenames = _getUsedStyleNames(assfile_obj, scan)
         for style in assfile_obj.styles:
             if style.name in stylenames:
                 if style.font_name: fonts.append(style.font_name)
 
-    for event_text in listEventTextsInAssFileObj(assfile_obj):
-        try:
-            tags = parse_ass(event_text)
-            for tag in tags:
-                if isinstance(tag, AssTagFontName):
-                    fonts.append(tag.name)
-                if isinstance(tag, AssTagAnimation):
-                    pass # TODO it seems AssFile has no handling of this?
-        except:
-            ok = False
-        finally: # always run the regex-based font name finder
-            fonts.extend(_getFontNamesFromAssText(event_text))
-            continue
-
     return ok, sorted(set(fonts))
 
 
@@ -143,42 +264,127 @@ def listStyleNamesInAssFileObj(assfile_obj:AssFile, used_only:bool=False) -> tup
     list[str]: the list of style names.
     '''
 
-    styles : dict[str, bool] = {}
-    for style in assfile_obj.styles:
-        styles[style.name] = False
-
     if not used_only:
-        return True, [str(k) for k in styles.keys()]
+        return True, list(dict.fromkeys(str(style.name) for style in assfile_obj.styles))
+
+    # ? have we caught all possible defined style names?
+    # we have not yet handled the Animated Transform tag
+    # but it seems the regex can catch it?
+    scan = _scanAssEvents(assfile_obj)
+    return scan[0], _getUsedStyleNames(assfile_obj, scan)
+
+
+
+
+# the override tags changing the font or the drawing mode, in the order they appear
+_ASS_FONT_STATE_TAG_PATTERN = re.compile(r'\\(fn|r|p(?=\d))([^\\}]*)')
+# the text escapes not rendered as a glyph
+_ASS_TEXT_ESCAPE_PATTERN = re.compile(r'\\[Nnh]')
+
+
+@functools.lru_cache(maxsize=2**16)
+def _tokeniseFontStateTags(block:str) -> tuple[tuple[str, str], ...]:
+    return tuple((tag, arg.strip()) for tag, arg in _ASS_FONT_STATE_TAG_PATTERN.findall(block))
+
+
+
+
+def listCodepointsByFontInAssFileObj(assfile_obj:AssFile) -> dict[str, np.ndarray]:
+    '''
+    Return the codepoints actually rendered in each font by the non-comment events,
+    following the event style, `\\fn` and `\\r` overrides, and skipping the vector drawings (`\\p1`).
+    Each value is a sorted array of unique codepoints (uint32).
+    '''
+    style_fonts = {style.name: style.font_name for style in assfile_obj.styles}
+    texts : dict[str, list[str]] = {}
 
-    ok = True
     for event in assfile_obj.events:
         if event.is_comment:
             continue
+        base_font = style_fonts.get(event.style_name, '')
+        font, drawing = base_font, False
+        for i, part in enumerate(_ASS_OVERRIDE_BLOCK_PATTERN.split(event.text)):
+            if i % 2:  # override block
+                for tag, arg in _tokeniseFontStateTags(part):
+                    match tag:
+                        case 'fn':
+                            font = arg if arg else base_font
+                        case 'r':
+                            font = style_fonts.get(arg, base_font) if arg else base_font
+                        case _:
+                            drawing = arg.isdigit() and int(arg) > 0
+            elif part and not drawing:
+                texts.setdefault(font.lstrip('@'), []).append(_ASS_TEXT_ESCAPE_PATTERN.sub('', part))
+
+    ret : dict[str, np.ndarray] = {}
+    for font, parts in texts.items():
+        codepoints = np.unique(np.frombuffer(''.join(parts).encode('utf-32-le'), dtype='<u4'))
+        codepoints = codepoints[codepoints >= 0x20]  # no control chars
+        if font and codepoints.size: ret[font] = codepoints.astype(np.uint32)
+    return ret
+
+
+
+
+@functools.lru_cache
+def compileAssTagScanner(tags:tuple[str, ...]=ASS_VSFILTERMOD_TAGS) -> re.Pattern:
+    '''
+    Compile the override tags into a single alternation, so a line is scanned once for all of them.
+    The longer tags go first so e.g. `\\rndx` is not reported as `\\rnd`.
+    The short `fsc`/`z` must be followed by a number, otherwise `fsc` would also match the standard `fscx`/`fscy`.
+    '''
+    alts = []
+    for tag in sorted(set(tag.lower() for tag in tags), key=lambda tag: (-len(tag), tag)):
+        alts.append(f'{re.escape(tag)}(?=[-\\d.])' if tag in ('fsc', 'z') else re.escape(tag))
+    return re.compile(r'\\(' + '|'.join(alts) + ')', re.IGNORECASE)
+
+
+
+
+def scanAssTags(path:Path, tags:tuple[str, ...]=ASS_VSFILTERMOD_TAGS, encoding:str='utf-8-sig') -> list[str]:
+    '''
+    Stream the ASS file line by line and return the given tags found outside the comment events, in lowercase.
+    Stop reading as soon as all tags are found.
+    '''
+    pattern = compileAssTagScanner(tuple(tags))
+    expected = set(tag.lower() for tag in tags)
+    found : set[str] = set()
+    with Path(path).open('r', encoding=encoding, errors='replace') as fo:
+        for line in fo:
+            if line.startswith('Comment:') or '\\' not in line:
+                continue
+            found.update(m.lower() for m in pattern.findall(line))
+            if len(found) == len(expected):
+                break
+    return sorted(found)
+
+
+
+
+def scanAssTagsInAssFileObj(assfile_obj:AssFile, tags:tuple[str, ...]=ASS_VSFILTERMOD_TAGS) -> list[str]:
+    '''Similar to `scanAssTags` but scan the events of an already loaded ASS file, so the file is not read again.'''
+    pattern = compileAssTagScanner(tuple(tags))
+    expected = set(tag.lower() for tag in tags)
+    found : set[str] = set()
+    for event in assfile_obj.events:
+        if event.is_comment or '\\' not in event.text:
+            continue
+        found.update(m.lower() for m in pattern.findall(event.text))
+        if len(found) == len(expected):
+            break
+    return sorted(found)
+
+
 
-        # NOTE check if the style is defined is beyond the scope of the current project
-        if event.style_name and (event.style_name in styles.keys()):
-            styles[event.style_name] = True
-
-        try:
-            tags = parse_ass(event.text)
-            for tag in tags:
-                if isinstance(tag, AssTagResetStyle):
-                    if tag.style and (tag.style in styles.keys()):
-                        styles[tag.style] = True
-                if isinstance(tag, AssTagAnimation):
-                    pass # TODO it seems AssFile has no handling of this?
-        except:
-            ok = False
-        finally: # always run the regex-based style name finder
-            for style in _getStyleNameFromAssText(event.text):
-                if style and (style in styles.keys()):
-                    styles[style] = True
-
-        # ? have we caught all possible defined style names?
-        # we have not yet handled the Animated Transform tag
-        # but it seems the regex can catch it?
-
-    return ok, sorted(set([str(k) for (k, v) in styles.items() if v]))
+
+def scanAssTagsList(paths:list[Path], tags:tuple[str, ...]=ASS_VSFILTERMOD_TAGS, mp:int=1) -> list[list[str]]:
+    mp = int(mp)
+    if mp > 1 and len(paths) > 1:
+        with Pool(mp) as pool:
+            results = list(pool.imap(functools.partial(scanAssTags, tags=tuple(tags)), paths, chunksize=16))
+    else:
+        results = [scanAssTags(path, tags=tuple(tags)) for path in paths]
+    return results
 
 
 